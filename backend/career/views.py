@@ -19,6 +19,7 @@ from users.auth import get_current_user
 from users.models import User
 from progress.models import ActivityType
 from progress.analytics import progress_analytics
+from documents.upload_handler import upload_handler
 import uuid
 import os
 from pathlib import Path
@@ -61,9 +62,7 @@ async def upload_resume(
     file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
     
     try:
-        content = await file.read()
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        await upload_handler.write_upload(file, file_path)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -137,8 +136,7 @@ def analyze_resume(
     Returns:
         Comprehensive analysis with recommendations
     """
-    from documents.models import Document, ProcessingStatus
-    from documents.topic_extractor import topic_extractor
+    from documents.topic_extractor import topic_extractor, load_user_topic_data
     
     # Get resume
     resume = db.query(Resume).filter(
@@ -154,23 +152,7 @@ def analyze_resume(
     
     # Get user's learning profile from documents
     try:
-        documents = db.query(Document).filter(
-            Document.user_id == current_user.id,
-            Document.processing_status == ProcessingStatus.COMPLETED
-        ).all()
-        
-        # Extract topic data
-        documents_data = []
-        for doc in documents:
-            doc_data = {
-                'topics': doc.topics or [],
-                'domains': doc.domains or [],
-                'keywords': doc.keywords or [],
-                'technical_skills': doc.doc_metadata.get('technical_skills', []) if doc.doc_metadata else [],
-                'technologies': doc.doc_metadata.get('technologies', []) if doc.doc_metadata else [],
-                'programming_languages': doc.doc_metadata.get('programming_languages', []) if doc.doc_metadata else []
-            }
-            documents_data.append(doc_data)
+        documents_data = load_user_topic_data(db, current_user.id)
         
         # Aggregate interests
         interest_profile = topic_extractor.aggregate_user_interests(documents_data) if documents_data else {}
@@ -336,8 +318,7 @@ def get_skill_suggestions(
     Returns:
         Categorized skill suggestions
     """
-    from documents.models import Document, ProcessingStatus
-    from documents.topic_extractor import topic_extractor
+    from documents.topic_extractor import topic_extractor, load_user_topic_data
     
     # Get resume
     resume = db.query(Resume).filter(
@@ -352,30 +333,14 @@ def get_skill_suggestions(
         )
     
     # Get user's learning profile
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id,
-        Document.processing_status == ProcessingStatus.COMPLETED
-    ).all()
+    documents_data = load_user_topic_data(db, current_user.id)
     
-    if not documents:
+    if not documents_data:
         return {
             'message': 'Upload study materials to get personalized skill suggestions',
             'suggestions': {}
         }
     
-    # Extract profile
-    documents_data = []
-    for doc in documents:
-        doc_data = {
-            'topics': doc.topics or [],
-            'domains': doc.domains or [],
-            'keywords': doc.keywords or [],
-            'technical_skills': doc.doc_metadata.get('technical_skills', []) if doc.doc_metadata else [],
-            'technologies': doc.doc_metadata.get('technologies', []) if doc.doc_metadata else [],
-            'programming_languages': doc.doc_metadata.get('programming_languages', []) if doc.doc_metadata else []
-        }
-        documents_data.append(doc_data)
-    
     interest_profile = topic_extractor.aggregate_user_interests(documents_data)
     
     # Get skill suggestions
@@ -416,8 +381,7 @@ def get_career_recommendations(
     Returns:
         Detailed career guidance and recommendations
     """
-    from documents.models import Document, ProcessingStatus
-    from documents.topic_extractor import topic_extractor
+    from documents.topic_extractor import topic_extractor, load_user_topic_data
     
     # Get resume
     resume = db.query(Resume).filter(
@@ -432,30 +396,14 @@ def get_career_recommendations(
         )
     
     # Get learning profile
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id,
-        Document.processing_status == ProcessingStatus.COMPLETED
-    ).all()
+    documents_data = load_user_topic_data(db, current_user.id)
     
-    if not documents:
+    if not documents_data:
         return {
             'message': 'Upload study materials to get personalized career recommendations',
             'recommendations': {}
         }
     
-    # Build profile
-    documents_data = []
-    for doc in documents:
-        doc_data = {
-            'topics': doc.topics or [],
-            'domains': doc.domains or [],
-            'keywords': doc.keywords or [],
-            'technical_skills': doc.doc_metadata.get('technical_skills', []) if doc.doc_metadata else [],
-            'technologies': doc.doc_metadata.get('technologies', []) if doc.doc_metadata else [],
-            'programming_languages': doc.doc_metadata.get('programming_languages', []) if doc.doc_metadata else []
-        }
-        documents_data.append(doc_data)
-    
     interest_profile = topic_extractor.aggregate_user_interests(documents_data)
     
     # Analyze skill gaps
@@ -605,8 +553,7 @@ async def upload_and_analyze_resume(
     Returns:
         Combined resume and analysis data
     """
-    from documents.models import Document, ProcessingStatus
-    from documents.topic_extractor import topic_extractor
+    from documents.topic_extractor import topic_extractor, load_user_topic_data
 
     # Validate file type
     allowed_extensions = ['.pdf', '.docx', '.doc']
@@ -623,9 +570,7 @@ async def upload_and_analyze_resume(
     file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
 
     try:
-        content = await file.read()
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        await upload_handler.write_upload(file, file_path)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -675,23 +620,7 @@ async def upload_and_analyze_resume(
     # Now perform analysis
     try:
         # Get user's learning profile from documents
-        documents = db.query(Document).filter(
-            Document.user_id == current_user.id,
-            Document.processing_status == ProcessingStatus.COMPLETED
-        ).all()
-
-        # Extract topic data
-        documents_data = []
-        for doc in documents:
-            doc_data = {
-                'topics': doc.topics or [],
-                'domains': doc.domains or [],
-                'keywords': doc.keywords or [],
-                'technical_skills': doc.doc_metadata.get('technical_skills', []) if doc.doc_metadata else [],
-                'technologies': doc.doc_metadata.get('technologies', []) if doc.doc_metadata else [],
-                'programming_languages': doc.doc_metadata.get('programming_languages', []) if doc.doc_metadata else []
-            }
-            documents_data.append(doc_data)
+        documents_data = load_user_topic_data(db, current_user.id)
 
         # Aggregate interests
         interest_profile = topic_extractor.aggregate_user_interests(documents_data) if documents_data else {}
@@ -866,8 +795,7 @@ def get_current_analysis(
     Returns:
         Latest career analysis data
     """
-    from documents.models import Document, ProcessingStatus
-    from documents.topic_extractor import topic_extractor
+    from documents.topic_extractor import topic_extractor, load_user_topic_data
 
     # Get latest resume
     resume = db.query(Resume).filter(
@@ -886,19 +814,7 @@ def get_current_analysis(
     ).order_by(ResumeAnalysis.analyzed_at.desc()).first()
 
     # Get interest profile
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id,
-        Document.processing_status == ProcessingStatus.COMPLETED
-    ).all()
-
-    documents_data = []
-    for doc in documents:
-        doc_data = {
-            'topics': doc.topics or [],
-            'domains': doc.domains or [],
-            'keywords': doc.keywords or []
-        }
-        documents_data.append(doc_data)
+    documents_data = load_user_topic_data(db, current_user.id, fields=('topics', 'domains', 'keywords'))
 
     interest_profile = topic_extractor.aggregate_user_interests(documents_data) if documents_data else {}
 
@@ -985,8 +901,7 @@ def get_recommendations(
     Returns:
         Career recommendations
     """
-    from documents.models import Document, ProcessingStatus
-    from documents.topic_extractor import topic_extractor
+    from documents.topic_extractor import topic_extractor, load_user_topic_data
 
     # Get resume
     if resume_id:
@@ -1006,31 +921,15 @@ def get_recommendations(
         }
 
     # Get learning profile
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id,
-        Document.processing_status == ProcessingStatus.COMPLETED
-    ).all()
+    documents_data = load_user_topic_data(db, current_user.id)
 
-    if not documents:
+    if not documents_data:
         return {
             'resume_id': str(resume.id),
             'message': 'Upload study materials to get personalized recommendations based on your learning profile',
             'recommendations': {}
         }
 
-    # Build profile
-    documents_data = []
-    for doc in documents:
-        doc_data = {
-            'topics': doc.topics or [],
-            'domains': doc.domains or [],
-            'keywords': doc.keywords or [],
-            'technical_skills': doc.doc_metadata.get('technical_skills', []) if doc.doc_metadata else [],
-            'technologies': doc.doc_metadata.get('technologies', []) if doc.doc_metadata else [],
-            'programming_languages': doc.doc_metadata.get('programming_languages', []) if doc.doc_metadata else []
-        }
-        documents_data.append(doc_data)
-
     interest_profile = topic_extractor.aggregate_user_interests(documents_data)
 
     # Analyze skill gaps
@@ -1078,8 +977,7 @@ def get_interview_prep(
     Returns:
         Interview preparation data
     """
-    from documents.models import Document, ProcessingStatus
-    from documents.topic_extractor import topic_extractor
+    from documents.topic_extractor import topic_extractor, load_user_topic_data
 
     # Get latest resume
     resume = db.query(Resume).filter(
@@ -1093,21 +991,7 @@ def get_interview_prep(
         )
 
     # Get learning profile
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id,
-        Document.processing_status == ProcessingStatus.COMPLETED
-    ).all()
-
-    documents_data = []
-    for doc in documents:
-        doc_data = {
-            'topics': doc.topics or [],
-            'domains': doc.domains or [],
-            'keywords': doc.keywords or [],
-            'technical_skills': doc.doc_metadata.get('technical_skills', []) if doc.doc_metadata else [],
-            'technologies': doc.doc_metadata.get('technologies', []) if doc.doc_metadata else []
-        }
-        documents_data.append(doc_data)
+    documents_data = load_user_topic_data(db, current_user.id, fields=('topics', 'domains', 'keywords', 'technical_skills', 'technologies'))
 
     interest_profile = topic_extractor.aggregate_user_interests(documents_data) if documents_data else {}
 
@@ -1,22 +1,51 @@
 """
 Database configuration and session management
 """
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
 from config.settings import settings
 
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _json_serializer(value) -> str:
+    """Serialize JSON/JSONB column values with orjson (psycopg2 expects str)"""
+    return orjson.dumps(value, option=_ORJSON_OPTIONS).decode()
+
+
+def _create_engine(pool_size: int, max_overflow: int):
+    """Engine for settings.DATABASE_URL with a pool of the given size"""
+    return create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        json_serializer=_json_serializer,
+        json_deserializer=orjson.loads,
+        echo=settings.DEBUG
+    )
+
+
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
-)
+engine = _create_engine(settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def use_extraction_pool() -> None:
+    """
+    Rebind SessionLocal to a small pool (EXTRACTION_DB_POOL_SIZE) in an extraction
+    worker process, so extraction workers don't each reserve a web-sized pool
+    """
+    global engine
+    engine.dispose()
+    engine = _create_engine(settings.EXTRACTION_DB_POOL_SIZE, settings.EXTRACTION_DB_MAX_OVERFLOW)
+    SessionLocal.configure(bind=engine)
+
 # Base class for models
 Base = declarative_base()
 
@@ -8,9 +8,11 @@ from config.settings import settings
 class WebExtractor:
     """Extract content from web pages"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
         self.api_key = settings.extractor_key  # Use property with fallback
         self.base_url = "https://extractorapi.com/api/v1/extractor/"
+        # Keep-alive session so repeated calls reuse the TLS connection
+        self.session = session or requests.Session()
     
     def fetch_content(self, url: str) -> Dict[str, Any]:
         """
@@ -28,7 +30,7 @@ class WebExtractor:
         }
         
         try:
-            response = requests.get(self.base_url, params=params, timeout=30)
+            response = self.session.get(self.base_url, params=params, timeout=30)
             response.raise_for_status()
             data = response.json()
             return data
@@ -12,9 +12,11 @@ logger = logging.getLogger(__name__)
 class YouTubeExtractor:
     """Extract transcripts from YouTube videos"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
         self.api_key = settings.supadata_key  # Use property with fallback
         self.base_url = "https://api.supadata.ai/v1/transcript"
+        # Keep-alive session so repeated calls reuse the TLS connection
+        self.session = session or requests.Session()
         logger.info(f"YouTubeExtractor initialized with API key: {self.api_key[:15]}..." if self.api_key else "No API key")
     
     def fetch_transcript(self, youtube_url: str, prefer_lang: str = "en") -> Dict[str, Any]:
@@ -34,7 +36,7 @@ class YouTubeExtractor:
         logger.info(f"Fetching transcript for: {youtube_url} (lang: {prefer_lang})")
         
         try:
-            response = requests.get(
+            response = self.session.get(
                 self.base_url, 
                 params=params, 
                 headers=headers, 
@@ -66,7 +68,7 @@ class YouTubeExtractor:
             
             # Fallback: request without lang param
             logger.info("Retrying without language parameter...")
-            response2 = requests.get(
+            response2 = self.session.get(
                 self.base_url, 
                 params={"url": youtube_url}, 
                 headers=headers, 
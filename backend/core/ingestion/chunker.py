@@ -9,6 +9,7 @@ Uses Docling's built-in HybridChunker which combines:
 """
 
 import logging
+import re
 from typing import List, Dict, Any, Optional, Set
 from dataclasses import dataclass
 
@@ -21,6 +22,7 @@ logger = logging.getLogger(__name__)
 DEFAULT_HYBRID_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
 DEFAULT_HYBRID_MAX_TOKENS = 256
 DEFAULT_HYBRID_MERGE_PEERS = False
+FALLBACK_BREAK_RE = re.compile(r"[.!?\n]")
 
 
 def dedupe_preserve_order(values: List[str]) -> List[str]:
@@ -287,10 +289,13 @@ class DoclingHybridChunker:
                 chunk_text = content[start:]
             else:
                 chunk_end = end
-                for i in range(end, max(start + self.config.min_chunk_size, end - 200), -1):
-                    if i < len(content) and content[i] in '.!?\n':
-                        chunk_end = i + 1
-                        break
+                # Last sentence/line break in the 200 chars before end, in one regex pass
+                window_start = max(start + self.config.min_chunk_size, end - 200) + 1
+                last_break = None
+                for last_break in FALLBACK_BREAK_RE.finditer(content, window_start, end + 1):
+                    pass
+                if last_break is not None:
+                    chunk_end = last_break.end()
                 chunk_text = content[start:chunk_end]
                 end = chunk_end
 
@@ -4,22 +4,29 @@ Replaces Gemini API embeddings with local inference (BAAI/bge-small-en-v1.5, 384
 """
 
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import torch
 from transformers import AutoModel, AutoTokenizer
 
 from .chunker import DocumentChunk
 from utils.providers import (
+    get_embedding_batch_size,
     get_embedding_device,
     get_embedding_dimension,
     get_embedding_model,
     get_embedding_query_instruction,
+    get_embedding_quantize,
 )
 
 logger = logging.getLogger(__name__)
 
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+
 
 # Model configurations for known embedding models
 EMBEDDING_MODEL_CONFIGS = {
@@ -38,6 +45,18 @@ EMBEDDING_MODEL_CONFIGS = {
 }
 
 
+def _cpu_supports_int8() -> bool:
+    """True when torch has an x86 quantized engine and the CPU has VNNI int8 instructions."""
+    if "fbgemm" not in torch.backends.quantized.supported_engines:
+        return False
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            flags = cpuinfo.read()
+    except OSError:
+        return False
+    return "avx512_vnni" in flags or "avx_vnni" in flags
+
+
 def get_embedding_config(model_name: str) -> Dict[str, Any]:
     """Get config for a known model or return defaults."""
     return EMBEDDING_MODEL_CONFIGS.get(
@@ -54,19 +73,24 @@ def get_embedding_config(model_name: str) -> Dict[str, Any]:
 class EmbeddingGenerator:
     """Generates embeddings for document chunks using a local Hugging Face model."""
 
-    _model_cache: Dict[Tuple[str, str], Tuple[Any, Any, int]] = {}
+    _model_cache: Dict[Tuple[str, str, bool], Tuple[Any, Any, int]] = {}
 
     def __init__(
         self,
         model: str = get_embedding_model(),
-        batch_size: int = 32,
+        batch_size: int = get_embedding_batch_size(),
         device: str = get_embedding_device(),
+        quantize: bool = get_embedding_quantize(),
     ):
         self.model_name = model
         self.batch_size = batch_size
         self.device = self._resolve_device(device)
+        self.quantize = quantize
         self.config = get_embedding_config(model)
         self.query_instruction = get_embedding_query_instruction(model) or self.config.get("query_instruction", "")
+        # Repeated questions (retries, follow-ups, probes) skip the forward pass
+        self._query_embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_embedding_lock = threading.Lock()
 
     def _resolve_device(self, device: str) -> str:
         if device != "auto":
@@ -78,7 +102,7 @@ class EmbeddingGenerator:
         return "cpu"
 
     def _get_model_components(self) -> Tuple[Any, Any, int]:
-        cache_key = (self.model_name, self.device)
+        cache_key = (self.model_name, self.device, self.quantize)
         if cache_key not in self._model_cache:
             logger.info(f"Loading embedding model {self.model_name} on {self.device}")
             tokenizer = AutoTokenizer.from_pretrained(
@@ -91,6 +115,8 @@ class EmbeddingGenerator:
             )
             model.to(self.device)
             model.eval()
+            if self.quantize:
+                model = self._quantize_model(model)
             hidden_size = getattr(model.config, "hidden_size", self.config["dimensions"])
             self._model_cache[cache_key] = (tokenizer, model, hidden_size)
 
@@ -98,6 +124,17 @@ class EmbeddingGenerator:
         self.config["dimensions"] = hidden_size
         return tokenizer, model, hidden_size
 
+    def _quantize_model(self, model: Any) -> Any:
+        """INT8 dynamic quantization of the Linear layers; falls back to FP32 where it won't pay off."""
+        if self.device != "cpu":
+            logger.info(f"Embedding quantization skipped: only applies on cpu, not {self.device}")
+            return model
+        if not _cpu_supports_int8():
+            logger.info("Embedding quantization skipped: CPU lacks VNNI int8 support, keeping FP32")
+            return model
+        logger.info(f"Quantizing embedding model {self.model_name} to INT8")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
     def _prepare_text(self, text: str, is_query: bool = False) -> str:
         normalized_text = text.strip()
         if not normalized_text:
@@ -115,9 +152,9 @@ class EmbeddingGenerator:
     def _zero_embedding(self, dimension: int) -> List[float]:
         return [0.0] * dimension
 
-    def _encode_sync(self, texts: List[str], is_query: bool = False) -> List[List[float]]:
-        tokenizer, model, hidden_size = self._get_model_components()
-        embeddings: List[List[float]] = [self._zero_embedding(hidden_size) for _ in texts]
+    def _encode_tensor(self, texts: List[str], is_query: bool = False) -> Tuple[List[int], Optional[torch.Tensor]]:
+        """Encode non-empty texts; returns their input indices and the normalized CPU tensor."""
+        tokenizer, model, _ = self._get_model_components()
 
         prepared_texts = []
         prepared_indices = []
@@ -128,7 +165,7 @@ class EmbeddingGenerator:
                 prepared_indices.append(index)
 
         if not prepared_texts:
-            return embeddings
+            return prepared_indices, None
 
         encoded_inputs = tokenizer(
             prepared_texts,
@@ -147,23 +184,118 @@ class EmbeddingGenerator:
                 pooled = model_output.last_hidden_state[:, 0]
             normalized = torch.nn.functional.normalize(pooled, p=2, dim=1)
 
-        encoded_embeddings = normalized.cpu().tolist()
-        for index, embedding in zip(prepared_indices, encoded_embeddings):
-            embeddings[index] = embedding
+        return prepared_indices, normalized.cpu()
+
+    def _encode_array(self, texts: List[str], is_query: bool = False) -> np.ndarray:
+        """Encode texts into a (len(texts), dim) float32 array; empty texts get zero rows."""
+        _, _, hidden_size = self._get_model_components()
+        embeddings = np.zeros((len(texts), hidden_size), dtype=np.float32)
 
+        prepared_indices, normalized = self._encode_tensor(texts, is_query=is_query)
+        if normalized is not None:
+            embeddings[prepared_indices] = normalized.numpy()
         return embeddings
 
+    def _encode_sync(self, texts: List[str], is_query: bool = False) -> List[List[float]]:
+        return self._encode_array(texts, is_query=is_query).tolist()
+
     def generate_embedding(self, text: str) -> List[float]:
         """Generate an embedding for a single text (synchronous)."""
         return self._encode_sync([text])[0]
 
+    def generate_query_embeddings_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed search queries (with query prefix) into a (len(texts), dim) float32 array.
+        Queries already in the LRU cache are reused; the rest are encoded together in
+        batch_size forward passes and cached.
+        """
+        _, _, hidden_size = self._get_model_components()
+        embeddings = np.zeros((len(texts), hidden_size), dtype=np.float32)
+        missing: Dict[str, List[int]] = {}
+
+        with self._query_embedding_lock:
+            for row, text in enumerate(texts):
+                cached = self._query_embedding_cache.get(text)
+                if cached is None:
+                    missing.setdefault(text, []).append(row)
+                else:
+                    self._query_embedding_cache.move_to_end(text)
+                    embeddings[row] = cached
+
+        if not missing:
+            return embeddings
+
+        missing_texts = list(missing)
+        encoded = np.concatenate([
+            self._encode_array(missing_texts[i:i + self.batch_size], is_query=True)
+            for i in range(0, len(missing_texts), self.batch_size)
+        ])
+
+        with self._query_embedding_lock:
+            for text, embedding in zip(missing_texts, encoded):
+                embeddings[missing[text]] = embedding
+                if embedding.any():
+                    # Copy so the cache doesn't pin the whole encoded batch
+                    self._query_embedding_cache[text] = embedding.copy()
+                    self._query_embedding_cache.move_to_end(text)
+            while len(self._query_embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embedding_cache.popitem(last=False)
+
+        return embeddings
+
+    def generate_query_embedding_array(self, text: str) -> np.ndarray:
+        """Generate a float32 embedding for a search query (with query prefix, LRU cached)."""
+        return self.generate_query_embeddings_array([text])[0]
+
     def generate_query_embedding(self, text: str) -> List[float]:
-        """Generate an embedding for a search query (synchronous, with query prefix)."""
-        return self._encode_sync([text], is_query=True)[0]
+        """Generate an embedding for a search query (synchronous, with query prefix, LRU cached)."""
+        return self.generate_query_embedding_array(text).tolist()
 
     def generate_embeddings_batch(self, texts: List[str], is_query: bool = False) -> List[List[float]]:
-        """Generate embeddings for a batch of texts (synchronous)."""
-        return self._encode_sync(texts, is_query)
+        """Generate embeddings for a batch of texts in forward passes of batch_size (synchronous)."""
+        embeddings: List[List[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._encode_sync(texts[i:i + self.batch_size], is_query))
+        return embeddings
+
+    def _fill_embeddings(self, embeddings: np.ndarray, texts: List[str], rows: List[int], is_query: bool) -> None:
+        """
+        Encode texts into embeddings[rows] (texts[i] goes to row rows[i]).
+        A failed batch is split in half and retried (the usual out-of-memory fallback);
+        a single text that still fails keeps its zero row instead of failing the document.
+        """
+        try:
+            prepared_indices, normalized = self._encode_tensor(texts, is_query=is_query)
+            if normalized is not None:
+                embeddings[[rows[index] for index in prepared_indices]] = normalized.numpy()
+        except Exception as e:
+            if len(texts) == 1:
+                logger.error(f"Failed to embed text {rows[0]}: {e}")
+                return
+            if self.device.startswith("cuda"):
+                torch.cuda.empty_cache()
+            half = len(texts) // 2
+            logger.warning(f"Batch of {len(texts)} failed ({e}); retrying as two halves")
+            self._fill_embeddings(embeddings, texts[:half], rows[:half], is_query)
+            self._fill_embeddings(embeddings, texts[half:], rows[half:], is_query)
+
+    def generate_embeddings_array(self, texts: List[str], is_query: bool = False) -> np.ndarray:
+        """
+        Generate embeddings into one preallocated (len(texts), dim) float32 array.
+        Rows for empty texts or texts that could not be embedded are left as zeros.
+
+        Texts are batched in length order so each forward pass pads to a similar
+        length instead of to the longest chunk in an arbitrary batch.
+        """
+        _, _, hidden_size = self._get_model_components()
+        embeddings = np.zeros((len(texts), hidden_size), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda row: len(texts[row]), reverse=True)
+        for i in range(0, len(order), self.batch_size):
+            rows = order[i:i + self.batch_size]
+            self._fill_embeddings(embeddings, [texts[row] for row in rows], rows, is_query)
+
+        return embeddings
 
     def embed_chunks(self, chunks: List[DocumentChunk]) -> List[DocumentChunk]:
         """Generate embeddings for document chunks (synchronous)."""
@@ -2,29 +2,45 @@
 RAG Pipeline for content processing and retrieval.
 Uses Docling for document conversion, local HuggingFace embeddings, and PGVector storage.
 """
+import atexit
+import hashlib
 import json
-from typing import List, Dict, Any, Optional
-from sqlalchemy import text as sql_text
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
 from config.settings import settings
 from core.content_extractors.youtube_extractor import YouTubeExtractor
 from core.content_extractors.web_extractor import WebExtractor
 from core.content_extractors.document_extractor import DocumentExtractor
-from core.vector_store import vector_store
+from core.vector_store import VectorStore, get_vector_store
 from core.ingestion.chunker import ChunkingConfig, DocumentChunk, create_chunker
 from core.ingestion.embedder import get_embedder
 from config.database import SessionLocal
 from utils.gemini_client import gemini_client
 from utils.logger import logger
 
+TRANSLATION_CACHE_SIZE = 128
+HTTP_POOL_CONNECTIONS = 20
+HTTP_POOL_MAXSIZE = 50
+
 
 class RAGPipeline:
     """Complete RAG pipeline using Docling + PGVector"""
 
     def __init__(self):
-        self.youtube_extractor = YouTubeExtractor()
-        self.web_extractor = WebExtractor()
+        # One keep-alive session shared by all external extractor calls
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+        self._http.mount("https://", adapter)
+        self._http.mount("http://", adapter)
+        atexit.register(self._http.close)
+
+        self.youtube_extractor = YouTubeExtractor(session=self._http)
+        self.web_extractor = WebExtractor(session=self._http)
         self.document_extractor = DocumentExtractor()
-        self.vector_store = vector_store
         self.gemini_client = gemini_client
         self.embedder = get_embedder()
         self.chunker = create_chunker(
@@ -34,59 +50,141 @@ class RAGPipeline:
                 tokenizer_model=settings.DOCLING_HYBRID_TOKENIZER,
             )
         )
+        self._translation_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._translation_lock = threading.Lock()
 
-    def process_youtube(
+    @property
+    def vector_store(self) -> VectorStore:
+        """Shared VectorStore, created on first use rather than at import."""
+        return get_vector_store()
+
+    def _ensure_english(self, text: str) -> str:
+        """
+        Translate text to English once per distinct input.
+        Re-ingesting the same URL (retries, notes + quiz on one source) reuses the result.
+        """
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        with self._translation_lock:
+            cached = self._translation_cache.get(key)
+            if cached is not None:
+                self._translation_cache.move_to_end(key)
+                return cached
+
+        # Failures raise instead of returning text untranslated, so a transient quota or
+        # network error is never cached; the caller keeps the original text for this run
+        translated = self.gemini_client.ensure_english(text, raise_on_error=True)
+
+        with self._translation_lock:
+            self._translation_cache[key] = translated
+            self._translation_cache.move_to_end(key)
+            while len(self._translation_cache) > TRANSLATION_CACHE_SIZE:
+                self._translation_cache.popitem(last=False)
+        return translated
+
+    def _build_result(
+        self,
+        text: str,
+        metadata: Dict[str, Any],
+        chunk_count: int,
+        doc_id: Optional[str],
+        embeddings_stored: bool,
+        **extra: Any
+    ) -> Dict[str, Any]:
+        """Shape the common result payload returned by every process_* method."""
+        return {
+            "text": text,
+            "chunk_count": chunk_count,
+            "metadata": metadata,
+            "doc_id": doc_id,
+            "embeddings_stored": embeddings_stored,
+            "success": True,
+            **extra
+        }
+
+    def _run(
         self,
+        extract_fn: Callable[[str], Optional[str]],
+        metadata_fn: Callable[[str], Dict[str, Any]],
         url: str,
+        source_name: str,
+        empty_error: str,
         document_id: Optional[str] = None,
         store_embeddings: bool = True
     ) -> Dict[str, Any]:
-        """Process YouTube video - extracts transcript and creates embeddings."""
-        try:
-            logger.info(f"RAG Pipeline: Processing YouTube URL: {url}")
+        """Shared URL ingestion flow: extract -> translate -> chunk -> embed -> result."""
+        text = extract_fn(url)
+        if not text:
+            return {"success": False, "error": empty_error}
 
-            text = self.youtube_extractor.extract_text(url)
-            if not text:
-                return {"success": False, "error": "Could not extract transcript."}
+        logger.info(f"RAG Pipeline: Extracted {len(text)} characters from {source_name} source")
 
-            logger.info(f"RAG Pipeline: Transcript extracted - {len(text)} characters")
+        metadata = metadata_fn(url)
 
-            try:
-                metadata = self.youtube_extractor.get_metadata(url)
-            except Exception:
-                metadata = {"video_url": url, "source": "youtube"}
+        try:
+            text = self._ensure_english(text)
+        except Exception as e:
+            logger.warning(f"Could not translate to English: {e}")
+
+        chunks = None
+        doc_id = None
 
+        if store_embeddings and document_id:
+            # add_document chunks internally; reuse its chunks instead of splitting twice
             try:
-                text = self.gemini_client.ensure_english(text)
+                result = self.vector_store.add_document(
+                    document_id=document_id,
+                    text=text,
+                    metadata={"source": source_name, "url": url, **metadata}
+                )
+                if result.get("success"):
+                    doc_id = document_id
+                    chunks = result.get("chunks")
             except Exception as e:
-                logger.warning(f"Could not translate to English: {e}")
+                logger.warning(f"Could not store embeddings: {e}")
 
+        if chunks is None:
             chunks = self.vector_store.chunk_text(text)
-            doc_id = None
-            chunk_count = len(chunks)
+        chunk_count = len(chunks)
+
+        return self._build_result(
+            text=text,
+            metadata=metadata,
+            chunk_count=chunk_count,
+            doc_id=doc_id,
+            embeddings_stored=doc_id is not None,
+            chunks=chunks,
+        )
 
-            if store_embeddings and document_id:
-                try:
-                    result = self.vector_store.add_document(
-                        document_id=document_id,
-                        text=text,
-                        metadata={"source": "youtube", "url": url, **metadata}
-                    )
-                    if result.get("success"):
-                        doc_id = document_id
-                        chunk_count = result.get("chunk_count", len(chunks))
-                except Exception as e:
-                    logger.warning(f"Could not store embeddings: {e}")
-
-            return {
-                "text": text,
-                "chunks": chunks,
-                "chunk_count": chunk_count,
-                "metadata": metadata,
-                "doc_id": doc_id,
-                "embeddings_stored": doc_id is not None,
-                "success": True
-            }
+    def _youtube_metadata(self, url: str) -> Dict[str, Any]:
+        try:
+            return self.youtube_extractor.get_metadata(url)
+        except Exception:
+            return {"video_url": url, "source": "youtube"}
+
+    def _webpage_metadata(self, url: str) -> Dict[str, Any]:
+        metadata = self.web_extractor.get_metadata(url)
+        metadata["source"] = "web"
+        metadata["url"] = url
+        return metadata
+
+    def process_youtube(
+        self,
+        url: str,
+        document_id: Optional[str] = None,
+        store_embeddings: bool = True
+    ) -> Dict[str, Any]:
+        """Process YouTube video - extracts transcript and creates embeddings."""
+        try:
+            logger.info(f"RAG Pipeline: Processing YouTube URL: {url}")
+            return self._run(
+                self.youtube_extractor.extract_text,
+                self._youtube_metadata,
+                url,
+                "youtube",
+                "Could not extract transcript.",
+                document_id,
+                store_embeddings,
+            )
         except Exception as e:
             logger.error(f"RAG Pipeline: YouTube error: {e}", exc_info=True)
             return {"success": False, "error": str(e)}
@@ -100,46 +198,15 @@ class RAGPipeline:
         """Process web article - extracts content and creates embeddings."""
         try:
             logger.info(f"RAG Pipeline: Processing webpage: {url}")
-
-            text = self.web_extractor.extract_text(url)
-            if not text:
-                return {"success": False, "error": "Could not extract webpage content."}
-
-            metadata = self.web_extractor.get_metadata(url)
-            metadata["source"] = "web"
-            metadata["url"] = url
-
-            try:
-                text = self.gemini_client.ensure_english(text)
-            except Exception as e:
-                logger.warning(f"Could not translate to English: {e}")
-
-            chunks = self.vector_store.chunk_text(text)
-            doc_id = None
-            chunk_count = len(chunks)
-
-            if store_embeddings and document_id:
-                try:
-                    result = self.vector_store.add_document(
-                        document_id=document_id,
-                        text=text,
-                        metadata=metadata
-                    )
-                    if result.get("success"):
-                        doc_id = document_id
-                        chunk_count = result.get("chunk_count", len(chunks))
-                except Exception as e:
-                    logger.warning(f"Could not store embeddings: {e}")
-
-            return {
-                "text": text,
-                "chunks": chunks,
-                "chunk_count": chunk_count,
-                "metadata": metadata,
-                "doc_id": doc_id,
-                "embeddings_stored": doc_id is not None,
-                "success": True
-            }
+            return self._run(
+                self.web_extractor.extract_text,
+                self._webpage_metadata,
+                url,
+                "web",
+                "Could not extract webpage content.",
+                document_id,
+                store_embeddings,
+            )
         except Exception as e:
             logger.error(f"RAG Pipeline: Webpage error: {e}")
             return {"success": False, "error": str(e)}
@@ -236,39 +303,38 @@ class RAGPipeline:
             # Generate embeddings and store in PGVector
             chunk_count = 0
             if store_embeddings and document_id and doc_chunks:
-                # Embed all chunks. The embedder returns new DocumentChunk objects,
-                # so we must keep the returned list before inserting rows.
-                doc_chunks = self.embedder.embed_chunks(doc_chunks)
-                embedded_chunk_count = sum(1 for chunk in doc_chunks if chunk.embedding)
-                if embedded_chunk_count == 0:
-                    raise ValueError("Embedding generation produced no usable chunk vectors")
-
-                # Store in PGVector
+                generated_at = datetime.now().isoformat()
+
+                def build_row(row: int, embedding_str: Optional[str]) -> Dict[str, Any]:
+                    chunk = doc_chunks[row]
+                    chunk_meta = chunk.metadata.copy()
+                    chunk_meta["document_id"] = document_id
+                    chunk_meta["source"] = "file"
+                    chunk_meta["file_path"] = file_path
+                    chunk_meta["embedding_model"] = self.embedder.model_name
+                    chunk_meta["embedding_generated_at"] = generated_at
+
+                    return {
+                        "doc_id": document_id,
+                        "content": chunk.content,
+                        "embedding": embedding_str,
+                        "chunk_index": chunk.index,
+                        "metadata": json.dumps(chunk_meta),
+                        "token_count": chunk.token_count
+                    }
+
+                # Embed and store in PGVector; chunks that failed to embed get a NULL vector
                 db = SessionLocal()
                 try:
-                    for chunk in doc_chunks:
-                        embedding_str = None
-                        if chunk.embedding:
-                            embedding_str = '[' + ','.join(map(str, chunk.embedding)) + ']'
-
-                        chunk_meta = chunk.metadata.copy()
-                        chunk_meta["document_id"] = document_id
-                        chunk_meta["source"] = "file"
-                        chunk_meta["file_path"] = file_path
-
-                        db.execute(sql_text("""
-                            INSERT INTO chunks (document_id, content, embedding, chunk_index, metadata, token_count)
-                            VALUES (CAST(:doc_id AS uuid), :content, CAST(:embedding AS vector), :chunk_index, CAST(:metadata AS jsonb), :token_count)
-                        """), {
-                            "doc_id": document_id,
-                            "content": chunk.content,
-                            "embedding": embedding_str,
-                            "chunk_index": chunk.index,
-                            "metadata": json.dumps(chunk_meta),
-                            "token_count": chunk.token_count
-                        })
-
+                    embedded_chunk_count = self.vector_store.embed_and_insert_chunks(
+                        db,
+                        [chunk.content for chunk in doc_chunks],
+                        build_row,
+                    )
+                    if embedded_chunk_count == 0:
+                        raise ValueError("Embedding generation produced no usable chunk vectors")
                     db.commit()
+                    self.vector_store.record_document_indexed(document_id)
                     chunk_count = len(doc_chunks)
                     logger.info(
                         "RAG Pipeline: Indexed %s chunks for document %s (%s with embeddings)",
@@ -284,15 +350,14 @@ class RAGPipeline:
             else:
                 chunk_count = len(doc_chunks)
 
-            return {
-                "text": markdown_content,
-                "chunk_count": chunk_count,
-                "metadata": {"file_path": file_path, "docling_markdown_path": markdown_path},
-                "markdown_path": markdown_path,
-                "doc_id": document_id if chunk_count > 0 else None,
-                "embeddings_stored": chunk_count > 0 and store_embeddings,
-                "success": True
-            }
+            return self._build_result(
+                text=markdown_content,
+                metadata={"file_path": file_path, "docling_markdown_path": markdown_path},
+                chunk_count=chunk_count,
+                doc_id=document_id if chunk_count > 0 else None,
+                embeddings_stored=chunk_count > 0 and store_embeddings,
+                markdown_path=markdown_path,
+            )
 
         except Exception as e:
             logger.error(f"RAG Pipeline: Document processing error: {e}")
@@ -319,6 +384,27 @@ class RAGPipeline:
             section_pages=section_pages,
         )
 
+    def query_documents_stream(
+        self,
+        question: str,
+        document_id: Optional[str] = None,
+        n_results: int = 5,
+        mode: str = "structured_output",
+        user_id: Optional[str] = None,
+        section_title: Optional[str] = None,
+        section_pages: Optional[List[int]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Query documents using RAG, yielding answer tokens then a final metadata event."""
+        return self.vector_store.rag_query_stream(
+            question=question,
+            n_results=n_results,
+            document_id=document_id,
+            mode=mode,
+            user_id=user_id,
+            section_title=section_title,
+            section_pages=section_pages,
+        )
+
     def search_similar(
         self,
         query: str,
@@ -334,8 +420,8 @@ class RAGPipeline:
             user_id=user_id,
         )
 
-    def get_document_embeddings(self, document_id: str) -> Dict[str, Any]:
-        return self.vector_store.get_document_chunks(document_id)
+    def get_document_embeddings(self, document_id: str, with_embeddings: bool = False) -> Dict[str, Any]:
+        return self.vector_store.get_document_chunks(document_id, with_embeddings=with_embeddings)
 
     def get_vector_store_stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
         return self.vector_store.get_collection_stats(user_id=user_id)
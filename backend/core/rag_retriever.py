@@ -2,12 +2,33 @@
 RAG Retriever - Unified content retrieval for generators
 Uses embeddings when available, falls back to full text extraction
 """
+import copy
 from typing import Dict, Any, Optional
-from core.vector_store import vector_store
+from core.vector_store import VectorStore, get_vector_store
 from core.rag_pipeline import rag_pipeline
+from config.settings import settings
 from documents.upload_handler import upload_handler
+from utils.cache import TTLCache
 from utils.logger import logger
 
+# Retrieval queries used to pull task-relevant chunks for each generator
+_TASK_QUERIES = {
+    "summary": "main points key concepts important information overview",
+    "notes": "detailed information concepts explanations examples definitions",
+    "quiz": "facts definitions concepts terms important details testable information"
+}
+_DEFAULT_TASK_QUERY = "key information important content"
+
+# Quiz evidence needs page/chunk metadata; other tasks only consume text and scores
+_TASK_INCLUDES = {
+    "quiz": ("documents", "metadatas", "distances"),
+}
+_DEFAULT_TASK_INCLUDE = ("documents", "distances")
+
+# Retrieval for a (document, task, chunk_count) is deterministic once a document is indexed
+RAG_CONTENT_CACHE_SIZE = 256
+RAG_CONTENT_CACHE_TTL_SECONDS = 300
+
 
 class RAGRetriever:
     """
@@ -16,10 +37,23 @@ class RAGRetriever:
     """
 
     def __init__(self):
-        self.vector_store = vector_store
         self.rag_pipeline = rag_pipeline
         self.default_chunk_count = 5
         self.min_content_length = 500  # Minimum chars for valid content
+        # Invalidated only by this process's writes, so off with several web workers
+        self._content_cache = TTLCache(
+            maxsize=RAG_CONTENT_CACHE_SIZE if settings.process_local_caches else 0,
+            ttl=RAG_CONTENT_CACHE_TTL_SECONDS
+        )
+
+    @property
+    def vector_store(self) -> VectorStore:
+        """Shared VectorStore, created on first use rather than at import."""
+        return get_vector_store()
+
+    def invalidate_document(self, document_id: str) -> None:
+        """Drop cached RAG content for a document whose embeddings changed"""
+        self._content_cache.discard_where(lambda key: key[0] == document_id)
 
     def get_content_for_generation(
         self,
@@ -114,21 +148,21 @@ class RAGRetriever:
         Returns:
             Dict with content and metadata
         """
+        cache_key = (document_id, task_type, chunk_count)
+        cached = self._content_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
         try:
             # Create a query based on task type
-            task_queries = {
-                "summary": "main points key concepts important information overview",
-                "notes": "detailed information concepts explanations examples definitions",
-                "quiz": "facts definitions concepts terms important details testable information"
-            }
-
-            query = task_queries.get(task_type, "key information important content")
+            query = _TASK_QUERIES.get(task_type, _DEFAULT_TASK_QUERY)
 
             # Query vector store for this specific document
             results = self.vector_store.query(
                 query_text=query,
                 n_results=chunk_count,
-                document_id=document_id
+                document_id=document_id,
+                include=_TASK_INCLUDES.get(task_type, _DEFAULT_TASK_INCLUDE)
             )
 
             if not results.get("success") or not results.get("results"):
@@ -145,13 +179,17 @@ class RAGRetriever:
 
             combined_content = "\n\n".join(content_parts)
 
-            return {
+            rag_content = {
                 "success": True,
                 "content": combined_content,
                 "chunks_used": len(chunks),
                 "similarity_scores": [c.get("similarity") for c in chunks],
                 "chunks": chunks,
             }
+            # Callers get their own copy (chunks end up in response metadata), so
+            # downstream mutation can't corrupt the cached entry
+            self._content_cache.set(cache_key, rag_content)
+            return copy.deepcopy(rag_content)
 
         except Exception as e:
             logger.error(f"RAGRetriever: RAG retrieval error: {e}")
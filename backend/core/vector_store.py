@@ -2,19 +2,71 @@
 Vector store operations using PGVector for PostgreSQL-native vector search.
 Replaces ChromaDB with pgvector for embedding storage and similarity search.
 """
+import asyncio
 import json
+import queue
 import re
+import threading
+import time
 import uuid
-from typing import List, Dict, Any, Optional, Literal
+import weakref
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, List, Dict, Any, Iterator, Optional, Literal, Sequence, Set, Tuple, Union
+import numpy as np
 from sqlalchemy import text
 from config.settings import settings
 from config.database import SessionLocal
 from core.ingestion.embedder import get_embedder
+from utils.cache import AnswerCache, TTLCache
 from utils.logger import logger
 from utils.rag_llm_client import RAGLLMClient, safe_load_json
 
 RAGMode = Literal["structured_output", "file_search", "nli_verification"]
+QueryInclude = Literal["documents", "metadatas", "distances"]
+QUERY_INCLUDE_ALL = ("documents", "metadatas", "distances")
 SECTION_SCOPE_SPLIT_RE = re.compile(r"\s+/\s+")
+# Sentence end followed by a space or newline; matches are always two characters long
+SENTENCE_BOUNDARY_RE = re.compile(r"[.!?][ \n]")
+# Local model inference is CPU/GPU bound; a couple of concurrent ingests is enough to
+# overlap DB writes with the next document's forward passes without oversubscribing.
+ADD_DOCUMENT_CONCURRENCY = 2
+INSERT_CHUNK_PREFIX = "INSERT INTO chunks (document_id, content, embedding, chunk_index, metadata, token_count) VALUES "
+INSERT_CHUNK_ROW = (
+    "(CAST(:doc_id_{i} AS uuid), :content_{i}, CAST(:embedding_{i} AS vector), "
+    ":chunk_index_{i}, CAST(:metadata_{i} AS jsonb), :token_count_{i})"
+)
+# Answers are reused for the same normalized question in the same scope; any write to a
+# document drops its answers and all unscoped ones. Matching paraphrases by query embedding
+# is opt-in (RAG_ANSWER_CACHE_SEMANTIC): bge-small puts negated pairs ("what is X" / "what
+# is not X") above 0.95, so the threshold stays at a near-duplicate level.
+RAG_ANSWER_CACHE_SIMILARITY = 0.98
+RAG_ANSWER_CACHE_SCOPES = 256
+RAG_ANSWER_CACHE_TTL_SECONDS = 3600
+# Ingest pipeline: the caller's thread embeds one slice of chunks while a writer thread
+# inserts the previous one; at most EMBED_PIPELINE_DEPTH embedded slices wait for the writer.
+EMBED_PIPELINE_SLICE = 128
+EMBED_PIPELINE_DEPTH = 2
+# pgvector stores float32; six significant digits round-trip unit vectors with cosine
+# error ~1e-7 while halving literal size versus str(float) and formatting faster.
+PGVECTOR_LITERAL_FORMAT = "%.6g"
+# Stats are polled by dashboards; writes invalidate explicitly, the TTL bounds staleness
+# from writers in other processes.
+COLLECTION_STATS_CACHE_SIZE = 128
+COLLECTION_STATS_CACHE_TTL_SECONDS = 60
+# The in-process document id set is kept current by this process's writes; the reload
+# interval picks up cascaded deletes and writes made by other processes.
+DOCUMENT_ID_SET_RELOAD_SECONDS = 300
+
+
+def to_pgvector_literal(embedding: Union[Sequence[float], np.ndarray]) -> str:
+    """
+    Format an embedding (list or float32 ndarray row) as a pgvector text literal.
+    Components are written with PGVECTOR_LITERAL_FORMAT rather than full float64 repr.
+    """
+    if isinstance(embedding, np.ndarray):
+        embedding = embedding.tolist()
+    return '[' + ','.join(map(PGVECTOR_LITERAL_FORMAT.__mod__, embedding)) + ']'
 
 
 def _coerce_answer_text(value: Any) -> str:
@@ -141,6 +193,69 @@ def _result_matches_section_title(
     return False
 
 
+def _format_rag_context(results: List[Dict[str, Any]]) -> str:
+    """Render retrieved chunks as labelled source blocks for the answer prompt."""
+    context_parts = []
+    for i, result in enumerate(results):
+        meta = result.get("metadata", {})
+        pages = meta.get("page_numbers") or []
+        page_label = ", ".join(str(page) for page in pages) if pages else meta.get("page_number", "Unknown")
+        title = meta.get("document_title", f"Source {i+1}")
+        modality = meta.get("source_modality") or meta.get("chunk_method") or "text"
+        context_parts.append(
+            f"[Source {i+1} | {title} | pages={page_label} | modality={modality}]\n{result['text']}"
+        )
+    return "\n\n".join(context_parts)
+
+
+RAG_PROMPT_HEADER = """You are a helpful study assistant. Using ONLY the provided context, answer the user's question accurately.
+
+CITATION RULES (MANDATORY):
+- You MUST cite sources using numbered references [1], [2], [3] etc. that match the source numbers in the context below.
+- Place citations INLINE immediately after the claim they support, e.g. "The cell membrane is semi-permeable [1]."
+- If multiple sources support one claim, cite them all together: [1][3].
+- Every factual statement MUST have at least one citation.
+- Use Markdown formatting for your answer (bold, headers, lists).
+- If the answer is not in the context, clearly state that.
+"""
+RAG_STRUCTURED_RULE = "- In the citations array, list every citation you used with the exact source quote that supports it.\n"
+RAG_PLAIN_TEXT_RULE = "- Return only the final answer in Markdown, not JSON.\n"
+RAG_CITATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {
+            "type": "string",
+            "description": "The full answer in Markdown format with inline [N] citations matching source numbers"
+        },
+        "citations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source_index": {"type": "integer"},
+                    "claim": {"type": "string"},
+                    "source_quote": {"type": "string"}
+                },
+                "required": ["source_index", "claim", "source_quote"]
+            }
+        }
+    },
+    "required": ["answer", "citations"]
+}
+
+
+def _build_rag_prompt(final_rule: str, scope_line: str, context: str, question: str) -> str:
+    """Assemble the RAG answer prompt in a single join."""
+    return "".join((RAG_PROMPT_HEADER, final_rule, scope_line, "\nContext:\n", context, "\n\nQuestion: ", question))
+
+
+def _answer_error_message(error: str) -> str:
+    """User-facing message for a failed answer generation."""
+    if "429" in error or "RESOURCE_EXHAUSTED" in error:
+        return "API quota exceeded. Please wait a few seconds or try again later."
+    return f"Error generating answer: {error}"
+
+
 def _build_section_scope_label(section_title: Optional[str], section_pages: Optional[List[int]]) -> Optional[str]:
     pages = _normalize_section_pages(section_pages)
     if not section_title and not pages:
@@ -159,6 +274,27 @@ class VectorStore:
         """Initialize vector store with PGVector and local embeddings"""
         self.embedder = get_embedder()
         self.answer_client = RAGLLMClient()
+        # Invalidation (record_document_indexed/removed) only reaches this process, so with
+        # several web workers nothing is cached and the document id set is reloaded per call
+        caches = settings.process_local_caches
+        self._stats_cache = TTLCache(
+            maxsize=COLLECTION_STATS_CACHE_SIZE if caches else 0,
+            ttl=COLLECTION_STATS_CACHE_TTL_SECONDS,
+        )
+        self._answer_cache = AnswerCache(
+            maxsize=RAG_ANSWER_CACHE_SCOPES if caches else 0,
+            ttl=RAG_ANSWER_CACHE_TTL_SECONDS,
+            semantic_threshold=RAG_ANSWER_CACHE_SIMILARITY if caches and settings.RAG_ANSWER_CACHE_SEMANTIC else None,
+        )
+        self._document_ids: Optional[Set[str]] = None
+        self._document_ids_loaded_at = 0.0
+        self._document_ids_reload_seconds = DOCUMENT_ID_SET_RELOAD_SECONDS if caches else 0
+        self._document_ids_lock = threading.Lock()
+        # A semaphore binds to the loop that first waits on it, so each running loop
+        # (the server's, or one per asyncio.run in scripts) gets its own
+        self._add_document_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
         logger.info(f"VectorStore initialized with PGVector (embedding dim={settings.EMBEDDING_DIMENSION})")
 
     def _get_db(self):
@@ -169,9 +305,140 @@ class VectorStore:
         """Generate embedding for a document text using local HuggingFace model"""
         return self.embedder.generate_embedding(text)
 
-    def _generate_query_embedding(self, text: str) -> List[float]:
+    def _generate_query_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for a query (with query instruction prefix)"""
-        return self.embedder.generate_query_embedding(text)
+        return self.embedder.generate_query_embedding_array(text)
+
+    def prime_query_embeddings(self, queries: Sequence[Tuple[str, Optional[str]]]) -> None:
+        """
+        Embed many (query_text, section_title) pairs in shared forward passes so that
+        the following query() calls for them are served from the query-embedding cache.
+        """
+        self.embedder.generate_query_embeddings_array(
+            [_scope_query_text(query_text, section_title) for query_text, section_title in queries]
+        )
+
+    def invalidate_stats(self) -> None:
+        """Drop cached collection stats; call after committing chunk inserts or deletes."""
+        self._stats_cache.clear()
+
+    def invalidate_answers(self, document_id: str) -> None:
+        """Drop cached RAG answers scoped to document_id and all unscoped (cross-document) answers."""
+        document_id = str(document_id)
+        self._answer_cache.discard_where(lambda scope: scope[1] is None or scope[1] == document_id)
+
+    def _invalidate_retrieved_content(self, document_id: str) -> None:
+        """Drop the generators' cached retrieval for document_id (RAGRetriever content cache)."""
+        # Imported lazily: the retriever module imports this one
+        from core.rag_retriever import rag_retriever
+        rag_retriever.invalidate_document(str(document_id))
+
+    def record_document_indexed(self, document_id: str) -> None:
+        """Track a document whose chunks were just committed."""
+        with self._document_ids_lock:
+            if self._document_ids is not None:
+                self._document_ids.add(str(document_id))
+        self.invalidate_answers(document_id)
+        self._invalidate_retrieved_content(document_id)
+        self.invalidate_stats()
+
+    def record_document_removed(self, document_id: str) -> None:
+        """Forget a document whose chunks were just deleted."""
+        with self._document_ids_lock:
+            if self._document_ids is not None:
+                self._document_ids.discard(str(document_id))
+        self.invalidate_answers(document_id)
+        self._invalidate_retrieved_content(document_id)
+        self.invalidate_stats()
+
+    def _indexed_document_ids(self) -> Set[str]:
+        """Snapshot of document ids that have chunks, loaded with one query and then maintained in-process."""
+        with self._document_ids_lock:
+            expired = time.monotonic() - self._document_ids_loaded_at >= self._document_ids_reload_seconds
+            if self._document_ids is None or expired:
+                db = self._get_db()
+                try:
+                    rows = db.execute(text("SELECT DISTINCT document_id::text FROM chunks"))
+                    self._document_ids = {row[0] for row in rows}
+                finally:
+                    db.close()
+                self._document_ids_loaded_at = time.monotonic()
+            return set(self._document_ids)
+
+    def _add_document_semaphore(self) -> asyncio.Semaphore:
+        """ADD_DOCUMENT_CONCURRENCY bound for the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._add_document_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._add_document_semaphores.setdefault(loop, asyncio.Semaphore(ADD_DOCUMENT_CONCURRENCY))
+        return semaphore
+
+    def insert_chunk_rows(self, db, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insert prepared chunk rows (doc_id, content, embedding, chunk_index, metadata,
+        token_count) as multi-row INSERT statements of up to VECTOR_INSERT_BATCH_SIZE
+        rows each. The caller owns the transaction.
+        """
+        batch_size = max(1, settings.VECTOR_INSERT_BATCH_SIZE)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params: Dict[str, Any] = {}
+            for i, row in enumerate(batch):
+                for key, value in row.items():
+                    params[f"{key}_{i}"] = value
+            values = ", ".join(INSERT_CHUNK_ROW.format(i=i) for i in range(len(batch)))
+            db.execute(text(INSERT_CHUNK_PREFIX + values), params)
+
+    def embed_and_insert_chunks(
+        self,
+        db,
+        texts: List[str],
+        build_row: Callable[[int, Optional[str]], Dict[str, Any]],
+    ) -> int:
+        """
+        Embed texts and insert their chunk rows as a two-stage pipeline so forward
+        passes overlap with database writes.
+
+        build_row(index, embedding_literal) returns the row for texts[index]; the
+        literal is None when that text could not be embedded. Returns the number of
+        rows stored with an embedding. The caller owns the transaction.
+        """
+        pending: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=EMBED_PIPELINE_DEPTH)
+        errors: List[BaseException] = []
+
+        def write_rows() -> None:
+            while True:
+                rows = pending.get()
+                if rows is None:
+                    return
+                if errors:
+                    continue  # keep draining so the producer never blocks on a full queue
+                try:
+                    self.insert_chunk_rows(db, rows)
+                except BaseException as e:
+                    errors.append(e)
+
+        writer = threading.Thread(target=write_rows, name="chunk-writer", daemon=True)
+        writer.start()
+        embedded = 0
+        try:
+            for start in range(0, len(texts), EMBED_PIPELINE_SLICE):
+                if errors:
+                    break
+                embeddings = self.embedder.generate_embeddings_array(texts[start:start + EMBED_PIPELINE_SLICE])
+                has_embedding = embeddings.any(axis=1)
+                embedded += int(np.count_nonzero(has_embedding))
+                pending.put([
+                    build_row(start + offset, to_pgvector_literal(embedding) if has_embedding[offset] else None)
+                    for offset, embedding in enumerate(embeddings)
+                ])
+        finally:
+            pending.put(None)
+            writer.join()
+
+        if errors:
+            raise errors[0]
+        return embedded
 
     def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """
@@ -179,27 +446,38 @@ class VectorStore:
         Simple character-based chunking for backward compatibility.
         For Docling-aware chunking, use the ingestion pipeline instead.
         """
-        chunks = []
+        # (start, end, slice_end): slice_end drops the known whitespace after a sentence boundary
+        spans: List[Tuple[int, int, int]] = []
         start = 0
         text_len = len(text)
+        min_split = chunk_size * 0.5
+
+        # Offsets just past every sentence boundary, found in a single regex pass
+        boundaries = [match.end() for match in SENTENCE_BOUNDARY_RE.finditer(text)]
 
         while start < text_len:
             end = min(start + chunk_size, text_len)
+            slice_end = end
 
             if end < text_len:
-                for sep in ['. ', '.\n', '! ', '!\n', '? ', '?\n']:
-                    last_sep = text[start:end].rfind(sep)
-                    if last_sep > chunk_size * 0.5:
-                        end = start + last_sep + len(sep)
-                        break
-
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-
+                # Latest boundary that fits in the window and lies past its midpoint
+                index = bisect_right(boundaries, end) - 1
+                if index >= 0 and boundaries[index] - 2 - start > min_split:
+                    end = boundaries[index]
+                    # Chunk ends "<punct><space>": drop the space, the punctuation is kept as-is
+                    slice_end = end - 1
+
+            spans.append((start, end, slice_end))
             start = end - overlap if end < text_len else text_len
 
-        return chunks
+        # Slice only once per chunk, after all split points are known. Boundary chunks
+        # end on punctuation, so only their start needs trimming; str.lstrip returns
+        # the same object when there is nothing to remove, avoiding a second copy.
+        chunks = (
+            text[span_start:slice_end].lstrip() if slice_end != span_end else text[span_start:span_end].strip()
+            for span_start, span_end, slice_end in spans
+        )
+        return [chunk for chunk in chunks if chunk]
 
     def add_document(
         self,
@@ -218,47 +496,48 @@ class VectorStore:
 
             logger.info(f"VectorStore: Created {len(chunks)} chunks for {document_id}")
 
-            # Generate embeddings in batch
-            embeddings = self.embedder.generate_embeddings_batch(chunks)
-            logger.info(f"VectorStore: Generated {len(embeddings)} embeddings for {document_id}")
+            # Caller metadata is identical for every chunk; coerce it once
+            base_meta = {
+                k: str(v) if not isinstance(v, (str, int, float, bool)) else v
+                for k, v in (metadata or {}).items()
+            }
+            total_chunks = len(chunks)
+
+            def build_row(i: int, embedding_literal: Optional[str]) -> Dict[str, Any]:
+                chunk = chunks[i]
+                chunk_meta = {
+                    "document_id": document_id,
+                    "chunk_index": i,
+                    "total_chunks": total_chunks,
+                    "chunk_length": len(chunk),
+                    **base_meta
+                }
+
+                return {
+                    "doc_id": document_id,
+                    "content": chunk,
+                    "embedding": embedding_literal,
+                    "chunk_index": i,
+                    "metadata": json.dumps(chunk_meta),
+                    "token_count": len(chunk.split())
+                }
 
             db = self._get_db()
             try:
-                for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                    chunk_meta = {
-                        "document_id": document_id,
-                        "chunk_index": i,
-                        "total_chunks": len(chunks),
-                        "chunk_length": len(chunk)
-                    }
-                    if metadata:
-                        chunk_meta.update({
-                            k: str(v) if not isinstance(v, (str, int, float, bool)) else v
-                            for k, v in metadata.items()
-                        })
-
-                    embedding_str = '[' + ','.join(map(str, embedding)) + ']'
-
-                    db.execute(text("""
-                        INSERT INTO chunks (document_id, content, embedding, chunk_index, metadata, token_count)
-                        VALUES (CAST(:doc_id AS uuid), :content, CAST(:embedding AS vector), :chunk_index, CAST(:metadata AS jsonb), :token_count)
-                    """), {
-                        "doc_id": document_id,
-                        "content": chunk,
-                        "embedding": embedding_str,
-                        "chunk_index": i,
-                        "metadata": json.dumps(chunk_meta),
-                        "token_count": len(chunk.split())
-                    })
-
+                embedded = self.embed_and_insert_chunks(db, chunks, build_row)
+                if embedded == 0:
+                    raise ValueError("Embedding generation produced no usable chunk vectors")
+                logger.info(f"VectorStore: Generated {embedded} embeddings for {document_id}")
                 db.commit()
+                self.record_document_indexed(document_id)
                 logger.info(f"VectorStore: Added document {document_id} with {len(chunks)} chunks")
 
                 return {
                     "success": True,
                     "document_id": document_id,
                     "chunk_count": len(chunks),
-                    "chunk_ids": [f"{document_id}_chunk_{i}" for i in range(len(chunks))]
+                    "chunk_ids": [f"{document_id}_chunk_{i}" for i in range(len(chunks))],
+                    "chunks": chunks
                 }
             except Exception:
                 db.rollback()
@@ -270,6 +549,19 @@ class VectorStore:
             logger.error(f"Error adding document {document_id}: {e}")
             return {"success": False, "error": str(e)}
 
+    async def aadd_document(
+        self,
+        document_id: str,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Async variant of add_document for event-loop callers.
+        Runs chunking, embedding and insert in a worker thread, bounded by ADD_DOCUMENT_CONCURRENCY.
+        """
+        async with self._add_document_semaphore():
+            return await asyncio.to_thread(self.add_document, document_id, text, metadata)
+
     def query(
         self,
         query_text: str,
@@ -278,66 +570,88 @@ class VectorStore:
         user_id: Optional[str] = None,
         section_title: Optional[str] = None,
         section_pages: Optional[List[int]] = None,
+        include: Sequence[QueryInclude] = QUERY_INCLUDE_ALL,
     ) -> Dict[str, Any]:
         """
         Query PGVector for similar chunks using cosine similarity.
+
+        `include` selects which result fields are fetched and returned:
+        "documents" (chunk text), "metadatas" (chunk + document metadata) and
+        "distances" (distance/similarity). Section scoping fetches what it needs.
         """
         try:
             scoped_query_text = _scope_query_text(query_text, section_title)
             normalized_section_titles = _expand_section_scope_titles(section_title)
             normalized_section_pages = _normalize_section_pages(section_pages)
             query_embedding = self._generate_query_embedding(scoped_query_text)
-            embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
+            embedding_str = to_pgvector_literal(query_embedding)
             fetch_count = (
                 n_results
                 if not normalized_section_pages and not normalized_section_titles
                 else max(n_results * 8, 40)
             )
 
+            include_text = "documents" in include
+            include_metadata = "metadatas" in include
+            include_distances = "distances" in include
+            fetch_text = include_text or bool(normalized_section_titles)
+            fetch_metadata = include_metadata or bool(normalized_section_pages)
+
+            select_columns = ["1 - (c.embedding <=> CAST(:query_embedding AS vector)) AS similarity"]
+            if fetch_text:
+                select_columns.append("c.content")
+            if fetch_metadata:
+                select_columns.extend([
+                    "c.document_id",
+                    "c.metadata",
+                    "c.chunk_index",
+                    "d.title AS document_title",
+                    "d.original_filename",
+                    "d.file_path",
+                ])
+
+            # Only emit the predicates that apply: a literal document_id equality lets the
+            # planner scan idx_chunks_document_id instead of walking the ANN index and
+            # discarding other documents' chunks, which a catch-all "IS NULL OR" hides
+            filters = ["c.embedding IS NOT NULL"]
+            params: Dict[str, Any] = {"query_embedding": embedding_str, "match_count": fetch_count}
+            if document_id:
+                filters.append("c.document_id = CAST(:filter_doc_id AS uuid)")
+                params["filter_doc_id"] = document_id
+            if user_id:
+                filters.append("d.user_id = CAST(:filter_user_id AS uuid)")
+                params["filter_user_id"] = user_id
+            join_documents = "JOIN documents d ON d.id = c.document_id" if fetch_metadata or user_id else ""
+
             db = self._get_db()
             try:
-                result = db.execute(text("""
-                    SELECT
-                        c.id AS chunk_id,
-                        c.document_id,
-                        c.content,
-                        c.metadata,
-                        c.chunk_index,
-                        c.token_count,
-                        d.title AS document_title,
-                        d.original_filename,
-                        d.file_path,
-                        1 - (c.embedding <=> CAST(:query_embedding AS vector)) AS similarity
+                result = db.execute(text(f"""
+                    SELECT {", ".join(select_columns)}
                     FROM chunks c
-                    JOIN documents d ON d.id = c.document_id
-                    WHERE c.embedding IS NOT NULL
-                      AND (:filter_user_id IS NULL OR d.user_id = CAST(:filter_user_id AS uuid))
-                      AND (:filter_doc_id IS NULL OR c.document_id = CAST(:filter_doc_id AS uuid))
+                    {join_documents}
+                    WHERE {" AND ".join(filters)}
                     ORDER BY c.embedding <=> CAST(:query_embedding AS vector)
                     LIMIT :match_count
-                """), {
-                    "query_embedding": embedding_str,
-                    "match_count": fetch_count,
-                    "filter_doc_id": document_id,
-                    "filter_user_id": user_id,
-                })
+                """), params)
 
                 formatted_results = []
                 for row in result:
-                    meta = row.metadata if isinstance(row.metadata, dict) else json.loads(row.metadata or '{}')
-                    meta = {
-                        **meta,
-                        "chunk_index": row.chunk_index,
-                        "document_id": str(row.document_id),
-                        "document_title": row.document_title,
-                        "document_source": row.file_path or row.original_filename or row.document_title,
-                    }
-                    formatted_results.append({
-                        "text": row.content,
-                        "metadata": meta,
-                        "distance": 1 - row.similarity,
-                        "similarity": row.similarity
-                    })
+                    result_item: Dict[str, Any] = {}
+                    if fetch_text:
+                        result_item["text"] = row.content
+                    if fetch_metadata:
+                        meta = row.metadata if isinstance(row.metadata, dict) else json.loads(row.metadata or '{}')
+                        result_item["metadata"] = {
+                            **meta,
+                            "chunk_index": row.chunk_index,
+                            "document_id": str(row.document_id),
+                            "document_title": row.document_title,
+                            "document_source": row.file_path or row.original_filename or row.document_title,
+                        }
+                    if include_distances:
+                        result_item["distance"] = 1 - row.similarity
+                        result_item["similarity"] = row.similarity
+                    formatted_results.append(result_item)
 
                 if normalized_section_pages:
                     formatted_results = [
@@ -363,7 +677,14 @@ class VectorStore:
 
                 formatted_results = formatted_results[:n_results]
 
-                logger.info(f"Query returned {len(formatted_results)} results")
+                if fetch_text and not include_text:
+                    for result_item in formatted_results:
+                        result_item.pop("text", None)
+                if fetch_metadata and not include_metadata:
+                    for result_item in formatted_results:
+                        result_item.pop("metadata", None)
+
+                logger.info("Query returned %d results", len(formatted_results))
                 return {
                     "success": True,
                     "query": query_text,
@@ -399,18 +720,7 @@ class VectorStore:
         if not results.get("success") or not results.get("results"):
             return {"context": "", "results": []}
 
-        context_parts = []
-        for i, result in enumerate(results["results"]):
-            meta = result.get("metadata", {})
-            pages = meta.get("page_numbers") or []
-            page_label = ", ".join(str(page) for page in pages) if pages else meta.get("page_number", "Unknown")
-            title = meta.get("document_title", f"Source {i+1}")
-            modality = meta.get("source_modality") or meta.get("chunk_method") or "text"
-            context_parts.append(
-                f"[Source {i+1} | {title} | pages={page_label} | modality={modality}]\n{result['text']}"
-            )
-
-        return {"context": "\n\n".join(context_parts), "results": results["results"]}
+        return {"context": _format_rag_context(results["results"]), "results": results["results"]}
 
     def rag_query(
         self,
@@ -425,14 +735,33 @@ class VectorStore:
         """
         Full RAG query: retrieves context from PGVector, generates answer with Groq.
         """
-        logger.info(f"RAG query mode={mode}, question={question[:80]}")
+        logger.info("RAG query mode=%s, question=%.80s", mode, question)
+
+        scope = (user_id, document_id, mode, n_results, section_title, tuple(section_pages or ()))
+        query_embedding = None
+        if self._answer_cache.semantic:
+            # Same embedding retrieval uses, so this is a cache hit for query() below
+            try:
+                query_embedding = self._generate_query_embedding(_scope_query_text(question, section_title))
+            except Exception as e:
+                logger.warning(f"Could not embed question for answer cache: {e}")
+            if query_embedding is not None and not query_embedding.any():
+                query_embedding = None
+        cached = self._answer_cache.get(scope, question, query_embedding)
+        if cached is not None:
+            logger.info("RAG answer served from answer cache")
+            return dict(cached)
 
         if mode == "file_search":
-            return self._rag_file_search(question, document_id, user_id, section_title, section_pages)
+            result = self._rag_file_search(question, document_id, user_id, section_title, section_pages)
         elif mode == "nli_verification":
-            return self._rag_nli_verified(question, n_results, document_id, user_id, section_title, section_pages)
+            result = self._rag_nli_verified(question, n_results, document_id, user_id, section_title, section_pages)
         else:
-            return self._rag_structured_output(question, n_results, document_id, user_id, section_title, section_pages)
+            result = self._rag_structured_output(question, n_results, document_id, user_id, section_title, section_pages)
+
+        if result.get("success"):
+            self._answer_cache.set(scope, question, dict(result), query_embedding)
+        return result
 
     def _rag_structured_output(
         self,
@@ -445,7 +774,7 @@ class VectorStore:
     ) -> Dict[str, Any]:
         """Structured output mode with provider-aware answer generation."""
         try:
-            retrieval = self.query_with_context(
+            retrieval = self.query(
                 question,
                 n_results,
                 document_id,
@@ -453,8 +782,9 @@ class VectorStore:
                 section_title,
                 section_pages,
             )
-            context = retrieval.get("context", "")
-            sources = retrieval.get("results", [])
+            # Context and sources both come from this single retrieval
+            sources = retrieval.get("results", []) if retrieval.get("success") else []
+            context = _format_rag_context(sources)
             scope_label = _build_section_scope_label(section_title, section_pages)
 
             if not context:
@@ -465,52 +795,15 @@ class VectorStore:
                     "mode": "structured_output"
                 }
 
-            citation_schema = {
-                "type": "object",
-                "properties": {
-                    "answer": {
-                        "type": "string",
-                        "description": "The full answer in Markdown format with inline [N] citations matching source numbers"
-                    },
-                    "citations": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "source_index": {"type": "integer"},
-                                "claim": {"type": "string"},
-                                "source_quote": {"type": "string"}
-                            },
-                            "required": ["source_index", "claim", "source_quote"]
-                        }
-                    }
-                },
-                "required": ["answer", "citations"]
-            }
-
             scope_line = f"\nSection scope: {scope_label}\n" if scope_label else "\n"
-            prompt = f"""You are a helpful study assistant. Using ONLY the provided context, answer the user's question accurately.
-
-CITATION RULES (MANDATORY):
-- You MUST cite sources using numbered references [1], [2], [3] etc. that match the source numbers in the context below.
-- Place citations INLINE immediately after the claim they support, e.g. "The cell membrane is semi-permeable [1]."
-- If multiple sources support one claim, cite them all together: [1][3].
-- Every factual statement MUST have at least one citation.
-- Use Markdown formatting for your answer (bold, headers, lists).
-- If the answer is not in the context, clearly state that.
-- In the citations array, list every citation you used with the exact source quote that supports it.
-{scope_line}
-Context:
-{context}
-
-Question: {question}"""
+            prompt = _build_rag_prompt(RAG_STRUCTURED_RULE, scope_line, context, question)
 
             mode = "structured_output"
             response_text = self.answer_client.generate_json(
                 prompt=prompt,
                 temperature=0.2,
                 max_tokens=1500,
-                schema=citation_schema,
+                schema=RAG_CITATION_SCHEMA,
             )
 
             # Parse structured response
@@ -531,21 +824,7 @@ Question: {question}"""
                 logger.warning(
                     "Structured output provider returned an empty answer; falling back to plain-text synthesis"
                 )
-                fallback_prompt = f"""You are a helpful study assistant. Using ONLY the provided context, answer the user's question accurately.
-
-CITATION RULES (MANDATORY):
-- You MUST cite sources using numbered references [1], [2], [3] etc. that match the source numbers in the context below.
-- Place citations INLINE immediately after the claim they support, e.g. "The cell membrane is semi-permeable [1]."
-- If multiple sources support one claim, cite them all together: [1][3].
-- Every factual statement MUST have at least one citation.
-- Use Markdown formatting for your answer (bold, headers, lists).
-- If the answer is not in the context, clearly state that.
-- Return only the final answer in Markdown, not JSON.
-{scope_line}
-Context:
-{context}
-
-Question: {question}"""
+                fallback_prompt = _build_rag_prompt(RAG_PLAIN_TEXT_RULE, scope_line, context, question)
                 answer = _coerce_answer_text(self.answer_client.generate_text(
                     prompt=fallback_prompt,
                     temperature=0.2,
@@ -566,17 +845,93 @@ Question: {question}"""
 
         except Exception as e:
             error_str = str(e)
-            user_msg = f"Error generating answer: {error_str}"
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                user_msg = "API quota exceeded. Please wait a few seconds or try again later."
             logger.error(f"Error in structured output RAG: {error_str}")
             return {
                 "success": False,
                 "error": error_str,
-                "answer": user_msg,
+                "answer": _answer_error_message(error_str),
                 "mode": "structured_output"
             }
 
+    def rag_query_stream(
+        self,
+        question: str,
+        n_results: int = 5,
+        document_id: Optional[str] = None,
+        mode: RAGMode = "structured_output",
+        user_id: Optional[str] = None,
+        section_title: Optional[str] = None,
+        section_pages: Optional[List[int]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming RAG query: yields {"token": text} events as the answer is generated,
+        then a final {"event": "done", ...} event carrying sources and metadata
+        (or {"event": "error", ...} on failure).
+
+        Only structured_output retrieval can stream; it asks for a plain Markdown
+        answer since a JSON citation payload is unusable until complete. Other modes
+        run rag_query() and emit its answer as a single token event.
+        """
+        logger.info("RAG stream query mode=%s, question=%.80s", mode, question)
+
+        if mode != "structured_output":
+            result = self.rag_query(question, n_results, document_id, mode, user_id, section_title, section_pages)
+            if result.get("answer"):
+                yield {"token": result["answer"]}
+            yield {
+                "event": "done" if result.get("success") else "error",
+                **{key: value for key, value in result.items() if key != "answer"},
+            }
+            return
+
+        try:
+            retrieval = self.query(
+                question,
+                n_results,
+                document_id,
+                user_id,
+                section_title,
+                section_pages,
+            )
+            sources = retrieval.get("results", []) if retrieval.get("success") else []
+            context = _format_rag_context(sources)
+
+            if not context:
+                yield {
+                    "event": "error",
+                    "success": False,
+                    "error": "No relevant context found",
+                    "answer": "I couldn't find relevant information in your documents to answer this question.",
+                    "mode": mode
+                }
+                return
+
+            scope_label = _build_section_scope_label(section_title, section_pages)
+            scope_line = f"\nSection scope: {scope_label}\n" if scope_label else "\n"
+            prompt = _build_rag_prompt(RAG_PLAIN_TEXT_RULE, scope_line, context, question)
+
+            for token in self.answer_client.stream_text(prompt=prompt, temperature=0.2, max_tokens=1500):
+                yield {"token": token}
+
+            yield {
+                "event": "done",
+                "success": True,
+                "sources": sources,
+                "context_used": context[:500] + "..." if len(context) > 500 else context,
+                "mode": mode
+            }
+
+        except Exception as e:
+            error_str = str(e)
+            logger.error(f"Error in streaming RAG: {error_str}")
+            yield {
+                "event": "error",
+                "success": False,
+                "error": error_str,
+                "answer": _answer_error_message(error_str),
+                "mode": mode
+            }
+
     def _rag_file_search(
         self,
         question: str,
@@ -709,13 +1064,19 @@ Source passage: "{source_text}"
                 "mode": "nli_verification"
             }
 
-    def get_document_chunks(self, document_id: str) -> Dict[str, Any]:
-        """Get all chunks for a specific document from PGVector."""
+    def get_document_chunks(self, document_id: str, with_embeddings: bool = False) -> Dict[str, Any]:
+        """
+        Get all chunks for a specific document from PGVector.
+
+        Embedding vectors are only selected when with_embeddings is set; they
+        dominate the row size and most callers only need the text.
+        """
         try:
             db = self._get_db()
             try:
-                result = db.execute(text("""
-                    SELECT id, content, chunk_index, metadata, token_count
+                embedding_column = ", embedding::text AS embedding" if with_embeddings else ""
+                result = db.execute(text(f"""
+                    SELECT id, content, chunk_index, metadata, token_count{embedding_column}
                     FROM chunks
                     WHERE document_id = CAST(:doc_id AS uuid)
                     ORDER BY chunk_index
@@ -724,11 +1085,14 @@ Source passage: "{source_text}"
                 chunks = []
                 for row in result:
                     meta = row.metadata if isinstance(row.metadata, dict) else json.loads(row.metadata or '{}')
-                    chunks.append({
+                    chunk = {
                         "id": str(row.id),
                         "text": row.content,
                         "metadata": meta
-                    })
+                    }
+                    if with_embeddings:
+                        chunk["embedding"] = json.loads(row.embedding) if row.embedding else None
+                    chunks.append(chunk)
 
                 return {
                     "success": True,
@@ -745,38 +1109,54 @@ Source passage: "{source_text}"
 
     def get_collection_stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Get statistics about the PGVector store."""
+        cached = self._stats_cache.get(user_id)
+        if cached is not None:
+            return cached
+
         try:
             db = self._get_db()
             try:
-                chunk_count = db.execute(text("""
-                    SELECT COUNT(*)
-                    FROM chunks c
-                    JOIN documents d ON d.id = c.document_id
-                    WHERE (:filter_user_id IS NULL OR d.user_id = CAST(:filter_user_id AS uuid))
-                """), {"filter_user_id": user_id}).scalar()
-                doc_count = db.execute(text("""
-                    SELECT COUNT(DISTINCT c.document_id)
-                    FROM chunks c
-                    JOIN documents d ON d.id = c.document_id
-                    WHERE (:filter_user_id IS NULL OR d.user_id = CAST(:filter_user_id AS uuid))
-                """), {"filter_user_id": user_id}).scalar()
-                doc_ids_result = db.execute(text("""
-                    SELECT DISTINCT c.document_id::text
-                    FROM chunks c
-                    JOIN documents d ON d.id = c.document_id
-                    WHERE (:filter_user_id IS NULL OR d.user_id = CAST(:filter_user_id AS uuid))
-                    LIMIT 100
-                """), {"filter_user_id": user_id})
-                doc_ids = [row[0] for row in doc_ids_result]
+                if user_id is None:
+                    # Unscoped: document ids come from the in-process set, only the chunk count hits the DB
+                    chunk_count = db.execute(text("SELECT COUNT(*) FROM chunks")).scalar()
+                    document_ids = self._indexed_document_ids()
+                    doc_ids = sorted(document_ids)[:100]
+                    stats = {
+                        "success": True,
+                        "collection_name": "pgvector_chunks",
+                        "total_chunks": chunk_count or 0,
+                        "unique_documents": len(document_ids),
+                        "document_ids": doc_ids,
+                        "sample_ids": doc_ids[:5]
+                    }
+                    self._stats_cache.set(user_id, stats)
+                    return stats
+
+                # One round trip: both counts and the id sample come from the same scan
+                row = db.execute(text("""
+                    WITH scoped AS (
+                        SELECT c.document_id
+                        FROM chunks c
+                        JOIN documents d ON d.id = c.document_id
+                        WHERE (:filter_user_id IS NULL OR d.user_id = CAST(:filter_user_id AS uuid))
+                    )
+                    SELECT
+                        (SELECT COUNT(*) FROM scoped) AS chunk_count,
+                        (SELECT COUNT(DISTINCT document_id) FROM scoped) AS doc_count,
+                        ARRAY(SELECT DISTINCT document_id::text FROM scoped LIMIT 100) AS doc_ids
+                """), {"filter_user_id": user_id}).one()
+                doc_ids = list(row.doc_ids or [])
 
-                return {
+                stats = {
                     "success": True,
                     "collection_name": "pgvector_chunks",
-                    "total_chunks": chunk_count or 0,
-                    "unique_documents": doc_count or 0,
+                    "total_chunks": row.chunk_count or 0,
+                    "unique_documents": row.doc_count or 0,
                     "document_ids": doc_ids,
                     "sample_ids": doc_ids[:5]
                 }
+                self._stats_cache.set(user_id, stats)
+                return stats
             finally:
                 db.close()
 
@@ -793,6 +1173,7 @@ Source passage: "{source_text}"
                     DELETE FROM chunks WHERE document_id = CAST(:doc_id AS uuid)
                 """), {"doc_id": document_id})
                 db.commit()
+                self.record_document_removed(document_id)
                 deleted = result.rowcount
 
                 logger.info(f"Deleted {deleted} chunks for document {document_id}")
@@ -814,6 +1195,11 @@ Source passage: "{source_text}"
             try:
                 db.execute(text("DELETE FROM chunks"))
                 db.commit()
+                with self._document_ids_lock:
+                    self._document_ids = set()
+                    self._document_ids_loaded_at = time.monotonic()
+                self._answer_cache.clear()
+                self.invalidate_stats()
                 logger.info("PGVector chunks cleared")
                 return {"success": True, "message": "Collection cleared"}
             except Exception:
@@ -832,7 +1218,7 @@ Source passage: "{source_text}"
         """
         try:
             query_embedding = self._generate_query_embedding(text_query)
-            embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
+            embedding_str = to_pgvector_literal(query_embedding)
 
             db = self._get_db()
             try:
@@ -874,7 +1260,7 @@ Source passage: "{source_text}"
                     return 0.3
 
                 query_embedding = self._generate_query_embedding(concept_text)
-                embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
+                embedding_str = to_pgvector_literal(query_embedding)
 
                 result = db.execute(text("""
                     SELECT COUNT(*) FROM chunks
@@ -905,5 +1291,18 @@ Source passage: "{source_text}"
         return {"status": "success", "doc_id": doc_id, "chunk_count": len(texts)}
 
 
-# Global vector store instance
-vector_store = VectorStore()
+@lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    """
+    Return the process-wide VectorStore, creating it on first use.
+    Also usable as a FastAPI dependency: Depends(get_vector_store).
+    """
+    return VectorStore()
+
+
+def __getattr__(name: str):
+    # Keeps `from core.vector_store import vector_store` working without
+    # loading the embedding model and LLM client at import time.
+    if name == "vector_store":
+        return get_vector_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,27 +1,57 @@
 """
 Vector Store and RAG API endpoints
+
+Handlers are async; blocking work (database lookups, embedding, vector search,
+LLM calls) runs via asyncio.to_thread so it never stalls the event loop.
 """
+import asyncio
+import hashlib
+import json
+import os
+import time
+import traceback
+import uuid
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from typing import Optional, List, Any
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List, Any, Dict, Tuple
 from sqlalchemy.orm import Session
-from config.database import get_db, SessionLocal
+from config.database import SessionLocal
 from config.settings import settings
-from documents.models import Document
+from documents.models import Document, ProcessingStatus
+from documents.table_of_contents import normalize_table_of_contents_items
+from notes.models import Note as NoteModel
 from users.auth import get_current_user
 from users.models import User
 from core.rag_pipeline import rag_pipeline
+from core.vector_store import get_vector_store
+from core.file_search_manager import file_search_manager
+from core.knowledge_graph import build_knowledge_graph
+from core.revision import revise_content
+from utils.cache import TTLCache
 from utils.logger import logger
 
-router = APIRouter(prefix="/api/vectors", tags=["vectors"])
+router = APIRouter(prefix="/api/vectors", tags=["vectors"], default_response_class=ORJSONResponse)
+
+MAX_BATCH_ITEMS = 100
+# Request size guards: oversized payloads get a 422 before reaching the embedder or LLM
+MAX_QUESTION_LENGTH = 4000
+MAX_N_RESULTS = 50
+DOCUMENT_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+# Health probes fire every few seconds per pod; answer them (healthy or not) from memory
+HEALTH_CACHE_TTL_SECONDS = 5
+_health_cache = TTLCache(maxsize=1, ttl=HEALTH_CACHE_TTL_SECONDS)
+EMBEDDING_PROBE_TEXT = "probe"
+# Running RAG queries keyed by _query_key; concurrent duplicates await the same task
+_inflight_queries: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
 
 
 # Request/Response Models
 class QueryRequest(BaseModel):
     """RAG query request"""
-    question: str
-    document_id: Optional[str] = None
-    n_results: int = 5
+    question: str = Field(..., min_length=1, max_length=MAX_QUESTION_LENGTH)
+    document_id: Optional[str] = Field(None, pattern=DOCUMENT_ID_PATTERN)
+    n_results: int = Field(5, ge=1, le=MAX_N_RESULTS)
     mode: str = "structured_output"  # structured_output | file_search | nli_verification
     section_title: Optional[str] = None
     section_pages: Optional[List[int]] = None
@@ -29,9 +59,9 @@ class QueryRequest(BaseModel):
 
 class SearchRequest(BaseModel):
     """Similarity search request"""
-    query: str
-    document_id: Optional[str] = None
-    n_results: int = 5
+    query: str = Field(..., min_length=1, max_length=MAX_QUESTION_LENGTH)
+    document_id: Optional[str] = Field(None, pattern=DOCUMENT_ID_PATTERN)
+    n_results: int = Field(5, ge=1, le=MAX_N_RESULTS)
 
 
 class QueryResponse(BaseModel):
@@ -57,6 +87,26 @@ class SearchResponse(BaseModel):
     error: Optional[str] = None
 
 
+class BatchQueryRequest(BaseModel):
+    """Several RAG queries answered in one request"""
+    items: List[QueryRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class BatchQueryResponse(BaseModel):
+    """RAG query responses in request order"""
+    results: List[QueryResponse]
+
+
+class BatchSearchRequest(BaseModel):
+    """Several similarity searches answered in one request"""
+    items: List[SearchRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class BatchSearchResponse(BaseModel):
+    """Similarity search responses in request order"""
+    results: List[SearchResponse]
+
+
 def _get_owned_document_or_404(
     db: Session,
     document_id: str,
@@ -76,9 +126,103 @@ def _get_owned_document_or_404(
     return document
 
 
+async def _ensure_owned(current_user: User, *document_ids: str) -> None:
+    """Ownership check for async handlers: runs in a worker thread with its own short-lived session."""
+    def check() -> None:
+        with SessionLocal() as db:
+            for document_id in document_ids:
+                _get_owned_document_or_404(db, document_id, current_user)
+
+    await asyncio.to_thread(check)
+
+
+def _load_owned_document_fields(document_id: str, current_user: User, *fields: str) -> Tuple[Any, ...]:
+    """Read a few columns of an owned document in a short-lived session (404 if not owned)."""
+    with SessionLocal() as db:
+        document = _get_owned_document_or_404(db, document_id, current_user)
+        return tuple(getattr(document, field) for field in fields)
+
+
+def _update_owned_document(
+    document_id: str,
+    current_user: User,
+    metadata_updates: Dict[str, Any],
+    **values: Any,
+) -> None:
+    """Merge metadata_updates into doc_metadata, set values and commit, in a short-lived session."""
+    with SessionLocal() as db:
+        document = _get_owned_document_or_404(db, document_id, current_user)
+        document.doc_metadata = {**(document.doc_metadata or {}), **metadata_updates}
+        for name, value in values.items():
+            setattr(document, name, value)
+        db.commit()
+
+
+def _query_key(request: QueryRequest, user_id: str) -> str:
+    """Identity of a RAG query for in-flight coalescing"""
+    parts = (
+        user_id,
+        request.document_id or "",
+        request.mode,
+        str(request.n_results),
+        request.section_title or "",
+        ",".join(map(str, request.section_pages or ())),
+        request.question,
+    )
+    return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).hexdigest()
+
+
+async def _answer_query(request: QueryRequest, user_id: str) -> QueryResponse:
+    # Identical queries already running share one pipeline run instead of starting their own
+    key = _query_key(request, user_id)
+    task = _inflight_queries.get(key)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(
+            rag_pipeline.query_documents,
+            question=request.question,
+            document_id=request.document_id,
+            n_results=request.n_results,
+            mode=request.mode,
+            user_id=user_id,
+            section_title=request.section_title,
+            section_pages=request.section_pages,
+        ))
+        _inflight_queries[key] = task
+        task.add_done_callback(lambda _: _inflight_queries.pop(key, None))
+    else:
+        logger.info("Joining in-flight RAG query %s", key)
+
+    # Shielded so one client disconnecting doesn't cancel the run for the others
+    result = await asyncio.shield(task)
+
+    # Pipeline results use the response field names; extra keys are ignored
+    return QueryResponse.model_validate(result)
+
+
+async def _search(request: SearchRequest, user_id: str) -> SearchResponse:
+    result = await asyncio.to_thread(
+        rag_pipeline.search_similar,
+        query=request.query,
+        document_id=request.document_id,
+        n_results=request.n_results,
+        user_id=user_id,
+    )
+
+    return SearchResponse.model_validate(result)
+
+
+async def _prime_query_embeddings(queries: List[Tuple[str, Optional[str]]]) -> None:
+    """Embed a batch of queries in shared forward passes; per-item retrieval then hits the cache."""
+    try:
+        await asyncio.to_thread(rag_pipeline.vector_store.prime_query_embeddings, queries)
+    except Exception as e:
+        # Each item still embeds on its own if the shared pass fails
+        logger.warning(f"Batch query embedding failed: {e}")
+
+
 # Endpoints
 @router.get("/stats")
-def get_vector_store_stats(
+async def get_vector_store_stats(
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -88,7 +232,7 @@ def get_vector_store_stats(
         Collection statistics including total chunks, unique documents, etc.
     """
     try:
-        stats = rag_pipeline.get_vector_store_stats(user_id=str(current_user.id))
+        stats = await asyncio.to_thread(rag_pipeline.get_vector_store_stats, user_id=str(current_user.id))
         return stats
     except Exception as e:
         logger.error(f"Error getting vector store stats: {e}")
@@ -99,10 +243,9 @@ def get_vector_store_stats(
 
 
 @router.get("/documents/{document_id}/embeddings")
-def get_document_embeddings(
+async def get_document_embeddings(
     document_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Get all embeddings and chunks for a specific document
@@ -114,8 +257,8 @@ def get_document_embeddings(
         Document chunks with embedding previews
     """
     try:
-        _get_owned_document_or_404(db, document_id, current_user)
-        result = rag_pipeline.get_document_embeddings(document_id)
+        await _ensure_owned(current_user, document_id)
+        result = await asyncio.to_thread(rag_pipeline.get_document_embeddings, document_id)
 
         if not result.get("success"):
             raise HTTPException(
@@ -134,11 +277,10 @@ def get_document_embeddings(
         )
 
 
-@router.post("/query", response_model=QueryResponse)
-def query_documents(
+@router.post("/query", response_model=QueryResponse, response_model_exclude_none=True)
+async def query_documents(
     request: QueryRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Query documents using RAG - retrieves relevant chunks and generates answer
@@ -150,33 +292,12 @@ def query_documents(
         Generated answer with source chunks
     """
     try:
-        logger.info(f"RAG Query from user {current_user.email} [mode={request.mode}]: {request.question[:100]}")
+        logger.info("RAG Query from user %s [mode=%s]: %.100s", current_user.email, request.mode, request.question)
 
         if request.document_id:
-            _get_owned_document_or_404(db, request.document_id, current_user)
+            await _ensure_owned(current_user, request.document_id)
 
-        result = rag_pipeline.query_documents(
-            question=request.question,
-            document_id=request.document_id,
-            n_results=request.n_results,
-            mode=request.mode,
-            user_id=str(current_user.id),
-            section_title=request.section_title,
-            section_pages=request.section_pages,
-        )
-
-        return QueryResponse(
-            success=result.get("success", False),
-            answer=result.get("answer"),
-            sources=result.get("sources"),
-            context_used=result.get("context_used"),
-            error=result.get("error"),
-            mode=result.get("mode"),
-            grounding_metadata=result.get("grounding_metadata"),
-            citations_metadata=result.get("citations_metadata"),
-            verified_citations=result.get("verified_citations"),
-            verification_summary=result.get("verification_summary")
-        )
+        return await _answer_query(request, str(current_user.id))
     except Exception as e:
         logger.error(f"Error in RAG query: {e}")
         return QueryResponse(
@@ -185,11 +306,90 @@ def query_documents(
         )
 
 
-@router.post("/search", response_model=SearchResponse)
-def search_similar(
+@router.post("/query/stream")
+async def query_documents_stream(
+    request: QueryRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Query documents using RAG, streaming the answer as Server-Sent Events
+
+    Each answer fragment is sent as `data: {"token": ...}`; the stream ends with a
+    `data: {"event": "done", "sources": [...], ...}` event, or `"event": "error"`.
+
+    Args:
+        request: Query request with question and optional filters
+
+    Returns:
+        text/event-stream response
+    """
+    logger.info("RAG stream query from user %s [mode=%s]: %.100s", current_user.email, request.mode, request.question)
+
+    if request.document_id:
+        await _ensure_owned(current_user, request.document_id)
+
+    events = rag_pipeline.query_documents_stream(
+        question=request.question,
+        document_id=request.document_id,
+        n_results=request.n_results,
+        mode=request.mode,
+        user_id=str(current_user.id),
+        section_title=request.section_title,
+        section_pages=request.section_pages,
+    )
+
+    # A sync generator: Starlette iterates it in a worker thread, so the
+    # blocking retrieval and provider stream never run on the event loop
+    def event_stream():
+        for event in events:
+            yield f"data: {json.dumps(event, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/query/batch", response_model=BatchQueryResponse, response_model_exclude_none=True)
+async def query_documents_batch(
+    request: BatchQueryRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Answer several RAG queries in one request
+
+    All questions are embedded together, then retrieval and answer generation
+    run concurrently. Results keep the order of request.items.
+    """
+    logger.info("Batch RAG query from user %s: %d questions", current_user.email, len(request.items))
+
+    await _ensure_owned(current_user, *{item.document_id for item in request.items if item.document_id})
+
+    await _prime_query_embeddings([(item.question, item.section_title) for item in request.items])
+
+    user_id = str(current_user.id)
+
+    # Bounded so a full batch doesn't fill the shared executor or fire every LLM
+    # call at once
+    semaphore = asyncio.Semaphore(settings.GEMINI_CONCURRENCY)
+
+    async def answer(item: QueryRequest) -> QueryResponse:
+        try:
+            async with semaphore:
+                return await _answer_query(item, user_id)
+        except Exception as e:
+            logger.error(f"Error in batch RAG query: {e}")
+            return QueryResponse(success=False, error=str(e))
+
+    results = await asyncio.gather(*(answer(item) for item in request.items))
+    return BatchQueryResponse(results=list(results))
+
+
+@router.post("/search", response_model=SearchResponse, response_model_exclude_none=True)
+async def search_similar(
     request: SearchRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Search for similar chunks without generating an answer
@@ -201,25 +401,12 @@ def search_similar(
         Similar chunks with similarity scores
     """
     try:
-        logger.info(f"Similarity search from user {current_user.email}: {request.query[:100]}")
+        logger.info("Similarity search from user %s: %.100s", current_user.email, request.query)
 
         if request.document_id:
-            _get_owned_document_or_404(db, request.document_id, current_user)
-
-        result = rag_pipeline.search_similar(
-            query=request.query,
-            document_id=request.document_id,
-            n_results=request.n_results,
-            user_id=str(current_user.id),
-        )
+            await _ensure_owned(current_user, request.document_id)
 
-        return SearchResponse(
-            success=result.get("success", False),
-            query=result.get("query"),
-            results=result.get("results"),
-            count=result.get("count", 0),
-            error=result.get("error")
-        )
+        return await _search(request, str(current_user.id))
     except Exception as e:
         logger.error(f"Error in similarity search: {e}")
         return SearchResponse(
@@ -228,11 +415,43 @@ def search_similar(
         )
 
 
+@router.post("/search/batch", response_model=BatchSearchResponse, response_model_exclude_none=True)
+async def search_similar_batch(
+    request: BatchSearchRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Run several similarity searches in one request
+
+    All queries are embedded together, then the vector searches run concurrently.
+    Results keep the order of request.items.
+    """
+    logger.info("Batch similarity search from user %s: %d queries", current_user.email, len(request.items))
+
+    await _ensure_owned(current_user, *{item.document_id for item in request.items if item.document_id})
+
+    await _prime_query_embeddings([(item.query, None) for item in request.items])
+
+    user_id = str(current_user.id)
+
+    semaphore = asyncio.Semaphore(settings.GEMINI_CONCURRENCY)
+
+    async def search(item: SearchRequest) -> SearchResponse:
+        try:
+            async with semaphore:
+                return await _search(item, user_id)
+        except Exception as e:
+            logger.error(f"Error in batch similarity search: {e}")
+            return SearchResponse(success=False, error=str(e))
+
+    results = await asyncio.gather(*(search(item) for item in request.items))
+    return BatchSearchResponse(results=list(results))
+
+
 @router.delete("/documents/{document_id}")
-def delete_document_embeddings(
+async def delete_document_embeddings(
     document_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Delete all embeddings for a document from the vector store
@@ -244,8 +463,8 @@ def delete_document_embeddings(
         Deletion result
     """
     try:
-        _get_owned_document_or_404(db, document_id, current_user)
-        result = rag_pipeline.delete_document_embeddings(document_id)
+        await _ensure_owned(current_user, document_id)
+        result = await asyncio.to_thread(rag_pipeline.delete_document_embeddings, document_id)
 
         if not result.get("success"):
             raise HTTPException(
@@ -253,7 +472,7 @@ def delete_document_embeddings(
                 detail=result.get("error", "Failed to delete embeddings")
             )
 
-        logger.info(f"Deleted embeddings for document {document_id} by user {current_user.email}")
+        logger.info("Deleted embeddings for document %s by user %s", document_id, current_user.email)
         return result
     except HTTPException:
         raise
@@ -266,45 +485,80 @@ def delete_document_embeddings(
 
 
 @router.get("/health")
-def vector_store_health():
+async def vector_store_health():
     """
     Check vector store health (no auth required)
 
     Returns:
         Health status
     """
+    cached = _health_cache.get("health")
+    if cached is not None:
+        return cached
+
     try:
-        stats = rag_pipeline.get_vector_store_stats()
-        return {
+        stats = await asyncio.to_thread(rag_pipeline.get_vector_store_stats)
+        health = {
             "status": "healthy",
             "collection": stats.get("collection_name"),
             "total_chunks": stats.get("total_chunks", 0)
         }
     except Exception as e:
-        return {
+        health = {
             "status": "unhealthy",
             "error": str(e)
         }
 
+    _health_cache.set("health", health)
+    return health
+
 
 @router.post("/test-embedding")
-def test_embedding(
+async def test_embedding(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Test endpoint to verify embedding generation works
+    Probe the embedding model without touching the vector store
+
+    Returns:
+        Embedding dimension and encode latency
+    """
+    try:
+        started = time.perf_counter()
+        embedding = await asyncio.to_thread(get_vector_store().embedder.generate_embedding, EMBEDDING_PROBE_TEXT)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        return {
+            "success": any(embedding),
+            "dimension": len(embedding),
+            "latency_ms": round(latency_ms, 2)
+        }
+    except Exception as e:
+        logger.error(f"Embedding probe failed: {e}")
+        logger.error(traceback.format_exc())
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@router.post("/test-embedding/full")
+def test_embedding_full(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Deep diagnostic: index a test document, read stats, then delete it
 
     Returns:
         Test results with embedding sample
     """
     try:
-        from core.vector_store import vector_store
-        import uuid
+        vector_store = get_vector_store()
 
         test_text = "This is a test document for verifying RAG pipeline functionality. Machine learning and artificial intelligence are transforming education."
         test_doc_id = f"test_{uuid.uuid4().hex[:8]}"
 
-        logger.info(f"Testing embedding with doc_id: {test_doc_id}")
+        logger.info("Testing embedding with doc_id: %s", test_doc_id)
 
         # Test embedding generation
         result = vector_store.add_document(
@@ -313,7 +567,7 @@ def test_embedding(
             metadata={"source": "test", "type": "embedding_test"}
         )
 
-        logger.info(f"Test embedding result: {result}")
+        logger.info("Test embedding result: %s", result)
 
         # Get stats after adding
         stats = vector_store.get_collection_stats()
@@ -331,7 +585,6 @@ def test_embedding(
         }
     except Exception as e:
         logger.error(f"Test embedding failed: {e}")
-        import traceback
         logger.error(traceback.format_exc())
         return {
             "success": False,
@@ -340,7 +593,7 @@ def test_embedding(
 
 
 @router.post("/reprocess/{document_id}")
-def reprocess_document_embeddings(
+async def reprocess_document_embeddings(
     document_id: str,
     current_user: User = Depends(get_current_user)
 ):
@@ -353,37 +606,46 @@ def reprocess_document_embeddings(
     Returns:
         Processing result
     """
-    db = SessionLocal()
     try:
-        doc = _get_owned_document_or_404(db, document_id, current_user)
+        # Hold a connection only for the lookup and the final update, not the pipeline run
+        (file_path,) = await asyncio.to_thread(
+            _load_owned_document_fields, document_id, current_user, "file_path"
+        )
 
-        if not doc.file_path:
+        if not file_path:
             return {"success": False, "error": "Document has no file path"}
 
-        logger.info(f"Reprocessing document {document_id}: {doc.file_path}")
+        logger.info("Reprocessing document %s: %s", document_id, file_path)
 
         # Delete existing embeddings
-        delete_result = rag_pipeline.delete_document_embeddings(document_id)
-        logger.info(f"Deleted existing embeddings: {delete_result}")
+        delete_result = await asyncio.to_thread(rag_pipeline.delete_document_embeddings, document_id)
+        logger.info("Deleted existing embeddings: %s", delete_result)
 
         # Reprocess
-        result = rag_pipeline.process_document(
-            file_path=doc.file_path,
+        result = await asyncio.to_thread(
+            rag_pipeline.process_document,
+            file_path=file_path,
             document_id=document_id,
             store_embeddings=True
         )
 
-        logger.info(f"Reprocess result: {result}")
+        logger.info("Reprocess result: %s", result)
 
         if result.get("success") and result.get("embeddings_stored"):
-            doc.vector_db_reference_id = document_id
-            doc.doc_metadata = doc.doc_metadata or {}
-            doc.doc_metadata["embeddings_stored"] = True
-            doc.doc_metadata["chunk_count"] = result.get("chunk_count", 0)
-            doc.doc_metadata["docling_markdown_path"] = result.get("markdown_path")
+            values = {"vector_db_reference_id": document_id}
             if result.get("text"):
-                doc.extracted_text = result.get("text")
-            db.commit()
+                values["extracted_text"] = result.get("text")
+            await asyncio.to_thread(
+                _update_owned_document,
+                document_id,
+                current_user,
+                {
+                    "embeddings_stored": True,
+                    "chunk_count": result.get("chunk_count", 0),
+                    "docling_markdown_path": result.get("markdown_path"),
+                },
+                **values,
+            )
 
         return {
             "success": result.get("success"),
@@ -393,15 +655,12 @@ def reprocess_document_embeddings(
         }
     except Exception as e:
         logger.error(f"Reprocess failed: {e}")
-        import traceback
         logger.error(traceback.format_exc())
         return {"success": False, "error": str(e)}
-    finally:
-        db.close()
 
 
 @router.post("/file-search/index/{document_id}")
-def index_for_file_search(
+async def index_for_file_search(
     document_id: str,
     current_user: User = Depends(get_current_user)
 ):
@@ -409,40 +668,45 @@ def index_for_file_search(
     Index a document for Gemini File Search mode.
     Creates a File Search store and uploads the document.
     """
-    from core.file_search_manager import file_search_manager
-
-    db = SessionLocal()
     try:
-        doc = _get_owned_document_or_404(db, document_id, current_user)
+        # Hold a connection only for the lookup and the final update, not the upload
+        file_path, title = await asyncio.to_thread(
+            _load_owned_document_fields, document_id, current_user, "file_path", "title"
+        )
 
-        if not doc.file_path:
+        if not file_path:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Document has no file path"
             )
 
         # Check if file exists
-        import os
-        if not os.path.exists(doc.file_path):
+        if not os.path.exists(file_path):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File not found at path: {doc.file_path}"
+                detail=f"File not found at path: {file_path}"
             )
 
-        logger.info(f"Indexing document {document_id} for file search: {doc.file_path}")
+        logger.info("Indexing document %s for file search: %s", document_id, file_path)
 
-        result = file_search_manager.create_store_and_upload(
+        result = await asyncio.to_thread(
+            file_search_manager.create_store_and_upload,
             document_id=document_id,
-            file_path=doc.file_path,
-            display_name=doc.title
+            file_path=file_path,
+            display_name=title
         )
 
         if result.get("success"):
             # Update document metadata
-            doc.doc_metadata = doc.doc_metadata or {}
-            doc.doc_metadata["file_search_indexed"] = True
-            doc.doc_metadata["file_search_store"] = result.get("store_name")
-            db.commit()
+            await asyncio.to_thread(
+                _update_owned_document,
+                document_id,
+                current_user,
+                {
+                    "file_search_indexed": True,
+                    "file_search_store": result.get("store_name"),
+                },
+            )
 
         return result
 
@@ -450,14 +714,11 @@ def index_for_file_search(
         raise
     except Exception as e:
         logger.error(f"File search indexing failed: {e}")
-        import traceback
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
-    finally:
-        db.close()
 
 
 @router.get("/file-search/status/{document_id}")
@@ -466,7 +727,6 @@ def file_search_status(
     current_user: User = Depends(get_current_user)
 ):
     """Check if a document has been indexed for File Search"""
-    from core.file_search_manager import file_search_manager
     db = SessionLocal()
     try:
         _get_owned_document_or_404(db, document_id, current_user)
@@ -483,15 +743,15 @@ def file_search_status(
 
 class VisionQueryRequest(BaseModel):
     """Vision-aware RAG query request"""
-    question: str
-    document_id: Optional[str] = None
-    n_results: int = settings.VISION_QUERY_DEFAULT_LIMIT
+    question: str = Field(..., min_length=1, max_length=MAX_QUESTION_LENGTH)
+    document_id: Optional[str] = Field(None, pattern=DOCUMENT_ID_PATTERN)
+    n_results: int = Field(settings.VISION_QUERY_DEFAULT_LIMIT, ge=1, le=MAX_N_RESULTS)
     selected_page: Optional[int] = None
     selected_image_data: Optional[str] = None
 
 
 @router.post("/vision-query")
-def vision_query(
+async def vision_query(
     request: VisionQueryRequest,
     current_user: User = Depends(get_current_user)
 ):
@@ -502,8 +762,9 @@ def vision_query(
     try:
         from core.vision_service import vision_service
 
-        logger.info(f"Vision query from {current_user.email}: {request.question[:100]}")
-        return vision_service.answer_question(
+        logger.info("Vision query from %s: %.100s", current_user.email, request.question)
+        return await asyncio.to_thread(
+            vision_service.answer_question,
             query=request.question,
             document_id=request.document_id,
             user_id=str(current_user.id),
@@ -514,7 +775,6 @@ def vision_query(
 
     except Exception as e:
         logger.error(f"Vision query error: {e}")
-        import traceback
         logger.error(traceback.format_exc())
         return {
             "success": False,
@@ -543,8 +803,8 @@ class RevisionResponse(BaseModel):
     error: Optional[str] = None
 
 
-@router.post("/revise", response_model=RevisionResponse)
-def revise_content_endpoint(
+@router.post("/revise", response_model=RevisionResponse, response_model_exclude_none=True)
+async def revise_content_endpoint(
     request: RevisionRequest,
     current_user: User = Depends(get_current_user)
 ):
@@ -552,8 +812,6 @@ def revise_content_endpoint(
     Revise AI-generated content (mindmap, diagram, summary, note)
     based on a natural language revision prompt.
     """
-    from core.revision import revise_content
-
     valid_types = ["mindmap", "diagram", "summary", "note"]
     if request.content_type not in valid_types:
         raise HTTPException(
@@ -566,7 +824,8 @@ def revise_content_endpoint(
         f"{request.revision_prompt[:60]}"
     )
 
-    result = revise_content(
+    result = await asyncio.to_thread(
+        revise_content,
         current_content=request.current_content,
         revision_prompt=request.revision_prompt,
         content_type=request.content_type,
@@ -586,11 +845,6 @@ def get_knowledge_graph(
     Build a knowledge graph from the user's documents, notes, and embeddings.
     Returns {nodes, links, stats} for react-force-graph.
     """
-    from config.database import SessionLocal
-    from documents.models import Document, ProcessingStatus
-    from documents.table_of_contents import normalize_table_of_contents_items
-    from core.knowledge_graph import build_knowledge_graph
-
     db = SessionLocal()
     try:
         # Get all completed documents
@@ -614,7 +868,6 @@ def get_knowledge_graph(
             })
 
         # Get all notes
-        from notes.models import Note as NoteModel
         notes = db.query(NoteModel).filter(
             NoteModel.user_id == current_user.id
         ).all()
@@ -639,7 +892,6 @@ def get_knowledge_graph(
 
     except Exception as e:
         logger.error(f"Knowledge graph error: {e}")
-        import traceback
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -2,54 +2,27 @@
 Diagram Generator - Creates various Mermaid diagrams from document content
 Supports: flowchart, sequence, entity-relationship, state diagrams
 """
-from typing import Dict, Any, Literal
+import asyncio
+import re
+from typing import Dict, Any, Literal, Tuple
 from utils.gemini_client import gemini_client
+from utils.helpers import truncate_to_tokens
 from utils.logger import logger
 DiagramType = Literal["flowchart", "sequence", "er", "state", "class"]
+DIAGRAM_TYPES = ("flowchart", "sequence", "er", "state", "class")
 
-class DiagramGenerator:
-    """Generate various Mermaid diagrams from document content"""
-
-    def __init__(self):
-        self.gemini_client = gemini_client
-
-    def generate_diagram(
-        self,
-        content: str,
-        title: str = "Document",
-        diagram_type: DiagramType = "flowchart"
-    ) -> Dict[str, Any]:
-        """
-        Generate a Mermaid diagram from document content.
-
-        Args:
-            content: Document text content
-            title: Document title
-            diagram_type: Type of diagram to generate
-
-        Returns:
-            Dict with mermaid code and metadata
-        """
-        generators = {
-            "flowchart": self._generate_flowchart,
-            "sequence": self._generate_sequence,
-            "er": self._generate_er_diagram,
-            "state": self._generate_state_diagram,
-            "class": self._generate_class_diagram,
-        }
-
-        generator = generators.get(diagram_type, self._generate_flowchart)
-        return generator(content, title)
+# Approximate token budget for document content in diagram prompts. Intro and closing
+# summary carry most of the structure, so two thirds of it go to the head.
+DIAGRAM_CONTENT_MAX_TOKENS = 3000
+# A markdown fence line (``` or ```mermaid) anywhere in the model output
+_FENCE_RE = re.compile(r"^```[^\n]*\n?", re.M)
 
-    def _generate_flowchart(self, content: str, title: str) -> Dict[str, Any]:
-        """Generate a flowchart diagram showing process/workflow"""
-        try:
-            logger.info(f"Generating flowchart for: {title}")
-            content = self._truncate_content(content)
+# Static prompt text per diagram type, split around the title and the document content
+# so each request only concatenates instead of re-formatting the full template.
+_FLOWCHART_PROMPT_HEAD = """Analyze this document and create a Mermaid FLOWCHART diagram showing the main processes, workflows, or logical flow of concepts.
 
-            prompt = f"""Analyze this document and create a Mermaid FLOWCHART diagram showing the main processes, workflows, or logical flow of concepts.
-
-DOCUMENT TITLE: {title}
+DOCUMENT TITLE: """
+_FLOWCHART_PROMPT_BODY = """
 
 MERMAID FLOWCHART SYNTAX RULES (CRITICAL):
 1. Start with: graph TB (top-bottom) or graph LR (left-right)
@@ -57,7 +30,7 @@ MERMAID FLOWCHART SYNTAX RULES (CRITICAL):
 3. Labels with spaces MUST use quotes: A["Label with spaces"]
 4. Arrow syntax: A --> B (solid), A -.-> B (dotted), A ==> B (thick)
 5. Arrow labels: A -->|"label text"| B
-6. Diamond for decisions: D{{"Decision?"}}
+6. Diamond for decisions: D{"Decision?"}
 7. Rounded rectangle: R(["Rounded"])
 8. Stadium shape: S([Stadium])
 9. Keep labels SHORT (max 5 words)
@@ -66,7 +39,7 @@ MERMAID FLOWCHART SYNTAX RULES (CRITICAL):
 EXAMPLE:
 graph TB
     A["Start Process"] --> B["Input Data"]
-    B --> C{{"Valid?"}}
+    B --> C{"Valid?"}
     C -->|"Yes"| D["Process Data"]
     C -->|"No"| E["Error Handler"]
     D --> F["Output Results"]
@@ -77,32 +50,15 @@ graph TB
     end
 
 DOCUMENT CONTENT:
-{content}
+"""
+_FLOWCHART_PROMPT_TAIL = """
 
 Generate ONLY valid Mermaid flowchart code. No explanations, no markdown blocks."""
 
-            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
-            mermaid_code = self._clean_code(mermaid_code, "graph")
+_SEQUENCE_PROMPT_HEAD = """Analyze this document and create a Mermaid SEQUENCE diagram showing interactions between entities, components, or actors.
 
-            return {
-                "success": True,
-                "mermaid_code": mermaid_code,
-                "title": title,
-                "diagram_type": "flowchart"
-            }
-        except Exception as e:
-            logger.error(f"Flowchart generation error: {e}")
-            return self._get_fallback("flowchart", title, str(e))
-
-    def _generate_sequence(self, content: str, title: str) -> Dict[str, Any]:
-        """Generate a sequence diagram showing interactions"""
-        try:
-            logger.info(f"Generating sequence diagram for: {title}")
-            content = self._truncate_content(content)
-
-            prompt = f"""Analyze this document and create a Mermaid SEQUENCE diagram showing interactions between entities, components, or actors.
-
-DOCUMENT TITLE: {title}
+DOCUMENT TITLE: """
+_SEQUENCE_PROMPT_BODY = """
 
 MERMAID SEQUENCE SYNTAX RULES (CRITICAL):
 1. Start with: sequenceDiagram
@@ -134,41 +90,24 @@ sequenceDiagram
     Note over U,S: Process complete
 
 DOCUMENT CONTENT:
-{content}
+"""
+_SEQUENCE_PROMPT_TAIL = """
 
 Generate ONLY valid Mermaid sequence diagram code. No explanations, no markdown blocks."""
 
-            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
-            mermaid_code = self._clean_code(mermaid_code, "sequenceDiagram")
-
-            return {
-                "success": True,
-                "mermaid_code": mermaid_code,
-                "title": title,
-                "diagram_type": "sequence"
-            }
-        except Exception as e:
-            logger.error(f"Sequence diagram generation error: {e}")
-            return self._get_fallback("sequence", title, str(e))
-
-    def _generate_er_diagram(self, content: str, title: str) -> Dict[str, Any]:
-        """Generate an entity-relationship diagram"""
-        try:
-            logger.info(f"Generating ER diagram for: {title}")
-            content = self._truncate_content(content)
-
-            prompt = f"""Analyze this document and create a Mermaid ER (Entity-Relationship) diagram showing entities and their relationships.
+_ER_PROMPT_HEAD = """Analyze this document and create a Mermaid ER (Entity-Relationship) diagram showing entities and their relationships.
 
-DOCUMENT TITLE: {title}
+DOCUMENT TITLE: """
+_ER_PROMPT_BODY = """
 
 MERMAID ER SYNTAX RULES (CRITICAL):
 1. Start with: erDiagram
-2. Entity format: ENTITY_NAME {{ type attribute_name }}
-3. Relationship: ENTITY1 ||--o{{ ENTITY2 : "relationship"
+2. Entity format: ENTITY_NAME { type attribute_name }
+3. Relationship: ENTITY1 ||--o{ ENTITY2 : "relationship"
 4. Cardinality symbols:
    - ||--|| one to one
-   - ||--o{{ one to many
-   - o{{--o{{ many to many
+   - ||--o{ one to many
+   - o{--o{ many to many
    - |o--o| zero or one to zero or one
 5. Entity names: UPPERCASE, no spaces (use underscores)
 6. Attribute types: string, int, boolean, date
@@ -176,56 +115,39 @@ MERMAID ER SYNTAX RULES (CRITICAL):
 
 EXAMPLE:
 erDiagram
-    USER {{
+    USER {
         int id PK
         string name
         string email
         date created_at
-    }}
-    DOCUMENT {{
+    }
+    DOCUMENT {
         int id PK
         int user_id FK
         string title
         string content
-    }}
-    QUIZ {{
+    }
+    QUIZ {
         int id PK
         int document_id FK
         string title
         int score
-    }}
+    }
 
-    USER ||--o{{ DOCUMENT : "uploads"
-    DOCUMENT ||--o{{ QUIZ : "generates"
-    USER ||--o{{ QUIZ : "takes"
+    USER ||--o{ DOCUMENT : "uploads"
+    DOCUMENT ||--o{ QUIZ : "generates"
+    USER ||--o{ QUIZ : "takes"
 
 DOCUMENT CONTENT:
-{content}
+"""
+_ER_PROMPT_TAIL = """
 
 Generate ONLY valid Mermaid ER diagram code. No explanations, no markdown blocks."""
 
-            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
-            mermaid_code = self._clean_code(mermaid_code, "erDiagram")
-
-            return {
-                "success": True,
-                "mermaid_code": mermaid_code,
-                "title": title,
-                "diagram_type": "er"
-            }
-        except Exception as e:
-            logger.error(f"ER diagram generation error: {e}")
-            return self._get_fallback("er", title, str(e))
-
-    def _generate_state_diagram(self, content: str, title: str) -> Dict[str, Any]:
-        """Generate a state diagram showing states and transitions"""
-        try:
-            logger.info(f"Generating state diagram for: {title}")
-            content = self._truncate_content(content)
-
-            prompt = f"""Analyze this document and create a Mermaid STATE diagram showing states and transitions of a process or system.
+_STATE_PROMPT_HEAD = """Analyze this document and create a Mermaid STATE diagram showing states and transitions of a process or system.
 
-DOCUMENT TITLE: {title}
+DOCUMENT TITLE: """
+_STATE_PROMPT_BODY = """
 
 MERMAID STATE SYNTAX RULES (CRITICAL):
 1. Start with: stateDiagram-v2
@@ -233,7 +155,7 @@ MERMAID STATE SYNTAX RULES (CRITICAL):
 3. Final state: LastState --> [*]
 4. Transitions: State1 --> State2
 5. Transition labels: State1 --> State2: action
-6. Composite states: state "Name" as alias {{ ... }}
+6. Composite states: state "Name" as alias { ... }
 7. Notes: note right of State: Text
 8. Choices: state choice <<choice>>
 9. Keep state names simple (no special chars)
@@ -245,12 +167,12 @@ stateDiagram-v2
     Idle --> Processing: Start
     Processing --> Validating: Process Complete
 
-    state Validating {{
+    state Validating {
         [*] --> Checking
         Checking --> Verified: Pass
         Checking --> Failed: Fail
         Verified --> [*]
-    }}
+    }
 
     Validating --> Complete: Valid
     Validating --> Error: Invalid
@@ -261,32 +183,15 @@ stateDiagram-v2
     note right of Processing: Main work happens here
 
 DOCUMENT CONTENT:
-{content}
+"""
+_STATE_PROMPT_TAIL = """
 
 Generate ONLY valid Mermaid state diagram code. No explanations, no markdown blocks."""
 
-            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
-            mermaid_code = self._clean_code(mermaid_code, "stateDiagram")
+_CLASS_PROMPT_HEAD = """Analyze this document and create a Mermaid CLASS diagram showing concepts, their properties, and relationships.
 
-            return {
-                "success": True,
-                "mermaid_code": mermaid_code,
-                "title": title,
-                "diagram_type": "state"
-            }
-        except Exception as e:
-            logger.error(f"State diagram generation error: {e}")
-            return self._get_fallback("state", title, str(e))
-
-    def _generate_class_diagram(self, content: str, title: str) -> Dict[str, Any]:
-        """Generate a class diagram showing structure/hierarchy"""
-        try:
-            logger.info(f"Generating class diagram for: {title}")
-            content = self._truncate_content(content)
-
-            prompt = f"""Analyze this document and create a Mermaid CLASS diagram showing concepts, their properties, and relationships.
-
-DOCUMENT TITLE: {title}
+DOCUMENT TITLE: """
+_CLASS_PROMPT_BODY = """
 
 MERMAID CLASS SYNTAX RULES (CRITICAL):
 1. Start with: classDiagram
@@ -303,34 +208,197 @@ MERMAID CLASS SYNTAX RULES (CRITICAL):
 
 EXAMPLE:
 classDiagram
-    class Document {{
+    class Document {
         +String title
         +String content
         +Date createdAt
         +process() void
         +summarize() String
-    }}
+    }
 
-    class User {{
+    class User {
         +String name
         +String email
         +uploadDocument() Document
-    }}
+    }
 
-    class Quiz {{
+    class Quiz {
         +String title
         +int score
         +generate() void
-    }}
+    }
 
     User "1" --> "*" Document : uploads
     Document "1" --> "*" Quiz : generates
 
 DOCUMENT CONTENT:
-{content}
+"""
+_CLASS_PROMPT_TAIL = """
 
 Generate ONLY valid Mermaid class diagram code. No explanations, no markdown blocks."""
 
+_PROMPTS: Dict[str, Tuple[str, str, str]] = {
+    "flowchart": (_FLOWCHART_PROMPT_HEAD, _FLOWCHART_PROMPT_BODY, _FLOWCHART_PROMPT_TAIL),
+    "sequence": (_SEQUENCE_PROMPT_HEAD, _SEQUENCE_PROMPT_BODY, _SEQUENCE_PROMPT_TAIL),
+    "er": (_ER_PROMPT_HEAD, _ER_PROMPT_BODY, _ER_PROMPT_TAIL),
+    "state": (_STATE_PROMPT_HEAD, _STATE_PROMPT_BODY, _STATE_PROMPT_TAIL),
+    "class": (_CLASS_PROMPT_HEAD, _CLASS_PROMPT_BODY, _CLASS_PROMPT_TAIL),
+}
+
+class DiagramGenerator:
+    """Generate various Mermaid diagrams from document content"""
+
+    def __init__(self):
+        self.gemini_client = gemini_client
+
+    def generate_diagram(
+        self,
+        content: str,
+        title: str = "Document",
+        diagram_type: DiagramType = "flowchart"
+    ) -> Dict[str, Any]:
+        """
+        Generate a Mermaid diagram from document content.
+
+        Args:
+            content: Document text content
+            title: Document title
+            diagram_type: Type of diagram to generate
+
+        Returns:
+            Dict with mermaid code and metadata
+        """
+        generators = {
+            "flowchart": self._generate_flowchart,
+            "sequence": self._generate_sequence,
+            "er": self._generate_er_diagram,
+            "state": self._generate_state_diagram,
+            "class": self._generate_class_diagram,
+        }
+
+        generator = generators.get(diagram_type, self._generate_flowchart)
+        return generator(content, title)
+
+    async def generate_all(self, content: str, title: str = "Document") -> Dict[str, Dict[str, Any]]:
+        """
+        Generate every supported diagram type concurrently.
+
+        Each generator makes a blocking Gemini call, so they run in worker threads
+        and the total latency is that of the slowest call rather than the sum.
+
+        Args:
+            content: Document text content
+            title: Document title
+
+        Returns:
+            Dict mapping diagram type to the generate_diagram result for that type
+        """
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.generate_diagram, content, title, diagram_type)
+              for diagram_type in DIAGRAM_TYPES),
+            return_exceptions=True
+        )
+
+        diagrams = {}
+        for diagram_type, result in zip(DIAGRAM_TYPES, results):
+            if isinstance(result, Exception):
+                logger.error(f"{diagram_type} diagram generation error: {result}")
+                result = self._get_fallback(diagram_type, title, str(result))
+            diagrams[diagram_type] = result
+        return diagrams
+
+    def _generate_flowchart(self, content: str, title: str) -> Dict[str, Any]:
+        """Generate a flowchart diagram showing process/workflow"""
+        try:
+            logger.info(f"Generating flowchart for: {title}")
+            content = self._truncate_content(content)
+
+            prompt = self._build_prompt("flowchart", title, content)
+
+            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
+            mermaid_code = self._clean_code(mermaid_code, "graph")
+
+            return {
+                "success": True,
+                "mermaid_code": mermaid_code,
+                "title": title,
+                "diagram_type": "flowchart"
+            }
+        except Exception as e:
+            logger.error(f"Flowchart generation error: {e}")
+            return self._get_fallback("flowchart", title, str(e))
+
+    def _generate_sequence(self, content: str, title: str) -> Dict[str, Any]:
+        """Generate a sequence diagram showing interactions"""
+        try:
+            logger.info(f"Generating sequence diagram for: {title}")
+            content = self._truncate_content(content)
+
+            prompt = self._build_prompt("sequence", title, content)
+
+            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
+            mermaid_code = self._clean_code(mermaid_code, "sequenceDiagram")
+
+            return {
+                "success": True,
+                "mermaid_code": mermaid_code,
+                "title": title,
+                "diagram_type": "sequence"
+            }
+        except Exception as e:
+            logger.error(f"Sequence diagram generation error: {e}")
+            return self._get_fallback("sequence", title, str(e))
+
+    def _generate_er_diagram(self, content: str, title: str) -> Dict[str, Any]:
+        """Generate an entity-relationship diagram"""
+        try:
+            logger.info(f"Generating ER diagram for: {title}")
+            content = self._truncate_content(content)
+
+            prompt = self._build_prompt("er", title, content)
+
+            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
+            mermaid_code = self._clean_code(mermaid_code, "erDiagram")
+
+            return {
+                "success": True,
+                "mermaid_code": mermaid_code,
+                "title": title,
+                "diagram_type": "er"
+            }
+        except Exception as e:
+            logger.error(f"ER diagram generation error: {e}")
+            return self._get_fallback("er", title, str(e))
+
+    def _generate_state_diagram(self, content: str, title: str) -> Dict[str, Any]:
+        """Generate a state diagram showing states and transitions"""
+        try:
+            logger.info(f"Generating state diagram for: {title}")
+            content = self._truncate_content(content)
+
+            prompt = self._build_prompt("state", title, content)
+
+            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
+            mermaid_code = self._clean_code(mermaid_code, "stateDiagram")
+
+            return {
+                "success": True,
+                "mermaid_code": mermaid_code,
+                "title": title,
+                "diagram_type": "state"
+            }
+        except Exception as e:
+            logger.error(f"State diagram generation error: {e}")
+            return self._get_fallback("state", title, str(e))
+
+    def _generate_class_diagram(self, content: str, title: str) -> Dict[str, Any]:
+        """Generate a class diagram showing structure/hierarchy"""
+        try:
+            logger.info(f"Generating class diagram for: {title}")
+            content = self._truncate_content(content)
+
+            prompt = self._build_prompt("class", title, content)
+
             mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
             mermaid_code = self._clean_code(mermaid_code, "classDiagram")
 
@@ -344,38 +412,30 @@ Generate ONLY valid Mermaid class diagram code. No explanations, no markdown blo
             logger.error(f"Class diagram generation error: {e}")
             return self._get_fallback("class", title, str(e))
 
-    def _truncate_content(self, content: str, max_length: int = 15000) -> str:
-        """Truncate content to fit in context"""
-        if len(content) > max_length:
-            content = content[:max_length] + "..."
-            logger.info(f"Content truncated to {max_length} characters")
-        return content
+    def _build_prompt(self, diagram_type: str, title: str, content: str) -> str:
+        """Assemble the prompt for diagram_type from its precomputed static parts"""
+        head, body, tail = _PROMPTS[diagram_type]
+        return "".join((head, title, body, content, tail))
+
+    def _truncate_content(self, content: str, max_tokens: int = DIAGRAM_CONTENT_MAX_TOKENS) -> str:
+        """Keep the beginning and end of content within an approximate token budget"""
+        truncated = truncate_to_tokens(content, max_tokens, head_fraction=2 / 3)
+        if truncated is not content:
+            logger.info(f"Content truncated to ~{max_tokens} tokens (head + tail of {len(content)} characters)")
+        return truncated
 
     def _clean_code(self, code: str, expected_start: str) -> str:
         """Clean and validate Mermaid code"""
-        code = code.strip()
-
-        # Remove markdown code blocks
-        if code.startswith("```"):
-            lines = code.split("\n")
-            lines = [l for l in lines if not l.startswith("```")]
-            code = "\n".join(lines)
-
-        code = code.strip()
-
-        # Ensure proper start
-        if not code.startswith(expected_start):
-            # Try to find the diagram start
-            for line in code.split("\n"):
-                if line.strip().startswith(expected_start):
-                    idx = code.index(line)
-                    code = code[idx:]
-                    break
-            else:
-                # Add the expected start
-                code = expected_start + "\n" + code
-
-        return code
+        # Remove markdown code fences
+        code = _FENCE_RE.sub("", code).strip()
+
+        # Ensure proper start: keep everything from the first line that opens the diagram
+        match = re.search(r"^[ \t]*" + re.escape(expected_start), code, re.M)
+        if match:
+            return code[match.start():]
+
+        # Add the expected start
+        return expected_start + "\n" + code
 
     def _get_fallback(self, diagram_type: str, title: str, error: str) -> Dict[str, Any]:
         """Return fallback diagram if generation fails"""
@@ -0,0 +1,109 @@
+"""
+Process pool for uploaded-file extraction
+
+Docling parsing, chunking and embedding are CPU-bound; running them in worker
+processes lets concurrent uploads use every core instead of serializing on the
+GIL inside the shared background-task threads.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from config.settings import settings
+
+# Keys of rag_pipeline.process_document's result sent back to the parent; the
+# chunk objects stay in the worker since they're already stored in PGVector
+_RESULT_FIELDS = ("success", "error", "text", "chunk_count", "embeddings_stored", "markdown_path")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def extract_document(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Worker entry point: extract, index and topic-tag one uploaded file
+
+    Args:
+        payload: document_id, file_path and original_filename of the document
+
+    Returns:
+        The picklable subset of the RAG pipeline result, plus topic_data when topic
+        extraction succeeded or topic_error when it raised
+    """
+    from core.rag_pipeline import rag_pipeline
+    from documents.topic_extractor import topic_extractor
+
+    result = rag_pipeline.process_document(
+        file_path=payload["file_path"],
+        document_id=payload["document_id"],
+        store_embeddings=True
+    )
+    extraction = {key: result.get(key) for key in _RESULT_FIELDS}
+
+    text = (result.get("text") or "").strip()
+    if result.get("success") and text:
+        try:
+            extraction["topic_data"] = topic_extractor.extract_topics_and_domains(
+                text, payload["original_filename"]
+            )
+        except Exception as e:
+            extraction["topic_error"] = str(e)
+    return extraction
+
+
+def _init_worker(threads: int) -> None:
+    """
+    Limit a worker's compute threads so all workers together use about one per core,
+    and give it a small database pool
+    """
+    # Read at import by OpenMP/MKL-backed libraries the worker loads later
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    # Spawned workers may already have imported config.database (via the parent's main module)
+    from config.database import use_extraction_pool
+    use_extraction_pool()
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Shared extraction pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = max(1, settings.EXTRACTION_WORKERS)
+            # spawn, not fork: the parent holds DB connections, model threads and locks
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(max(1, (os.cpu_count() or 1) // workers),),
+            )
+        return _pool
+
+
+def run_extraction(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run extract_document in the pool and wait for its result"""
+    global _pool
+    pool = get_extraction_pool()
+    try:
+        return pool.submit(extract_document, payload).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge PDF); replace the pool for later uploads
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool.shutdown(wait=False)
+        raise
+
+
+def shutdown_extraction_pool() -> None:
+    """Stop the worker processes, dropping queued extractions"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
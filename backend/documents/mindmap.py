@@ -1,16 +1,56 @@
 """
 Mind Map Generator - Creates Mermaid diagrams from document content
 """
+import hashlib
+import re
 from typing import Dict, Any
+from utils.cache import TTLCache
 from utils.gemini_client import gemini_client
+from utils.helpers import truncate_to_tokens
 from utils.logger import logger
 
+# Terse fixed instructions: the model knows Mermaid, so no syntax tutorial or example is sent
+MINDMAP_RULES = """Output only raw Mermaid mindmap code for the document below, starting with "mindmap". No markdown fences or explanations.
+Indent 2 spaces per level. Node text: plain words, max 6 words, no quotes, colons or brackets."""
+
+MINDMAP_STYLE_RULES = {
+    "simple": "3-5 main branches, 1-2 sub-points each, max 2 levels.",
+    "default": "4-7 main branches, 2-4 sub-topics each, 2-3 levels.",
+    "detailed": "5-8 main branches with sub-topics and examples, 3-4 levels.",
+}
+
+# Approximate tokens of document content sent per style (beginning and end are kept);
+# shallow maps need less context
+MINDMAP_DEFAULT_MAX_CONTENT_TOKENS = 3750
+MINDMAP_MAX_CONTENT_TOKENS = {"simple": 2000}
+# Output cap; a detailed 3-4 level map stays well under this. Thinking is disabled so
+# the whole budget goes to the diagram.
+MINDMAP_MAX_OUTPUT_TOKENS = 2048
+
+# Generated mind maps keyed by content hash, title and style. Bump the version
+# whenever the prompt changes so stale maps stop being served.
+MINDMAP_PROMPT_VERSION = "3"
+MINDMAP_CACHE_SIZE = 256
+MINDMAP_CACHE_TTL_SECONDS = 24 * 3600
+
+# Markdown fence lines, each removed together with one adjacent newline
+_FENCE_LINE_RE = re.compile(r"^```[^\n]*\n|\n?^```[^\n]*$", re.M)
+# Lines with a quoted node ("...") that are not the root((...)) line
+_QUOTED_NODE_LINE_RE = re.compile(r'^(?!.*root\(\().*\(".*$', re.M)
+# ::icon / ::class styling up to the end of the line
+_STYLE_RE = re.compile(r"::[^\n]*")
+
+
+def _unquote_nodes(match: "re.Match[str]") -> str:
+    return match.group(0).replace('("', '(').replace('")', ')')
+
 
 class MindMapGenerator:
     """Generate Mermaid mind map diagrams from document content"""
 
     def __init__(self):
         self.gemini_client = gemini_client
+        self._cache = TTLCache(maxsize=MINDMAP_CACHE_SIZE, ttl=MINDMAP_CACHE_TTL_SECONDS)
 
     def generate_mindmap(
         self,
@@ -29,83 +69,53 @@ class MindMapGenerator:
         Returns:
             Dict with mermaid code and metadata
         """
+        cache_key = (
+            hashlib.blake2b(content.encode(), digest_size=16).hexdigest(),
+            title,
+            style,
+            MINDMAP_PROMPT_VERSION,
+        )
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Mind map for {title} served from cache")
+            return dict(cached)
+
         try:
             logger.info(f"Generating mind map for: {title}, content length: {len(content)}")
 
             # Truncate content if too long (to fit in context)
-            max_content = 15000
-            if len(content) > max_content:
-                content = content[:max_content] + "..."
-                logger.info(f"Content truncated to {max_content} characters")
-
-            # Define style-specific instructions
-            style_configs = {
-                "simple": {
-                    "instruction": "Create a SIMPLE mind map with only 3-5 main branches, each with 1-2 sub-points maximum.",
-                    "depth": "Keep it shallow - maximum 2 levels deep."
-                },
-                "default": {
-                    "instruction": "Create a BALANCED mind map with 4-7 main branches, each with 2-4 relevant sub-topics.",
-                    "depth": "Use 2-3 levels of depth for good detail."
-                },
-                "detailed": {
-                    "instruction": "Create a COMPREHENSIVE mind map with 5-8 main branches, each with multiple sub-topics and examples.",
-                    "depth": "Use 3-4 levels of depth to capture all important details."
-                }
-            }
-
-            config = style_configs.get(style, style_configs["default"])
-
-            prompt = f"""Analyze this document and create a Mermaid mind map diagram.
-
-DOCUMENT TITLE: {title}
+            max_tokens = MINDMAP_MAX_CONTENT_TOKENS.get(style, MINDMAP_DEFAULT_MAX_CONTENT_TOKENS)
+            truncated = truncate_to_tokens(content, max_tokens)
+            if truncated is not content:
+                content = truncated
+                logger.info(f"Content truncated to ~{max_tokens} tokens")
 
-REQUIREMENTS:
-{config['instruction']}
-{config['depth']}
+            style_rule = MINDMAP_STYLE_RULES.get(style, MINDMAP_STYLE_RULES["default"])
+            prompt = f"""{MINDMAP_RULES}
+{style_rule}
+Root node: root(("{title}"))
 
-MERMAID SYNTAX RULES (IMPORTANT):
-1. Start with: mindmap
-2. Use indentation (2 spaces) to show hierarchy
-3. Root node format: root(("{title}"))
-4. Main branches: just text, indented 2 spaces
-5. Sub-branches: indented 4 spaces, and so on
-6. Use simple text only - NO special characters like quotes, colons, or brackets in node text
-7. Keep node text SHORT (max 5-6 words per node)
-8. Replace any special characters with spaces or remove them
-
-EXAMPLE FORMAT:
-mindmap
-  root(("Machine Learning"))
-    Supervised Learning
-      Classification
-      Regression
-    Unsupervised Learning
-      Clustering
-      Dimensionality Reduction
-    Deep Learning
-      Neural Networks
-      CNNs
-
-DOCUMENT CONTENT:
-{content}
-
-Generate ONLY the Mermaid mindmap code, nothing else. No explanations, no markdown code blocks, just the raw mermaid code starting with "mindmap"."""
+DOCUMENT:
+{content}"""
 
             # Generate using Gemini
-            mermaid_code = self.gemini_client.generate_text(prompt, temperature=0.3)
+            mermaid_code = self.gemini_client.generate_text(
+                prompt, temperature=0.3, max_output_tokens=MINDMAP_MAX_OUTPUT_TOKENS, thinking_budget=0
+            )
 
             # Clean up the response
             mermaid_code = self._clean_mermaid_code(mermaid_code, title)
 
             logger.info(f"Mind map generated successfully, code length: {len(mermaid_code)}")
 
-            return {
+            result = {
                 "success": True,
                 "mermaid_code": mermaid_code,
                 "title": title,
                 "style": style
             }
+            self._cache.set(cache_key, result)
+            return dict(result)
 
         except Exception as e:
             logger.error(f"Mind map generation error: {e}")
@@ -120,28 +130,16 @@ Generate ONLY the Mermaid mindmap code, nothing else. No explanations, no markdo
         # Remove markdown code blocks if present
         code = code.strip()
         if code.startswith("```"):
-            lines = code.split("\n")
-            # Remove first and last lines (```mermaid and ```)
-            lines = [l for l in lines if not l.startswith("```")]
-            code = "\n".join(lines)
+            code = _FENCE_LINE_RE.sub("", code)
 
         # Ensure it starts with mindmap
         if not code.strip().startswith("mindmap"):
             code = "mindmap\n" + code
 
-        # Clean up any problematic characters in node text
-        lines = code.split("\n")
-        cleaned_lines = []
-        for line in lines:
-            # Remove quotes around regular nodes (but keep root format)
-            if "root((" not in line and '("' in line:
-                line = line.replace('("', '(').replace('")', ')')
-            # Remove standalone quotes
-            if '::' in line:  # Remove any styling that might cause issues
-                line = line.split('::')[0]
-            cleaned_lines.append(line)
-
-        return "\n".join(cleaned_lines)
+        # Remove quotes around regular nodes (but keep root format)
+        code = _QUOTED_NODE_LINE_RE.sub(_unquote_nodes, code)
+        # Remove any styling that might cause issues
+        return _STYLE_RE.sub("", code)
 
     def _get_fallback_mindmap(self, title: str) -> str:
         """Return a fallback mind map if generation fails"""
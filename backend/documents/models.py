@@ -1,15 +1,19 @@
 """
 Document model for file uploads and content management
 """
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum as SQLEnum, Text
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum as SQLEnum, Text, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-import uuid
 import enum
 from typing import Optional
 from config.database import Base
 
+try:
+    from uuid import uuid7  # Python 3.14+
+except ImportError:
+    from uuid6 import uuid7
+
 class ContentType(str, enum.Enum):
     YOUTUBE = "youtube"
     ARTICLE = "article"
@@ -29,7 +33,8 @@ class ProcessingStatus(str, enum.Enum):
 class Document(Base):
     __tablename__ = "documents"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Time-ordered ids keep primary key inserts on the rightmost B-tree leaf
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String(500))
     content_type = Column(SQLEnum(ContentType), nullable=False)
@@ -38,6 +43,7 @@ class Document(Base):
     file_path = Column(String(1000))
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     file_size = Column(Integer)  # in bytes
+    file_hash = Column(String(32))  # blake2b-128 hex digest of the uploaded bytes
     processing_status = Column(SQLEnum(ProcessingStatus), default=ProcessingStatus.PENDING)
     vector_db_reference_id = Column(String(255))
     doc_metadata = Column(JSONB)  # Renamed from metadata to avoid SQLAlchemy conflict
@@ -52,6 +58,19 @@ class Document(Base):
     subject_area = Column(String(200))  # Primary subject (e.g., Computer Science, Mathematics)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Mirrors migrations/003_document_indexes.sql, 004_document_file_hash.sql and
+    # 005_document_listing_index.sql. The (user_id, processing_status) index also serves
+    # user_id-only lookups; (user_id, upload_date, id) backs keyset-paginated listings;
+    # GIN indexes back JSONB @> filters.
+    __table_args__ = (
+        Index('idx_documents_user_status', 'user_id', 'processing_status'),
+        Index('idx_documents_user_file_hash', 'user_id', 'file_hash'),
+        Index('idx_documents_user_upload_date', 'user_id', 'upload_date', 'id'),
+        Index('idx_documents_subject_area', 'subject_area'),
+        Index('idx_documents_domains_gin', 'domains', postgresql_using='gin'),
+        Index('idx_documents_topics_gin', 'topics', postgresql_using='gin'),
+    )
     
     @property
     def unique_filename(self) -> Optional[str]:
@@ -1,7 +1,7 @@
 """
 Document schemas for request/response validation
 """
-from pydantic import BaseModel, HttpUrl, Field
+from pydantic import BaseModel, ConfigDict, HttpUrl, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -34,6 +34,9 @@ class URLUpload(BaseModel):
 
 class DocumentResponse(BaseModel):
     """Schema for document response"""
+    # populate_by_name maps doc_metadata to metadata for serialization
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
     id: uuid.UUID
     user_id: uuid.UUID
     title: Optional[str]
@@ -54,15 +57,10 @@ class DocumentResponse(BaseModel):
     difficulty_level: Optional[str] = None
     subject_area: Optional[str] = None
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
-        # Map doc_metadata to metadata for serialization
-        populate_by_name = True
 
 class DocumentListResponse(BaseModel):
     """Schema for document list response"""
     documents: list[DocumentResponse]
-    total: int
-    page: int
     page_size: int
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; absent on the last page
+    total: Optional[int] = None  # Only when requested with include_total=true
@@ -0,0 +1,42 @@
+"""
+PDF thumbnail rendering
+
+Kept apart from upload_handler so process-pool workers only import PyMuPDF, not
+the RAG pipeline and its models.
+"""
+from typing import Optional
+from utils.logger import logger
+
+# First-page thumbnails: native resolution, JPEG-encoded (PNG deflate dominated render time)
+THUMBNAIL_ZOOM = 1.0
+THUMBNAIL_JPEG_QUALITY = 80
+
+
+def render_thumbnail(file_path: str, thumbnail_path: str) -> Optional[str]:
+    """
+    Render page 1 of a PDF to a JPEG thumbnail.
+
+    Module-level so it can run in a process pool (PyMuPDF handles don't pickle).
+
+    Returns:
+        thumbnail_path, or None on failure
+    """
+    try:
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(file_path)
+        if len(doc) == 0:
+            doc.close()
+            return None
+
+        page = doc[0]
+        mat = fitz.Matrix(THUMBNAIL_ZOOM, THUMBNAIL_ZOOM)
+        pix = page.get_pixmap(matrix=mat)
+        pix.save(thumbnail_path, "jpeg", jpg_quality=THUMBNAIL_JPEG_QUALITY)
+        pix = None
+
+        doc.close()
+        return thumbnail_path
+    except Exception as e:
+        logger.error(f"Thumbnail generation failed for {file_path}: {e}")
+        return None
@@ -2,16 +2,152 @@
 AI-powered topic and domain extraction service
 Analyzes document content to identify topics, domains, skills, and subject areas
 """
-from typing import Dict, List, Any
+from collections import Counter
+from typing import Dict, List, Any, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from documents.models import Document, ProcessingStatus
+from utils.cache import TTLCache
 from utils.gemini_client import gemini_client
-import json
+from utils.helpers import truncate_to_tokens
+import copy
+import hashlib
+import orjson
 import re
+import uuid
+
+try:
+    import ahocorasick
+except ImportError:  # optional: keyword detection falls back to per-keyword scans
+    ahocorasick = None  # type: ignore
+
+# Approximate tokens of each document sent for analysis: 60% from the beginning,
+# 40% from the end so conclusions and summaries are covered too
+TOPIC_ANALYSIS_TOKENS = 750
+# Output cap per analyzed document (JSON is requested directly, thinking is disabled);
+# a full 9-field object with 15-item lists stays under this
+TOPIC_MAX_OUTPUT_TOKENS = 1024
+# AI extraction results keyed by a hash of (filename, analyzed text); bump the
+# version whenever the prompt changes
+TOPIC_PROMPT_VERSION = "3"
+TOPIC_CACHE_SIZE = 512
+TOPIC_CACHE_TTL_SECONDS = 24 * 3600
+
+PROGRAMMING_LANGUAGES = ['python', 'java', 'javascript', 'c++', 'c#', 'ruby', 'php', 'swift', 'kotlin', 'go', 'rust']
+TECHNOLOGIES = ['react', 'angular', 'vue', 'node', 'express', 'django', 'flask', 'spring',
+                'docker', 'kubernetes', 'git', 'aws', 'azure', 'tensorflow', 'pytorch']
+
+# Common domains mapping for rule-based extraction
+DOMAIN_KEYWORDS = {
+    'Artificial Intelligence': ['machine learning', 'deep learning', 'neural network', 'ai', 'artificial intelligence'],
+    'Web Development': ['html', 'css', 'javascript', 'web', 'frontend', 'backend', 'react', 'angular', 'vue'],
+    'Data Science': ['data science', 'data analysis', 'statistics', 'visualization', 'pandas', 'numpy'],
+    'Cloud Computing': ['aws', 'azure', 'cloud', 'docker', 'kubernetes', 'devops'],
+    'Cybersecurity': ['security', 'encryption', 'cybersecurity', 'authentication', 'firewall'],
+    'Mobile Development': ['android', 'ios', 'mobile', 'swift', 'kotlin', 'flutter'],
+    'Database': ['database', 'sql', 'mongodb', 'postgresql', 'mysql', 'nosql'],
+    'Software Engineering': ['software', 'programming', 'coding', 'development', 'engineering']
+}
+
+# Precompiled patterns for the fallback parsers; each language/technology list is one
+# alternation so the text is scanned once rather than once per entry
+_TOPICS_RE = re.compile(r'topics[:\s]+(.+?)(?=domains|keywords|$)', re.IGNORECASE | re.DOTALL)
+_DOMAINS_RE = re.compile(r'domains[:\s]+(.+?)(?=keywords|subject|$)', re.IGNORECASE | re.DOTALL)
+_KEYWORDS_RE = re.compile(r'keywords[:\s]+(.+?)(?=subject|difficulty|$)', re.IGNORECASE | re.DOTALL)
+_LIST_SPLIT_RE = re.compile(r'[,\n]|(?:^|\n)[\-•*]\s*')
+_LANGUAGE_RE = re.compile(
+    r'\b(' + '|'.join(sorted(map(re.escape, PROGRAMMING_LANGUAGES), key=len, reverse=True)) + r')\b'
+)
+_TECHNOLOGY_RE = re.compile('|'.join(sorted(map(re.escape, TECHNOLOGIES), key=len, reverse=True)))
+# Whole-word difficulty cues for the rule-based fallback ("basically" is not "basic")
+_BEGINNER_RE = re.compile(r'\b(?:basic|introduction|beginner|fundamentals|getting started)\b')
+_ADVANCED_RE = re.compile(r'\b(?:advanced|expert|complex|optimization|architecture)\b')
+
+def _build_keyword_automaton():
+    """Aho-Corasick automaton mapping every domain keyword and technology to its labels"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    entries = [(keyword, ('domain', domain)) for domain, keywords in DOMAIN_KEYWORDS.items() for keyword in keywords]
+    entries += [(tech, ('tech', tech)) for tech in TECHNOLOGIES]
+    for keyword, label in entries:
+        # A keyword can belong to a domain and also be a technology (e.g. "docker")
+        automaton.add_word(keyword, automaton.get(keyword, ()) + (label,))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+_LIST_FIELDS = (
+    'topics', 'domains', 'keywords', 'technical_skills', 'concepts', 'technologies', 'programming_languages'
+)
+
+
+def _dedupe_case_insensitive(items: List[Any], limit: int = 15) -> List[str]:
+    """First spelling of each case-insensitively distinct item longer than 2 characters"""
+    unique: Dict[str, str] = {}
+    for item in items:
+        text = str(item).strip()
+        key = text.lower()
+        if len(key) > 2:
+            unique.setdefault(key, text)
+            if len(unique) == limit:
+                break
+    return list(unique.values())
+
+
+def _match_domains_and_technologies(text_lower: str) -> Tuple[List[str], List[str]]:
+    """Substring-match domain keywords and technologies; returns (domains, capitalized technologies)"""
+    if _KEYWORD_AUTOMATON is not None:
+        # One linear pass finds every keyword occurrence
+        hits = {label for _, labels in _KEYWORD_AUTOMATON.iter(text_lower) for label in labels}
+        domains = [domain for domain in DOMAIN_KEYWORDS if ('domain', domain) in hits]
+        technologies = [tech.capitalize() for tech in TECHNOLOGIES if ('tech', tech) in hits]
+        return domains, technologies
+
+    domains = [
+        domain for domain, keywords in DOMAIN_KEYWORDS.items()
+        if any(keyword in text_lower for keyword in keywords)
+    ]
+    found_technologies = set(_TECHNOLOGY_RE.findall(text_lower))
+    technologies = [tech.capitalize() for tech in TECHNOLOGIES if tech in found_technologies]
+    return domains, technologies
+
+
+TOPIC_JSON_FORMAT = """{
+    "topics": ["topic1", "topic2", "topic3", ...],
+    "domains": ["domain1", "domain2", ...],
+    "keywords": ["keyword1", "keyword2", "keyword3", ...],
+    "subject_area": "primary subject",
+    "difficulty_level": "beginner/intermediate/advanced",
+    "technical_skills": ["skill1", "skill2", ...],
+    "concepts": ["concept1", "concept2", ...],
+    "technologies": ["tech1", "tech2", ...],
+    "programming_languages": ["lang1", "lang2", ...]
+}"""
+
+TOPIC_GUIDELINES = """GUIDELINES:
+- topics: specific subjects (e.g. "Neural Networks", "REST APIs"); domains: broader fields (e.g. "Web Development")
+- keywords: key terms, frameworks, methodologies; subject_area: primary academic/professional field
+- difficulty_level: beginner, intermediate or advanced
+- technical_skills: concrete abilities; concepts: theoretical ideas; technologies: tools and platforms
+- programming_languages: languages mentioned or implied"""
 
 class TopicExtractor:
     """Extract topics, domains, and keywords from document content"""
     
     def __init__(self):
         self.gemini = gemini_client
+        self._cache = TTLCache(maxsize=TOPIC_CACHE_SIZE, ttl=TOPIC_CACHE_TTL_SECONDS)
+
+    def _cache_key(self, analysis_text: str, filename: str) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(filename.encode())
+        digest.update(b"\0")
+        digest.update(analysis_text.encode())
+        return f"{digest.hexdigest()}:{TOPIC_PROMPT_VERSION}"
     
     def extract_topics_and_domains(
         self, 
@@ -28,10 +164,29 @@ class TopicExtractor:
         Returns:
             Dictionary with topics, domains, keywords, subject area, and difficulty
         """
-        # Truncate text for analysis (first 3000 chars for context)
-        analysis_text = text[:3000] if len(text) > 3000 else text
-        
-        prompt = f"""
+        # Truncated once: both the cache key and the prompt use it
+        analysis_text = truncate_to_tokens(text, TOPIC_ANALYSIS_TOKENS)
+        cache_key = self._cache_key(analysis_text, filename)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        try:
+            response = self.gemini.generate_text(
+                self._build_extraction_prompt(analysis_text, filename),
+                temperature=0.2,
+                max_output_tokens=TOPIC_MAX_OUTPUT_TOKENS,
+                json_output=True,
+                thinking_budget=0
+            )
+            return self._finish_extraction(response, cache_key)
+        except Exception as e:
+            print(f"AI extraction failed: {e}, falling back to rule-based")
+            return self._rule_based_extraction(text, filename)
+
+    def _build_extraction_prompt(self, analysis_text: str, filename: str) -> str:
+        """Single-document extraction prompt for the already-truncated analysis text"""
+        return f"""
 Analyze the following document content and extract comprehensive topic information for career tracking and skills analysis.
 
 FILENAME: {filename}
@@ -40,48 +195,26 @@ CONTENT:
 {analysis_text}
 
 Provide a detailed analysis in the following JSON format:
-{{
-    "topics": ["topic1", "topic2", "topic3", ...],
-    "domains": ["domain1", "domain2", ...],
-    "keywords": ["keyword1", "keyword2", "keyword3", ...],
-    "subject_area": "primary subject",
-    "difficulty_level": "beginner/intermediate/advanced",
-    "technical_skills": ["skill1", "skill2", ...],
-    "concepts": ["concept1", "concept2", ...],
-    "technologies": ["tech1", "tech2", ...],
-    "programming_languages": ["lang1", "lang2", ...]
-}}
-
-GUIDELINES:
-1. **Topics**: Specific subjects discussed (e.g., "Machine Learning", "Neural Networks", "REST APIs", "Database Design")
-2. **Domains**: Broader fields/industries (e.g., "Artificial Intelligence", "Web Development", "Data Science", "Cloud Computing", "Cybersecurity")
-3. **Keywords**: Important terms, technologies, frameworks, methodologies (e.g., "TensorFlow", "React", "Agile", "SQL")
-4. **Subject Area**: Primary academic/professional field (e.g., "Computer Science", "Software Engineering", "Business Analytics")
-5. **Difficulty Level**: Assess content complexity - beginner, intermediate, or advanced
-6. **Technical Skills**: Concrete technical abilities mentioned (e.g., "Python Programming", "API Development", "Data Analysis")
-7. **Concepts**: Theoretical concepts covered (e.g., "Object-Oriented Programming", "Design Patterns", "Algorithm Complexity")
-8. **Technologies**: Tools, platforms, frameworks (e.g., "Docker", "AWS", "MongoDB", "Git")
-9. **Programming Languages**: Any programming languages mentioned or implied
+{TOPIC_JSON_FORMAT}
+
+{TOPIC_GUIDELINES}
 
 Return ONLY the JSON object, no additional text.
 """
+
+    def _finish_extraction(self, response: str, cache_key: str) -> Dict[str, Any]:
+        """Parse, validate, tag and cache a single-document model response"""
+        extracted_data = self._parse_extraction_response(response)
         
-        try:
-            response = self.gemini.generate_text(prompt, temperature=0.2)
-            extracted_data = self._parse_extraction_response(response)
-            
-            # Validate and clean data
-            extracted_data = self._validate_and_clean(extracted_data)
-            
-            # Add metadata
-            extracted_data['extraction_confidence'] = 'high'
-            extracted_data['extraction_method'] = 'ai'
-            
-            return extracted_data
-            
-        except Exception as e:
-            print(f"AI extraction failed: {e}, falling back to rule-based")
-            return self._rule_based_extraction(text, filename)
+        # Validate and clean data
+        extracted_data = self._validate_and_clean(extracted_data)
+        
+        # Add metadata
+        extracted_data['extraction_confidence'] = 'high'
+        extracted_data['extraction_method'] = 'ai'
+        
+        self._cache.set(cache_key, copy.deepcopy(extracted_data))
+        return extracted_data
     
     def _parse_extraction_response(self, response: str) -> Dict[str, Any]:
         """Parse AI response into structured format"""
@@ -92,7 +225,7 @@ Return ONLY the JSON object, no additional text.
             
             if json_start != -1 and json_end > json_start:
                 json_str = response[json_start:json_end]
-                data = json.loads(json_str)
+                data = orjson.loads(json_str)
                 return data
             
             # Try alternative parsing
@@ -117,19 +250,19 @@ Return ONLY the JSON object, no additional text.
         }
         
         # Extract topics (lines starting with "Topics:" or "- ")
-        topics_match = re.search(r'topics[:\s]+(.+?)(?=domains|keywords|$)', response, re.IGNORECASE | re.DOTALL)
+        topics_match = _TOPICS_RE.search(response)
         if topics_match:
             topics_text = topics_match.group(1)
             result['topics'] = self._extract_list_items(topics_text)
         
         # Extract domains
-        domains_match = re.search(r'domains[:\s]+(.+?)(?=keywords|subject|$)', response, re.IGNORECASE | re.DOTALL)
+        domains_match = _DOMAINS_RE.search(response)
         if domains_match:
             domains_text = domains_match.group(1)
             result['domains'] = self._extract_list_items(domains_text)
         
         # Extract keywords
-        keywords_match = re.search(r'keywords[:\s]+(.+?)(?=subject|difficulty|$)', response, re.IGNORECASE | re.DOTALL)
+        keywords_match = _KEYWORDS_RE.search(response)
         if keywords_match:
             keywords_text = keywords_match.group(1)
             result['keywords'] = self._extract_list_items(keywords_text)
@@ -139,7 +272,7 @@ Return ONLY the JSON object, no additional text.
     def _extract_list_items(self, text: str) -> List[str]:
         """Extract items from text list"""
         # Split by commas, newlines, or bullet points
-        items = re.split(r'[,\n]|(?:^|\n)[\-•*]\s*', text)
+        items = _LIST_SPLIT_RE.split(text)
         # Clean and filter
         items = [item.strip().strip('"\'[]') for item in items if item.strip()]
         # Remove empty and very short items
@@ -167,18 +300,10 @@ Return ONLY the JSON object, no additional text.
             elif isinstance(default, list) and not isinstance(data[field], list):
                 data[field] = [data[field]] if data[field] else []
         
-        # Clean and deduplicate lists
-        for field in ['topics', 'domains', 'keywords', 'technical_skills', 'concepts', 'technologies', 'programming_languages']:
+        # Clean and deduplicate lists (case-insensitive, max 15 items per field)
+        for field in _LIST_FIELDS:
             if isinstance(data[field], list):
-                # Remove duplicates (case-insensitive)
-                seen = set()
-                cleaned = []
-                for item in data[field]:
-                    item_lower = str(item).lower().strip()
-                    if item_lower and item_lower not in seen and len(item_lower) > 2:
-                        seen.add(item_lower)
-                        cleaned.append(str(item).strip())
-                data[field] = cleaned[:15]  # Limit to 15 items per field
+                data[field] = _dedupe_case_insensitive(data[field])
         
         # Validate difficulty level
         valid_difficulties = ['beginner', 'intermediate', 'advanced']
@@ -197,44 +322,21 @@ Return ONLY the JSON object, no additional text.
         """Fallback rule-based extraction when AI fails"""
         text_lower = text.lower()
         
-        # Common domains mapping
-        domain_keywords = {
-            'Artificial Intelligence': ['machine learning', 'deep learning', 'neural network', 'ai', 'artificial intelligence'],
-            'Web Development': ['html', 'css', 'javascript', 'web', 'frontend', 'backend', 'react', 'angular', 'vue'],
-            'Data Science': ['data science', 'data analysis', 'statistics', 'visualization', 'pandas', 'numpy'],
-            'Cloud Computing': ['aws', 'azure', 'cloud', 'docker', 'kubernetes', 'devops'],
-            'Cybersecurity': ['security', 'encryption', 'cybersecurity', 'authentication', 'firewall'],
-            'Mobile Development': ['android', 'ios', 'mobile', 'swift', 'kotlin', 'flutter'],
-            'Database': ['database', 'sql', 'mongodb', 'postgresql', 'mysql', 'nosql'],
-            'Software Engineering': ['software', 'programming', 'coding', 'development', 'engineering']
-        }
-        
-        # Detect domains
-        detected_domains = []
-        for domain, keywords in domain_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                detected_domains.append(domain)
+        detected_domains, technologies = _match_domains_and_technologies(text_lower)
         
         # Extract programming languages
-        programming_languages = []
-        lang_patterns = ['python', 'java', 'javascript', 'c\\+\\+', 'c#', 'ruby', 'php', 'swift', 'kotlin', 'go', 'rust']
-        for lang in lang_patterns:
-            if re.search(rf'\b{lang}\b', text_lower):
-                programming_languages.append(lang.upper() if len(lang) <= 3 else lang.capitalize())
-        
-        # Extract common technologies
-        tech_patterns = ['react', 'angular', 'vue', 'node', 'express', 'django', 'flask', 'spring', 
-                        'docker', 'kubernetes', 'git', 'aws', 'azure', 'tensorflow', 'pytorch']
-        technologies = []
-        for tech in tech_patterns:
-            if tech in text_lower:
-                technologies.append(tech.capitalize())
+        found_languages = set(_LANGUAGE_RE.findall(text_lower))
+        programming_languages = [
+            lang.upper() if len(lang) <= 3 else lang.capitalize()
+            for lang in PROGRAMMING_LANGUAGES
+            if lang in found_languages
+        ]
         
         # Determine difficulty based on content complexity
         difficulty = 'intermediate'
-        if any(term in text_lower for term in ['basic', 'introduction', 'beginner', 'fundamentals', 'getting started']):
+        if _BEGINNER_RE.search(text_lower):
             difficulty = 'beginner'
-        elif any(term in text_lower for term in ['advanced', 'expert', 'complex', 'optimization', 'architecture']):
+        elif _ADVANCED_RE.search(text_lower):
             difficulty = 'advanced'
         
         return {
@@ -264,51 +366,25 @@ Return ONLY the JSON object, no additional text.
         Returns:
             Aggregated interest profile
         """
-        all_topics = []
-        all_domains = []
-        all_keywords = []
-        all_skills = []
-        all_technologies = []
-        all_languages = []
-        
-        domain_counts = {}
-        topic_counts = {}
-        skill_counts = {}
+        domain_counts = Counter()
+        topic_counts = Counter()
+        skill_counts = Counter()
+        keywords = set()
+        technologies = set()
+        languages = set()
         
         for doc in documents_data:
-            # Aggregate topics
-            for topic in doc.get('topics', []):
-                all_topics.append(topic)
-                topic_counts[topic] = topic_counts.get(topic, 0) + 1
-            
-            # Aggregate domains
-            for domain in doc.get('domains', []):
-                all_domains.append(domain)
-                domain_counts[domain] = domain_counts.get(domain, 0) + 1
-            
-            # Aggregate keywords
-            all_keywords.extend(doc.get('keywords', []))
-            
-            # Aggregate skills
-            for skill in doc.get('technical_skills', []):
-                all_skills.append(skill)
-                skill_counts[skill] = skill_counts.get(skill, 0) + 1
-            
-            # Aggregate technologies
-            all_technologies.extend(doc.get('technologies', []))
-            
-            # Aggregate programming languages
-            all_languages.extend(doc.get('programming_languages', []))
+            topic_counts.update(doc.get('topics', []))
+            domain_counts.update(doc.get('domains', []))
+            skill_counts.update(doc.get('technical_skills', []))
+            keywords.update(doc.get('keywords', []))
+            technologies.update(doc.get('technologies', []))
+            languages.update(doc.get('programming_languages', []))
         
-        # Sort by frequency
-        top_domains = sorted(domain_counts.items(), key=lambda x: x[1], reverse=True)
-        top_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)
-        top_skills = sorted(skill_counts.items(), key=lambda x: x[1], reverse=True)
-        
-        # Deduplicate
-        unique_keywords = list(set(all_keywords))
-        unique_technologies = list(set(all_technologies))
-        unique_languages = list(set(all_languages))
+        # Sort by frequency (ties keep first-seen order)
+        top_domains = domain_counts.most_common()
+        top_topics = topic_counts.most_common()
+        top_skills = skill_counts.most_common()
         
         return {
             'primary_domains': [domain for domain, _ in top_domains[:5]],
@@ -316,15 +392,55 @@ Return ONLY the JSON object, no additional text.
             'primary_topics': [topic for topic, _ in top_topics[:10]],
             'all_topics': [topic for topic, _ in top_topics],
             'top_skills': [skill for skill, _ in top_skills[:10]],
-            'all_skills': list(set(all_skills)),
-            'technologies': unique_technologies[:15],
-            'programming_languages': unique_languages,
-            'keywords': unique_keywords[:30],
+            'all_skills': list(skill_counts),
+            'technologies': list(technologies)[:15],
+            'programming_languages': list(languages),
+            'keywords': list(keywords)[:30],
             'total_documents': len(documents_data),
             'domain_distribution': dict(top_domains),
             'topic_distribution': dict(top_topics),
             'skill_distribution': dict(top_skills)
         }
 
+
+# Per-document fields consumed by aggregate_user_interests; the last three live in doc_metadata
+TOPIC_PROFILE_FIELDS = (
+    'topics', 'domains', 'keywords', 'technical_skills', 'technologies', 'programming_languages'
+)
+_METADATA_PROFILE_FIELDS = ('technical_skills', 'technologies', 'programming_languages')
+
+
+def load_user_topic_data(
+    db: Session,
+    user_id: uuid.UUID,
+    fields: Tuple[str, ...] = TOPIC_PROFILE_FIELDS
+) -> List[Dict[str, Any]]:
+    """
+    Load the topic fields of a user's completed documents for aggregate_user_interests.
+
+    Only the requested columns / doc_metadata keys are selected, so large columns
+    such as extracted_text never leave the database.
+
+    Args:
+        db: Database session
+        user_id: Owner of the documents
+        fields: Subset of TOPIC_PROFILE_FIELDS to load
+
+    Returns:
+        One dict per document mapping each field to its list (empty if unset)
+    """
+    columns = [
+        (Document.doc_metadata[field] if field in _METADATA_PROFILE_FIELDS else getattr(Document, field)).label(field)
+        for field in fields
+    ]
+    rows = db.execute(
+        select(*columns).where(
+            Document.user_id == user_id,
+            Document.processing_status == ProcessingStatus.COMPLETED
+        )
+    ).mappings()
+    return [{field: row[field] or [] for field in fields} for row in rows]
+
+
 # Global topic extractor instance
 topic_extractor = TopicExtractor()
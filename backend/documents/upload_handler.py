@@ -1,13 +1,33 @@
 """
 Document upload handler
 """
+import asyncio
+import hashlib
+import multiprocessing
 import os
-import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-from fastapi import UploadFile
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
 import uuid
 from config.settings import settings
+from core.rag_pipeline import rag_pipeline
+from documents.thumbnails import render_thumbnail
+from utils.cache import TTLCache
+from utils.logger import logger
+
+# Read/write size when copying an upload to disk (vs shutil's 16-64 KiB default)
+UPLOAD_COPY_CHUNK_SIZE = 1 << 20
+# Successful on-demand extractions keyed by (path, size, mtime), so repeated
+# summary/quiz/notes requests for the same file skip parsing and embedding
+EXTRACTION_CACHE_SIZE = 32
+EXTRACTION_CACHE_TTL_SECONDS = 24 * 3600
+# Uploads at least this large have their cached pages dropped once indexing has read them
+PAGE_CACHE_RELEASE_MIN_BYTES = 10 << 20
+# Per-user upload folders known to exist, so steady-state uploads skip the mkdir syscall
+USER_FOLDER_CACHE_SIZE = 10_000
+USER_FOLDER_CACHE_TTL_SECONDS = 3600
+
 
 class UploadHandler:
     """Handle file uploads"""
@@ -18,6 +38,13 @@ class UploadHandler:
         self.upload_folder.mkdir(parents=True, exist_ok=True)
         self.thumbnails_folder = self.upload_folder / "thumbnails"
         self.thumbnails_folder.mkdir(parents=True, exist_ok=True)
+        self._extraction_cache = TTLCache(maxsize=EXTRACTION_CACHE_SIZE, ttl=EXTRACTION_CACHE_TTL_SECONDS)
+        self._user_folders = TTLCache(maxsize=USER_FOLDER_CACHE_SIZE, ttl=USER_FOLDER_CACHE_TTL_SECONDS)
+        # Upload copies get their own small pool: a burst of uploads queues here instead of
+        # occupying the shared blocking-io executor, and disk writes stay at a fixed depth
+        self._upload_executor = ThreadPoolExecutor(
+            max_workers=settings.UPLOAD_IO_THREADS, thread_name_prefix="upload-io"
+        )
 
     def generate_thumbnail(self, file_path: str, document_id: str) -> Optional[str]:
         """
@@ -30,62 +57,193 @@ class UploadHandler:
         Returns:
             Path to generated thumbnail, or None on failure
         """
-        try:
-            import fitz  # PyMuPDF
+        # Thumbnails are keyed by the stable document id, so an existing one is reused
+        thumbnail_path = self.thumbnails_folder / f"{document_id}.jpg"
+        if thumbnail_path.exists():
+            return str(thumbnail_path)
 
-            doc = fitz.open(file_path)
-            if len(doc) == 0:
-                doc.close()
-                return None
+        return render_thumbnail(file_path, str(thumbnail_path))
 
-            page = doc[0]
-            # Render at 1.5x zoom for decent quality thumbnails
-            mat = fitz.Matrix(1.5, 1.5)
-            pix = page.get_pixmap(matrix=mat)
+    def generate_thumbnails_bulk(self, items: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """
+        Generate thumbnails for many PDFs, rendering in parallel worker processes.
 
-            thumbnail_path = self.thumbnails_folder / f"{document_id}.png"
-            pix.save(str(thumbnail_path))
+        Args:
+            items: (file_path, document_id) pairs
 
-            doc.close()
-            return str(thumbnail_path)
-        except Exception as e:
-            print(f"Thumbnail generation failed for {file_path}: {e}")
-            return None
+        Returns:
+            Thumbnail path (or None on failure) for each item, in input order
+        """
+        results: List[Optional[str]] = []
+        pending: List[int] = []
+        for index, (_, document_id) in enumerate(items):
+            thumbnail_path = self.thumbnails_folder / f"{document_id}.jpg"
+            results.append(str(thumbnail_path))
+            if not thumbnail_path.exists():
+                pending.append(index)
 
-    def save_file(self, file: UploadFile, user_id: uuid.UUID) -> dict:
+        if len(pending) <= 1:
+            for index in pending:
+                results[index] = render_thumbnail(items[index][0], results[index])
+            return results
+
+        # spawn, not fork: the parent holds DB connections, model threads and locks
+        with ProcessPoolExecutor(
+            max_workers=min(os.cpu_count() or 1, len(pending)),
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            rendered = executor.map(
+                render_thumbnail,
+                [items[index][0] for index in pending],
+                [results[index] for index in pending]
+            )
+            for index, thumbnail_path in zip(pending, rendered):
+                results[index] = thumbnail_path
+        return results
+
+    async def save_file(self, file: UploadFile, user_id: uuid.UUID, ext: str) -> dict:
         """
         Save uploaded file
         
+        The copy runs on the dedicated upload-io threads so large uploads don't block
+        the event loop.
+        
         Args:
             file: Uploaded file
             user_id: User ID
+            ext: Lowercased extension from DocumentValidator.validate_upload
             
         Returns:
             Dictionary with file info
         """
         # Create user directory
-        user_folder = self.upload_folder / str(user_id)
-        user_folder.mkdir(parents=True, exist_ok=True)
+        user_folder = self._user_folder(user_id)
         
         # Generate unique filename
-        file_ext = Path(file.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
+        unique_filename = f"{uuid.uuid4()}.{ext}" if ext else str(uuid.uuid4())
         file_path = user_folder / unique_filename
         
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        # Save file, rejecting it as soon as it passes the size limit
+        max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        try:
+            file_size, file_hash = await self.write_upload(file, file_path, max_size=max_size)
+        except FileNotFoundError:
+            # The folder was removed after it was cached; open() failed before reading anything
+            self._user_folders.pop(user_id)
+            self._user_folder(user_id)
+            file_size, file_hash = await self.write_upload(file, file_path, max_size=max_size)
         
         return {
             "file_path": str(file_path),
             "original_filename": file.filename,
             "file_size": file_size,
+            "file_hash": file_hash,
             "unique_filename": unique_filename
         }
-    
+
+    def _user_folder(self, user_id: uuid.UUID) -> Path:
+        """Upload folder of user_id, created on first use"""
+        user_folder = self._user_folders.get(user_id)
+        if user_folder is None:
+            user_folder = self.upload_folder / str(user_id)
+            user_folder.mkdir(parents=True, exist_ok=True)
+            self._user_folders.set(user_id, user_folder)
+        return user_folder
+
+    async def write_upload(
+        self, file: UploadFile, file_path: Path, max_size: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """
+        Stream an uploaded file to file_path on the upload-io threads
+        
+        Returns:
+            (bytes written, 32-char blake2b hex digest of the content)
+        
+        Raises:
+            HTTPException 413 if the upload exceeds max_size bytes
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._upload_executor, self._copy_to_disk, file.file, file_path, max_size
+        )
+
+    def _copy_to_disk(
+        self, source: BinaryIO, file_path: Path, max_size: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """
+        Copy source to file_path in UPLOAD_COPY_CHUNK_SIZE pieces, hashing as it goes
+
+        The size is counted while copying, so an oversized upload is cut off at the
+        first chunk past max_size. If the copy fails for any reason (too large, disk
+        full, read error, cancellation) the partial file is removed.
+
+        Returns:
+            (bytes written, 32-char blake2b hex digest of the content)
+        """
+        file_size = 0
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            with open(file_path, "wb") as buffer:
+                for chunk in self._iter_chunks(source):
+                    if max_size is not None and file_size + len(chunk) > max_size:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File size exceeds maximum limit of {settings.MAX_FILE_SIZE_MB}MB"
+                        )
+                    digest.update(chunk)
+                    buffer.write(chunk)
+                    file_size += len(chunk)
+        except BaseException:
+            try:
+                os.unlink(file_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return file_size, digest.hexdigest()
+
+    @staticmethod
+    def _iter_chunks(source: BinaryIO) -> Iterator[memoryview]:
+        """
+        Yield successive UPLOAD_COPY_CHUNK_SIZE pieces of source.
+
+        Reads into one reused buffer instead of allocating a bytes object per chunk;
+        each yielded view is only valid until the next one is produced.
+        """
+        readinto = getattr(source, "readinto", None)
+        if readinto is None:  # SpooledTemporaryFile before Python 3.11
+            while chunk := source.read(UPLOAD_COPY_CHUNK_SIZE):
+                yield memoryview(chunk)
+            return
+        view = memoryview(bytearray(UPLOAD_COPY_CHUNK_SIZE))
+        while size := readinto(view):
+            yield view[:size]
+
+    @staticmethod
+    def release_page_cache(file_path: str) -> bool:
+        """
+        Ask the kernel to drop cached pages of a large upload after processing
+
+        Stored uploads are read once by the indexing pipeline and then rarely again,
+        so keeping them in the page cache only evicts hotter data.
+
+        Returns:
+            True if the advice was given
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return False
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            if os.fstat(fd).st_size < PAGE_CACHE_RELEASE_MIN_BYTES:
+                return False
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            return True
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+
     def delete_file(self, file_path: str) -> bool:
         """
         Delete file
@@ -97,12 +255,12 @@ class UploadHandler:
             True if deleted successfully
         """
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                return True
+            os.unlink(file_path)
+            return True
+        except FileNotFoundError:
             return False
-        except Exception as e:
-            print(f"Error deleting file: {e}")
+        except OSError as e:
+            logger.error(f"Error deleting file {file_path}: {e}")
             return False
     
     def extract_content_on_demand(self, file_path: str, content_type: str) -> dict:
@@ -119,15 +277,21 @@ class UploadHandler:
             Dictionary with extracted text and metadata
         """
         try:
-            from core.rag_pipeline import rag_pipeline
-            
             # Extract based on content type
             if content_type in ['youtube', 'article']:
                 # For URLs, we'd need the URL not file path
                 return {"success": False, "error": "URL content requires URL not file path"}
             else:
+                stat = os.stat(file_path)
+                cache_key = (file_path, stat.st_size, stat.st_mtime_ns)
+                cached = self._extraction_cache.get(cache_key)
+                if cached is not None:
+                    return dict(cached)
+
                 # Extract from file
                 result = rag_pipeline.process_document(file_path)
+                if result.get("success"):
+                    self._extraction_cache.set(cache_key, dict(result))
                 return result
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -1,11 +1,15 @@
 """
 Document validation utilities
 """
-from pathlib import Path
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from fastapi import UploadFile, HTTPException, status
 from config.settings import settings
 
+# Room for multipart boundaries and part headers when a request's Content-Length
+# stands in for the size of its single file part
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
 class DocumentValidator:
     """Validate document uploads"""
 
@@ -36,17 +40,7 @@ class DocumentValidator:
         Uses app config when present, but always stays inside the
         formats the pipeline can actually classify.
         """
-        configured = {
-            ext.strip().lower().lstrip(".")
-            for ext in settings.allowed_extensions_list
-            if ext.strip()
-        }
-        supported = list(cls.SUPPORTED_EXTENSION_TYPES.keys())
-        if not configured:
-            return supported
-
-        enabled = [ext for ext in supported if ext in configured]
-        return enabled or supported
+        return list(_enabled_extensions())
 
     @classmethod
     def get_upload_constraints(cls) -> Dict[str, object]:
@@ -59,12 +53,17 @@ class DocumentValidator:
         }
     
     @staticmethod
-    def validate_file_size(file: UploadFile) -> bool:
+    def validate_file_size(file: UploadFile, content_length: Optional[int] = None) -> bool:
         """
-        Validate file size
+        Reject a file whose declared size is over the limit
+        
+        Uses the request's Content-Length, else the size the multipart parser already
+        recorded; seeking the spooled file to measure it would force it to disk. The
+        authoritative limit is enforced while the upload is copied (UploadHandler.save_file).
         
         Args:
             file: Uploaded file
+            content_length: Content-Length of a request carrying only this file, if sent
             
         Returns:
             True if valid
@@ -72,14 +71,13 @@ class DocumentValidator:
         Raises:
             HTTPException if invalid
         """
-        # Get file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
-        
         max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024  # Convert to bytes
+        if content_length is not None:
+            file_size = content_length - MULTIPART_OVERHEAD_BYTES
+        else:
+            file_size = getattr(file, "size", None)
         
-        if file_size > max_size:
+        if file_size is not None and file_size > max_size:
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                 detail=f"File size exceeds maximum limit of {settings.MAX_FILE_SIZE_MB}MB"
@@ -88,12 +86,25 @@ class DocumentValidator:
         return True
     
     @staticmethod
-    def validate_file_extension(filename: str) -> bool:
+    def split_extension(filename: str) -> Tuple[str, str]:
+        """
+        Split filename into (stem, lowercased extension without the dot)
+        
+        Parsed once per upload and passed along, instead of each step building
+        its own Path. Like Path.suffix, a leading dot (".env") is not an extension.
+        """
+        stem, dot, ext = filename.rpartition(".")
+        if not dot or not stem:
+            return filename, ""
+        return stem, ext.lower()
+    
+    @staticmethod
+    def validate_file_extension(ext: str) -> bool:
         """
         Validate file extension
         
         Args:
-            filename: Name of file
+            ext: Lowercased extension without the dot (see split_extension)
             
         Returns:
             True if valid
@@ -101,44 +112,61 @@ class DocumentValidator:
         Raises:
             HTTPException if invalid
         """
-        ext = Path(filename).suffix.lower().lstrip('.')
-
-        allowed_extensions = DocumentValidator.get_enabled_extensions()
-
-        if ext not in allowed_extensions:
+        if ext not in _enabled_extension_set():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported file format. Allowed formats: {', '.join(allowed_extensions)}"
+                detail=f"Unsupported file format. Allowed formats: {', '.join(_enabled_extensions())}"
             )
         
         return True
     
     @staticmethod
-    def validate_upload(file: UploadFile) -> bool:
+    def validate_upload(file: UploadFile, content_length: Optional[int] = None) -> str:
         """
         Validate file upload
         
         Args:
             file: Uploaded file
+            content_length: Request Content-Length, see validate_file_size
             
         Returns:
-            True if valid
+            The file's lowercased extension, for get_content_type and save_file
         """
-        DocumentValidator.validate_file_extension(file.filename)
-        DocumentValidator.validate_file_size(file)
-        return True
+        _, ext = DocumentValidator.split_extension(file.filename or "")
+        DocumentValidator.validate_file_extension(ext)
+        DocumentValidator.validate_file_size(file, content_length)
+        return ext
     
     @staticmethod
-    def get_content_type(filename: str) -> str:
+    def get_content_type(ext: str) -> str:
         """
-        Determine content type from filename
+        Determine content type from a file extension
         
         Args:
-            filename: Name of file
+            ext: Lowercased extension without the dot (see split_extension)
             
         Returns:
             Content type string
         """
-        ext = Path(filename).suffix.lower()
+        return DocumentValidator.SUPPORTED_EXTENSION_TYPES.get(ext, 'text')
+
+
+# Settings are fixed for the process lifetime, so the enabled extensions are computed once
+@lru_cache(maxsize=1)
+def _enabled_extensions() -> Tuple[str, ...]:
+    configured = {
+        ext.strip().lower().lstrip(".")
+        for ext in settings.allowed_extensions_list
+        if ext.strip()
+    }
+    supported = tuple(DocumentValidator.SUPPORTED_EXTENSION_TYPES)
+    if not configured:
+        return supported
+
+    enabled = tuple(ext for ext in supported if ext in configured)
+    return enabled or supported
+
 
-        return DocumentValidator.SUPPORTED_EXTENSION_TYPES.get(ext.lstrip("."), 'text')
+@lru_cache(maxsize=1)
+def _enabled_extension_set() -> FrozenSet[str]:
+    return frozenset(_enabled_extensions())
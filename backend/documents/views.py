@@ -1,21 +1,28 @@
 """
 Document API endpoints
 """
+import asyncio
+import base64
+import os
+import traceback
+import uuid
 from datetime import datetime, timezone
 from mimetypes import guess_type
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status, UploadFile, File, BackgroundTasks
+from fastapi.responses import JSONResponse, FileResponse, ORJSONResponse
+from sqlalchemy import func, tuple_, update
 from sqlalchemy.orm import Session
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import validators
-from config.database import get_db
+from config.database import SessionLocal, get_db
 from documents.models import Document, ContentType, ProcessingStatus
 from documents.schemas import (
     URLUpload, DocumentResponse, DocumentListResponse
 )
 from documents.validators import DocumentValidator
 from documents.upload_handler import upload_handler
+from documents.extraction_pool import run_extraction
 from documents.table_of_contents import (
     build_table_of_contents_from_path,
     count_table_of_contents_items,
@@ -24,9 +31,10 @@ from documents.table_of_contents import (
 from users.auth import get_current_user
 from users.models import User
 from core.rag_pipeline import rag_pipeline
-from documents.topic_extractor import topic_extractor
+from documents.topic_extractor import topic_extractor, load_user_topic_data
+from utils.logger import logger
 
-router = APIRouter(prefix="/api/documents", tags=["documents"])
+router = APIRouter(prefix="/api/documents", tags=["documents"], default_response_class=ORJSONResponse)
 
 
 def _merge_doc_metadata(existing: Optional[Dict[str, Any]], **updates: Any) -> Dict[str, Any]:
@@ -42,8 +50,8 @@ def _cleanup_document_quizzes(db: Session, document_id: str, user_id: str) -> Di
     """Delete or detach quizzes that reference a document being removed."""
     from quizzes.models import Quiz, QuizAttempt, QuizQuestion
 
-    deleted_quizzes = 0
     updated_quizzes = 0
+    orphaned_quiz_ids = []
 
     quizzes = db.query(Quiz).filter(
         Quiz.user_id == user_id,
@@ -61,13 +69,16 @@ def _cleanup_document_quizzes(db: Session, document_id: str, user_id: str) -> Di
             updated_quizzes += 1
             continue
 
-        db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz.id).delete()
-        db.query(QuizAttempt).filter(QuizAttempt.quiz_id == quiz.id).delete()
-        db.delete(quiz)
-        deleted_quizzes += 1
+        orphaned_quiz_ids.append(quiz.id)
+
+    # One set-based DELETE per table instead of three statements per quiz
+    if orphaned_quiz_ids:
+        db.query(QuizQuestion).filter(QuizQuestion.quiz_id.in_(orphaned_quiz_ids)).delete()
+        db.query(QuizAttempt).filter(QuizAttempt.quiz_id.in_(orphaned_quiz_ids)).delete()
+        db.query(Quiz).filter(Quiz.id.in_(orphaned_quiz_ids)).delete()
 
     return {
-        "deleted_quizzes": deleted_quizzes,
+        "deleted_quizzes": len(orphaned_quiz_ids),
         "updated_quizzes": updated_quizzes,
     }
 
@@ -109,6 +120,16 @@ def _normalize_document_toc_metadata(document: Document) -> bool:
     )
     return True
 
+def _update_document(db: Session, document_id: str, **values: Any) -> None:
+    """Write values to one document row with a single UPDATE, bypassing ORM change tracking."""
+    db.execute(
+        update(Document)
+        .where(Document.id == document_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
 def process_document_background(document_id: str):
     """
     Background task to process document - Enhanced with topic extraction
@@ -119,8 +140,6 @@ def process_document_background(document_id: str):
         document_id: Document ID
     """
     # Create a new database session for background task
-    from config.database import SessionLocal
-    from utils.logger import logger
 
     db = SessionLocal()
     try:
@@ -168,22 +187,26 @@ def process_document_background(document_id: str):
         )
         db.commit()
         
-        # Extract content for topic analysis and create embeddings
+        # Extract content, create embeddings and tag topics in the extraction process pool;
+        # only plain values cross the process boundary, never the Session or ORM objects
         extracted_text = ""
         logger.info(f"[Background] Calling RAG pipeline for {document_id}, file: {doc.file_path}")
 
-        # Pass document_id to store embeddings in vector store
-        result = rag_pipeline.process_document(
-            file_path=doc.file_path,
-            document_id=document_id,
-            store_embeddings=True
-        )
+        result = run_extraction({
+            "document_id": document_id,
+            "file_path": doc.file_path,
+            "original_filename": doc.original_filename,
+        })
+        if result.get("embeddings_stored"):
+            # The worker updated its own vector store caches; refresh this process's copy
+            rag_pipeline.vector_store.record_document_indexed(document_id)
 
         logger.info(
             f"[Background] RAG pipeline result for {document_id}: "
             f"success={result.get('success')}, embeddings_stored={result.get('embeddings_stored')}, "
             f"chunk_count={result.get('chunk_count')}"
         )
+        upload_handler.release_page_cache(doc.file_path)
 
         db.expire_all()
         doc = db.query(Document).filter(Document.id == document_id).first()
@@ -229,15 +252,10 @@ def process_document_background(document_id: str):
             logger.warning(f"Document {document_id} contains no extractable text")
             return
 
-        topic_error_message = None
-        try:
-            logger.info(f"Extracting topics for document {document_id}")
-            topic_data = topic_extractor.extract_topics_and_domains(
-                extracted_text,
-                doc.original_filename
-            )
-        except Exception as topic_error:
-            topic_error_message = str(topic_error)
+        topic_error_message = result.get("topic_error")
+        topic_data = result.get("topic_data")
+        if topic_data is None:
+            topic_error_message = topic_error_message or "Topic extraction returned no result"
             logger.warning(f"Topic extraction failed for {document_id}: {topic_error_message}")
             topic_data = {
                 "topics": [],
@@ -253,18 +271,18 @@ def process_document_background(document_id: str):
                 "extraction_method": "failed",
             }
 
-        # Persist the "ready for generation" state before slower enrichment work starts.
-        doc.vector_db_reference_id = document_id if result.get("embeddings_stored") else None
-        doc.extracted_text = extracted_text
-        doc.topics = topic_data.get('topics', [])
-        doc.domains = topic_data.get('domains', [])
-        doc.keywords = topic_data.get('keywords', [])
-        doc.subject_area = topic_data.get('subject_area', 'General')
-        doc.difficulty_level = topic_data.get('difficulty_level', 'intermediate')
-        doc.processing_status = ProcessingStatus.COMPLETED
-        toc = _build_and_store_document_toc(db, doc)
-        doc.doc_metadata = _merge_doc_metadata(
-            doc.doc_metadata,
+        # Persist the "ready for generation" state before slower enrichment work starts,
+        # as one UPDATE of the new values instead of flushing tracked ORM attribute changes.
+        user_id = str(doc.user_id)
+        metadata = doc.doc_metadata or {}
+        toc = build_table_of_contents_from_path(
+            markdown_path=metadata.get("docling_markdown_path"),
+            document_id=document_id,
+            db=db,
+        )
+        topics = topic_data.get('topics', [])
+        doc_metadata = _merge_doc_metadata(
+            metadata,
             indexed=bool(result.get("embeddings_stored")),
             embeddings_stored=bool(result.get("embeddings_stored")),
             chunk_count=result.get("chunk_count", 0),
@@ -289,9 +307,22 @@ def process_document_background(document_id: str):
             topic_extraction_failed=bool(topic_error_message),
             topic_extraction_error=topic_error_message,
         )
+        _update_document(
+            db,
+            document_id,
+            vector_db_reference_id=document_id if result.get("embeddings_stored") else None,
+            extracted_text=extracted_text,
+            topics=topics,
+            domains=topic_data.get('domains', []),
+            keywords=topic_data.get('keywords', []),
+            subject_area=topic_data.get('subject_area', 'General'),
+            difficulty_level=topic_data.get('difficulty_level', 'intermediate'),
+            processing_status=ProcessingStatus.COMPLETED,
+            doc_metadata=doc_metadata,
+        )
         db.commit()
         logger.info(
-            f"Document {document_id} is ready for generation with topics: {doc.topics[:3]}"
+            f"Document {document_id} is ready for generation with topics: {topics[:3]}"
         )
 
         if topic_error_message:
@@ -303,46 +334,49 @@ def process_document_background(document_id: str):
             from knowledge_timeline.snapshot_service import snapshot_service
 
             concept_ids = concept_matcher.process_document_concepts(
-                db, document_id, str(doc.user_id), topic_data
+                db, document_id, user_id, topic_data
             )
 
             if concept_ids:
                 snapshot_service.record_document_upload_snapshots(
-                    db, str(doc.user_id), document_id
+                    db, user_id, document_id
                 )
-                doc.doc_metadata = _merge_doc_metadata(
-                    doc.doc_metadata,
+                doc_metadata = _merge_doc_metadata(
+                    doc_metadata,
                     enrichment_status="completed",
                     processing_stage="completed",
                     concept_link_count=len(concept_ids),
                     enriched_at=datetime.now(timezone.utc).isoformat(),
                 )
+                _update_document(db, document_id, doc_metadata=doc_metadata)
                 db.commit()
                 logger.info(
                     f"Knowledge evolution: linked {len(concept_ids)} concepts for document {document_id}"
                 )
             else:
-                doc.doc_metadata = _merge_doc_metadata(
-                    doc.doc_metadata,
+                doc_metadata = _merge_doc_metadata(
+                    doc_metadata,
                     enrichment_status="skipped",
                     processing_stage="completed",
                     concept_link_count=0,
                     enriched_at=datetime.now(timezone.utc).isoformat(),
                 )
+                _update_document(db, document_id, doc_metadata=doc_metadata)
                 db.commit()
         except Exception as evo_err:
             logger.warning(f"Knowledge evolution processing failed (non-critical): {evo_err}")
-            doc.doc_metadata = _merge_doc_metadata(
-                doc.doc_metadata,
+            db.rollback()
+            doc_metadata = _merge_doc_metadata(
+                doc_metadata,
                 enrichment_status="failed",
                 processing_stage="completed",
                 enrichment_error=str(evo_err),
             )
+            _update_document(db, document_id, doc_metadata=doc_metadata)
             db.commit()
         
     except Exception as e:
         logger.error(f"Error processing document {document_id}: {e}")
-        import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         try:
             doc = db.query(Document).filter(Document.id == document_id).first()
@@ -363,10 +397,11 @@ def process_document_background(document_id: str):
         db.close()
         logger.info(f"[Background] Closed database session for {document_id}")
 
-@router.post("/upload/file", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/upload/file", response_model=DocumentResponse, response_model_exclude_none=True, status_code=status.HTTP_201_CREATED)
 async def upload_file(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    content_length: Optional[int] = Header(default=None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -376,6 +411,7 @@ async def upload_file(
     Args:
         background_tasks: Background tasks
         file: Uploaded file
+        content_length: Request Content-Length, for an O(1) size check
         current_user: Current authenticated user
         db: Database session
         
@@ -383,19 +419,29 @@ async def upload_file(
         Document data
     """
     try:
-        from utils.logger import logger
         logger.info(f"File upload started: {file.filename} by user {current_user.email}")
         
         # Validate file
-        DocumentValidator.validate_upload(file)
+        ext = DocumentValidator.validate_upload(file, content_length)
         logger.info(f"File validation passed: {file.filename}")
         
         # Save file
-        file_info = upload_handler.save_file(file, current_user.id)
+        file_info = await upload_handler.save_file(file, current_user.id, ext)
         logger.info(f"File saved successfully: {file_info['file_path']}")
         
+        # Identical re-upload: reuse the existing document and skip extraction/LLM work
+        existing_document = db.query(Document).filter(
+            Document.user_id == current_user.id,
+            Document.file_hash == file_info["file_hash"],
+            Document.processing_status != ProcessingStatus.FAILED
+        ).first()
+        if existing_document:
+            upload_handler.delete_file(file_info["file_path"])
+            logger.info(f"Duplicate upload of {file.filename}; reusing document {existing_document.id}")
+            return DocumentResponse.model_validate(existing_document)
+        
         # Determine content type
-        content_type = DocumentValidator.get_content_type(file.filename)
+        content_type = DocumentValidator.get_content_type(ext)
         
         # Create document record
         new_document = Document(
@@ -405,6 +451,7 @@ async def upload_file(
             original_filename=file.filename,
             file_path=file_info["file_path"],
             file_size=file_info["file_size"],
+            file_hash=file_info["file_hash"],
             processing_status=ProcessingStatus.PENDING
         )
         
@@ -417,15 +464,13 @@ async def upload_file(
         # Process in background (creates its own db session)
         background_tasks.add_task(process_document_background, str(new_document.id))
 
-        return DocumentResponse.from_orm(new_document)
+        return DocumentResponse.model_validate(new_document)
 
     except HTTPException:
         raise
     except Exception as e:
-        from utils.logger import logger
         logger.error(f"File upload failed: {str(e)}")
         logger.error(f"Error type: {type(e).__name__}")
-        import traceback
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -440,7 +485,7 @@ def get_upload_config(
     """Return the effective upload constraints for the current environment."""
     return DocumentValidator.get_upload_constraints()
 
-@router.post("/upload/youtube", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/upload/youtube", response_model=DocumentResponse, response_model_exclude_none=True, status_code=status.HTTP_201_CREATED)
 async def upload_youtube(
     background_tasks: BackgroundTasks,
     url_data: URLUpload,
@@ -484,9 +529,9 @@ async def upload_youtube(
     # Process in background (creates its own db session)
     background_tasks.add_task(process_document_background, str(new_document.id))
 
-    return DocumentResponse.from_orm(new_document)
+    return DocumentResponse.model_validate(new_document)
 
-@router.post("/upload/web", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/upload/web", response_model=DocumentResponse, response_model_exclude_none=True, status_code=status.HTTP_201_CREATED)
 async def upload_web_article(
     background_tasks: BackgroundTasks,
     url_data: URLUpload,
@@ -530,47 +575,90 @@ async def upload_web_article(
     # Process in background (creates its own db session)
     background_tasks.add_task(process_document_background, str(new_document.id))
 
-    return DocumentResponse.from_orm(new_document)
+    return DocumentResponse.model_validate(new_document)
+
+def _encode_document_cursor(doc: Document) -> str:
+    """Opaque keyset cursor pointing just past doc in (upload_date, id) descending order."""
+    raw = f"{doc.upload_date.isoformat()}|{doc.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
 
-@router.get("/", response_model=DocumentListResponse)
+def _decode_document_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of _encode_document_cursor; raises 400 for a malformed cursor."""
+    try:
+        upload_date, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(upload_date), uuid.UUID(document_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+@router.get("/", response_model=DocumentListResponse, response_model_exclude_none=True)
 def get_documents(
-    page: int = 1,
-    page_size: int = 10,
+    cursor: Optional[str] = None,
+    page_size: int = Query(default=10, ge=1, le=100),
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get user's documents
+    Get user's documents, newest first
+    
+    Uses keyset pagination on (upload_date, id), so deep pages cost the same as the
+    first one instead of scanning past an OFFSET.
     
     Args:
-        page: Page number
+        cursor: next_cursor from the previous page; omit for the first page
         page_size: Items per page
+        include_total: Also return the user's total document count
         current_user: Current authenticated user
         db: Database session
         
     Returns:
-        List of documents
+        List of documents and the cursor of the next page
     """
-    # Query documents
     query = db.query(Document).filter(Document.user_id == current_user.id)
-    total = query.count()
-    
-    documents = query.offset((page - 1) * page_size).limit(page_size).all()
+    total = None
+    if include_total:
+        if cursor:
+            total = query.with_entities(func.count(Document.id)).scalar()
+        else:
+            # First page: the window count over the unfiltered set is the total, in one statement
+            query = query.add_columns(func.count().over())
+
+    if cursor:
+        query = query.filter(
+            tuple_(Document.upload_date, Document.id) < _decode_document_cursor(cursor)
+        )
+
+    # One extra row tells whether another page exists without a COUNT
+    rows = query.order_by(Document.upload_date.desc(), Document.id.desc()).limit(page_size + 1).all()
+    if include_total and not cursor:
+        total = rows[0][1] if rows else 0
+        rows = [doc for doc, _ in rows]
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_document_cursor(rows[-1])
+
     metadata_changed = False
-    for doc in documents:
+    for doc in rows:
         metadata_changed = _normalize_document_toc_metadata(doc) or metadata_changed
 
     if metadata_changed:
         db.commit()
     
     return DocumentListResponse(
-        documents=[DocumentResponse.from_orm(doc) for doc in documents],
-        total=total,
-        page=page,
-        page_size=page_size
+        documents=[DocumentResponse.model_validate(doc) for doc in rows],
+        page_size=page_size,
+        next_cursor=next_cursor,
+        total=total
     )
 
-@router.get("/{document_id}", response_model=DocumentResponse)
+@router.get("/{document_id}", response_model=DocumentResponse, response_model_exclude_none=True)
 def get_document(
     document_id: str,
     current_user: User = Depends(get_current_user),
@@ -601,7 +689,7 @@ def get_document(
     if _normalize_document_toc_metadata(doc):
         db.commit()
 
-    return DocumentResponse.from_orm(doc)
+    return DocumentResponse.model_validate(doc)
 
 
 @router.get("/{document_id}/table-of-contents")
@@ -745,7 +833,6 @@ def get_document_content(
     Returns:
         Extracted content
     """
-    from utils.logger import logger
     
     doc = db.query(Document).filter(
         Document.id == document_id,
@@ -822,15 +909,11 @@ def get_user_interest_profile(
     Returns:
         Aggregated interest profile
     """
-    from utils.logger import logger
     
     # Get all user documents with topic data
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id,
-        Document.processing_status == ProcessingStatus.COMPLETED
-    ).all()
+    documents_data = load_user_topic_data(db, current_user.id)
     
-    if not documents:
+    if not documents_data:
         return {
             "primary_domains": [],
             "all_domains": [],
@@ -845,19 +928,6 @@ def get_user_interest_profile(
             "message": "No documents uploaded yet"
         }
     
-    # Extract topic data from documents
-    documents_data = []
-    for doc in documents:
-        doc_data = {
-            'topics': doc.topics or [],
-            'domains': doc.domains or [],
-            'keywords': doc.keywords or [],
-            'technical_skills': doc.doc_metadata.get('technical_skills', []) if doc.doc_metadata else [],
-            'technologies': doc.doc_metadata.get('technologies', []) if doc.doc_metadata else [],
-            'programming_languages': doc.doc_metadata.get('programming_languages', []) if doc.doc_metadata else []
-        }
-        documents_data.append(doc_data)
-    
     # Aggregate interests
     logger.info(f"Aggregating interests from {len(documents_data)} documents for user {current_user.email}")
     interest_profile = topic_extractor.aggregate_user_interests(documents_data)
@@ -885,7 +955,6 @@ async def generate_document_mindmap(
         Mermaid diagram code
     """
     from documents.mindmap import mindmap_generator
-    from utils.logger import logger
 
     # Get document
     doc = db.query(Document).filter(
@@ -967,7 +1036,6 @@ def get_document_file(
     Get the actual file for a document
     Returns the file as a stream for the PDF viewer
     """
-    import os
     doc = db.query(Document).filter(Document.id == document_id).first()
     
     if not doc or not doc.file_path:
@@ -1048,9 +1116,8 @@ def get_document_thumbnail(
 ):
     """
     Get the thumbnail image for a document.
-    Returns the thumbnail PNG as a file response.
+    Returns the thumbnail image (JPEG, or PNG for older documents) as a file response.
     """
-    import os
 
     doc = db.query(Document).filter(Document.id == document_id).first()
 
@@ -1065,10 +1132,11 @@ def get_document_thumbnail(
 
     # Fallback: check if thumbnail file exists by convention
     if not thumbnail_path:
-        from pathlib import Path
-        fallback_path = Path(upload_handler.upload_folder) / "thumbnails" / f"{document_id}.png"
-        if fallback_path.exists():
-            thumbnail_path = str(fallback_path)
+        for extension in (".jpg", ".png"):
+            fallback_path = Path(upload_handler.thumbnails_folder) / f"{document_id}{extension}"
+            if fallback_path.exists():
+                thumbnail_path = str(fallback_path)
+                break
 
     if not thumbnail_path or not os.path.exists(thumbnail_path):
         raise HTTPException(
@@ -1076,12 +1144,74 @@ def get_document_thumbnail(
             detail="Thumbnail not available"
         )
 
+    is_png = thumbnail_path.lower().endswith(".png")
     return FileResponse(
         path=thumbnail_path,
-        media_type="image/png",
-        filename=f"{document_id}_thumbnail.png"
+        media_type="image/png" if is_png else "image/jpeg",
+        filename=f"{document_id}_thumbnail.{'png' if is_png else 'jpg'}"
     )
 
+def _load_diagram_content(doc: Document) -> Optional[str]:
+    """
+    Resolve the text used for diagram generation (same approach as mindmap).
+
+    Tries stored extracted_text, then on-demand extraction by content type,
+    then the document's vector store chunks. Blocking; run it in a worker thread.
+    """
+
+    content = None
+
+    # First try to get from extracted_text if already processed
+    if doc.extracted_text:
+        content = doc.extracted_text
+        logger.info(f"Using stored extracted_text for diagram generation")
+    # Otherwise extract on-demand based on content type
+    elif doc.content_type == ContentType.YOUTUBE:
+        result = rag_pipeline.process_youtube(doc.file_url, store_embeddings=False)
+        if result.get("success"):
+            content = result.get("text")
+    elif doc.content_type == ContentType.ARTICLE:
+        result = rag_pipeline.process_webpage(doc.file_url, store_embeddings=False)
+        if result.get("success"):
+            content = result.get("text")
+    elif doc.file_path:
+        result = upload_handler.extract_content_on_demand(
+            doc.file_path,
+            doc.content_type.value
+        )
+        if result.get("success"):
+            content = result.get("text")
+
+    # Try vector store as last fallback
+    if not content:
+        try:
+            from core.vector_store import get_vector_store
+            chunks_result = get_vector_store().get_document_chunks(str(doc.id))
+            chunk_list = chunks_result.get("chunks", []) if chunks_result.get("success") else []
+            if chunk_list:
+                content = "\n\n".join([c.get("text", "") for c in chunk_list])
+                logger.info(f"Retrieved {len(chunk_list)} chunks for diagram generation")
+        except Exception as e:
+            logger.warning(f"Could not retrieve chunks: {e}")
+
+    return content
+
+
+def _get_user_document(db: Session, document_id: str, user: User) -> Document:
+    """Fetch a document owned by user or raise 404"""
+    doc = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == user.id
+    ).first()
+
+    if not doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    return doc
+
+
 @router.get("/{document_id}/diagram")
 async def generate_document_diagram(
     document_id: str,
@@ -1099,67 +1229,21 @@ async def generate_document_diagram(
     Returns:
         Mermaid diagram code
     """
-    from documents.diagram_generator import diagram_generator
-    from utils.logger import logger
+    from documents.diagram_generator import diagram_generator, DIAGRAM_TYPES
 
     # Validate diagram type
-    valid_types = ["flowchart", "sequence", "er", "state", "class"]
-    if diagram_type not in valid_types:
+    if diagram_type not in DIAGRAM_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid diagram type. Must be one of: {', '.join(valid_types)}"
+            detail=f"Invalid diagram type. Must be one of: {', '.join(DIAGRAM_TYPES)}"
         )
 
-    # Get document
-    doc = db.query(Document).filter(
-        Document.id == document_id,
-        Document.user_id == current_user.id
-    ).first()
-
-    if not doc:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    doc = _get_user_document(db, document_id, current_user)
 
     logger.info(f"Generating {diagram_type} diagram for document {document_id} by user {current_user.email}")
 
-    # Extract content on-demand (same approach as mindmap)
     try:
-        content = None
-
-        # First try to get from extracted_text if already processed
-        if doc.extracted_text:
-            content = doc.extracted_text
-            logger.info(f"Using stored extracted_text for diagram generation")
-        # Otherwise extract on-demand based on content type
-        elif doc.content_type == ContentType.YOUTUBE:
-            result = rag_pipeline.process_youtube(doc.file_url, store_embeddings=False)
-            if result.get("success"):
-                content = result.get("text")
-        elif doc.content_type == ContentType.ARTICLE:
-            result = rag_pipeline.process_webpage(doc.file_url, store_embeddings=False)
-            if result.get("success"):
-                content = result.get("text")
-        elif doc.file_path:
-            result = upload_handler.extract_content_on_demand(
-                doc.file_path,
-                doc.content_type.value
-            )
-            if result.get("success"):
-                content = result.get("text")
-
-        # Try vector store as last fallback
-        if not content:
-            try:
-                from core.vector_store import vector_store
-                chunks_result = vector_store.get_document_chunks(str(doc.id))
-                chunk_list = chunks_result.get("chunks", []) if chunks_result.get("success") else []
-                if chunk_list:
-                    content = "\n\n".join([c.get("text", "") for c in chunk_list])
-                    logger.info(f"Retrieved {len(chunk_list)} chunks for diagram generation")
-            except Exception as e:
-                logger.warning(f"Could not retrieve chunks: {e}")
+        content = await asyncio.to_thread(_load_diagram_content, doc)
 
         if not content:
             raise HTTPException(
@@ -1168,7 +1252,8 @@ async def generate_document_diagram(
             )
 
         # Generate diagram
-        result = diagram_generator.generate_diagram(
+        result = await asyncio.to_thread(
+            diagram_generator.generate_diagram,
             content=content,
             title=doc.title,
             diagram_type=diagram_type
@@ -1190,3 +1275,60 @@ async def generate_document_diagram(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Diagram generation failed: {str(e)}"
         )
+
+
+@router.post("/{document_id}/diagrams/all")
+async def generate_all_document_diagrams(
+    document_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate every Mermaid diagram type for a document in one request.
+
+    The per-type Gemini calls run concurrently, so this takes roughly as long
+    as the slowest single diagram.
+
+    Args:
+        document_id: Document ID
+
+    Returns:
+        Mermaid diagram code keyed by diagram type
+    """
+    from documents.diagram_generator import diagram_generator
+
+    doc = _get_user_document(db, document_id, current_user)
+
+    logger.info(f"Generating all diagrams for document {document_id} by user {current_user.email}")
+
+    try:
+        content = await asyncio.to_thread(_load_diagram_content, doc)
+
+        if not content:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Could not extract content from document"
+            )
+
+        results = await diagram_generator.generate_all(content=content, title=doc.title)
+
+        return {
+            "document_id": str(doc.id),
+            "title": doc.title,
+            "diagrams": {
+                diagram_type: {
+                    "mermaid_code": result["mermaid_code"],
+                    "success": result.get("success", True)
+                }
+                for diagram_type, result in results.items()
+            }
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Diagram generation error for {document_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Diagram generation failed: {str(e)}"
+        )
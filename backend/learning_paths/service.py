@@ -168,6 +168,7 @@ class LearningPathService:
             provider="groq",
             model=settings.GROQ_SETUP_MODEL,
         )
+        self._groq_client: Any = None
 
     def _available_chat_models(self) -> List[str]:
         ordered_models = [
@@ -199,7 +200,10 @@ class LearningPathService:
             raise RuntimeError("groq package is not installed")
         if not settings.GROQ_API_KEY:
             raise RuntimeError("GROQ_API_KEY is not configured")
-        return Groq(api_key=settings.GROQ_API_KEY)
+        # One client per service so its HTTP connection pool (and TLS sessions) is reused
+        if self._groq_client is None:
+            self._groq_client = Groq(api_key=settings.GROQ_API_KEY)
+        return self._groq_client
 
     def _load_owned_documents(
         self,
@@ -3,8 +3,9 @@ Main FastAPI application
 """
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from config.settings import settings
 from config.database import init_db
 from users.views import router as users_router
@@ -21,6 +22,8 @@ from knowledge_timeline.views import router as knowledge_timeline_router
 from utils.logger import logger
 import traceback
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
 # Define lifespan
@@ -30,6 +33,12 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 50)
     logger.info("Starting SLCA Backend Server")
     logger.info("=" * 50)
+
+    # asyncio.to_thread uses the loop's default executor, which otherwise caps at
+    # min(32, cpu_count + 4) workers - fewer than FastAPI's sync-route threadpool.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.BLOCKING_IO_THREADS, thread_name_prefix="blocking-io")
+    )
     
     # Initialize database
     try:
@@ -73,6 +82,8 @@ async def lifespan(app: FastAPI):
 
     # Cleanup on shutdown
     logger.info("Shutting down SLCA Backend Server...")
+    from documents.extraction_pool import shutdown_extraction_pool
+    shutdown_extraction_pool()
     logger.info("[OK] Cleanup completed")
 
 # Create FastAPI app
@@ -80,9 +91,50 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
     description="Student Learning & Career Assistant API",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Turn unhandled exceptions into JSON 500s. Added before CORSMiddleware so it runs inside
+# it, and error responses get the regular CORS headers.
+class ErrorHandlerMiddleware:
+    """Pure ASGI middleware returning a JSON 500 for exceptions raised by the app"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            # Too late for an error response once headers are out; let the server handle it
+            if response_started:
+                raise
+            logger.error(f"Unhandled exception: {str(exc)}")
+            logger.error(traceback.format_exc())
+            response = ORJSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content={
+                    "detail": "Internal server error occurred",
+                    "path": str(Request(scope).url)
+                }
+            )
+            await response(scope, receive, send)
+
+app.add_middleware(ErrorHandlerMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -92,50 +144,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global exception handler
-@app.exception_handler(Exception)
-async def global_exception_handler(request: Request, exc: Exception):
-    """Handle all uncaught exceptions"""
-    logger.error(f"Unhandled exception: {str(exc)}")
-    logger.error(traceback.format_exc())
-    
-    response = JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={
-            "detail": "Internal server error occurred",
-            "path": str(request.url)
-        }
-    )
-    
-    # Manually add CORS headers for exception responses
-    origin = request.headers.get("origin")
-    if origin in settings.cors_origins:
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-    return response
-
 # Validation error handler
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle validation errors"""
     logger.warning(f"Validation error: {exc.errors()}")
     
-    response = JSONResponse(
+    # Exception handlers run inside CORSMiddleware, so CORS headers are added as usual
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
             "detail": "Validation error",
             "errors": exc.errors()
         }
     )
-    
-    # Manually add CORS headers for exception responses
-    origin = request.headers.get("origin")
-    if origin in settings.cors_origins:
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-    return response
 
 # Include routers
 app.include_router(users_router)
@@ -166,9 +188,13 @@ def health_check():
 
 if __name__ == "__main__":
     import uvicorn
+    # uvicorn's default loop/http "auto" already run on uvloop and httptools (installed by
+    # uvicorn[standard]) wherever they exist; uvloop has no Windows build, so they aren't
+    # forced here. Reload mode is single-process.
     uvicorn.run(
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        workers=None if settings.DEBUG else settings.WEB_WORKERS
     )
@@ -0,0 +1,19 @@
+-- Migration: Indexes for per-user document listing and topic/domain filtering
+-- Mirrors Document.__table_args__ in documents/models.py
+
+-- CONCURRENTLY avoids locking writes on a live table; it cannot run inside a
+-- transaction block, so execute this file with autocommit (e.g. plain psql).
+
+-- Per-user listings, usually filtered by processing status. Also serves
+-- user_id-only lookups, so no separate user_id index is needed.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_user_status
+    ON documents (user_id, processing_status);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_subject_area
+    ON documents (subject_area);
+
+-- GIN indexes for JSONB containment queries, e.g. domains @> '["AI"]'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_domains_gin
+    ON documents USING gin (domains);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_topics_gin
+    ON documents USING gin (topics);
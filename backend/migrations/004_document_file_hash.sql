@@ -0,0 +1,9 @@
+-- Migration: Content hash on documents for duplicate upload detection
+-- Mirrors Document.file_hash / Document.__table_args__ in documents/models.py
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS file_hash VARCHAR(32);
+
+-- Lookup of an identical upload by the same user. Run outside a transaction
+-- block (autocommit) because of CONCURRENTLY.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_user_file_hash
+    ON documents (user_id, file_hash);
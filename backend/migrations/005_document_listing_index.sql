@@ -0,0 +1,8 @@
+-- Migration: Index for keyset-paginated document listings
+-- Mirrors Document.__table_args__ in documents/models.py
+
+-- GET /api/documents/ pages by (upload_date, id) descending within a user; a
+-- backward scan of this index serves both the ordering and the cursor filter.
+-- Run outside a transaction block (autocommit) because of CONCURRENTLY.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_user_upload_date
+    ON documents (user_id, upload_date, id);
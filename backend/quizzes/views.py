@@ -30,7 +30,7 @@ from quizzes.evidence import (
 from quizzes.evaluator import quiz_evaluator
 from core.generation_thresholds import MIN_GENERATION_CONTENT_CHARS
 from core.rag_retriever import rag_retriever
-from core.vector_store import vector_store
+from core.vector_store import get_vector_store
 from documents.table_of_contents import sanitize_heading
 from utils.logger import logger
 
@@ -278,7 +278,7 @@ def _retrieve_scoped_quiz_chunks(
         + ", ".join((focus_terms or section_titles or [document.title])[:8])
     )
 
-    scoped = vector_store.query(
+    scoped = get_vector_store().query(
         query_text=query_text,
         n_results=max(12, min(24, quiz_data.num_questions * 3)),
         document_id=str(document.id),
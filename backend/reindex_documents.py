@@ -7,14 +7,18 @@ backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
 from dotenv import load_dotenv
-from config.database import SessionLocal
-from documents.models import Document
-from users.models import User  # Required for foreign key validation
-from core.rag_pipeline import rag_pipeline
 from utils.logger import logger
 
 def reindex_all():
     """Reprocess all documents to regenerate embeddings with current model/dimensions"""
+    # Imported here, not at module level: spawned thumbnail workers re-import this
+    # script as their main module and must not load the RAG pipeline and its models
+    from config.database import SessionLocal
+    from documents.models import Document, ContentType
+    from documents.upload_handler import upload_handler
+    from users.models import User  # Required for foreign key validation
+    from core.rag_pipeline import rag_pipeline
+
     load_dotenv()
     
     db = SessionLocal()
@@ -69,6 +73,23 @@ def reindex_all():
                 logger.error(f"Error re-indexing document {doc.id}: {str(e)}")
                 fail_count += 1
         
+        # Regenerate missing PDF thumbnails across worker processes
+        pdf_documents = []
+        pdf_items = []
+        for doc in documents:
+            if doc.content_type != ContentType.PDF or not doc.file_path:
+                continue
+            file_path = doc.file_path if os.path.isabs(doc.file_path) else os.path.join(backend_dir, doc.file_path)
+            if os.path.exists(file_path):
+                pdf_documents.append(doc)
+                pdf_items.append((file_path, str(doc.id)))
+        if pdf_documents:
+            thumbnail_paths = upload_handler.generate_thumbnails_bulk(pdf_items)
+            for doc, thumbnail_path in zip(pdf_documents, thumbnail_paths):
+                if thumbnail_path:
+                    doc.thumbnail_path = thumbnail_path
+            logger.info(f"Thumbnails ready for {sum(1 for path in thumbnail_paths if path)}/{len(pdf_documents)} PDFs")
+        
         db.commit()
         logger.info("=" * 50)
         logger.info(f"Re-indexing complete: {success_count} success, {fail_count} failed")
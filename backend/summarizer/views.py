@@ -23,7 +23,7 @@ from users.models import User
 from summarizer.summarizer import summarizer
 from core.generation_thresholds import MIN_GENERATION_CONTENT_CHARS
 from core.rag_retriever import rag_retriever
-from core.vector_store import vector_store
+from core.vector_store import get_vector_store
 from utils.logger import logger
 
 router = APIRouter(prefix="/api/summaries", tags=["summaries"])
@@ -611,7 +611,7 @@ def _build_section_packet(
     query_text = f"Section overview main ideas definitions methods findings examples {title}".strip()
 
     if len(content) < MIN_SECTION_CONTENT_CHARS:
-        vector_result = vector_store.query(
+        vector_result = get_vector_store().query(
             query_text=query_text,
             n_results=5,
             document_id=str(document.id),
@@ -657,7 +657,7 @@ def _build_topic_packet(
     if not title:
         return None
 
-    vector_result = vector_store.query(
+    vector_result = get_vector_store().query(
         query_text=f"Summarize the topic {title}. Include the main ideas, definitions, methods, findings, and examples.",
         n_results=6,
         document_id=str(document.id),
@@ -0,0 +1,60 @@
+"""
+Tests for the RAG answer cache lookup rules
+"""
+import numpy as np
+
+from utils.cache import AnswerCache, normalize_question
+
+SCOPE = ("user-1", None, "structured_output", 5, None, ())
+
+
+def _unit_pair(cosine: float):
+    """Two L2-normalized vectors with the given cosine similarity"""
+    first = np.array([1.0, 0.0], dtype=np.float32)
+    second = np.array([cosine, np.sqrt(1.0 - cosine ** 2)], dtype=np.float32)
+    return first, second
+
+
+def test_normalize_question_ignores_case_whitespace_and_trailing_punctuation():
+    assert normalize_question("  What is   Backpropagation?? ") == "what is backpropagation"
+
+
+def test_repeated_question_hits():
+    cache = AnswerCache()
+    cache.set(SCOPE, "What is backpropagation?", {"answer": "A"})
+
+    assert cache.get(SCOPE, "what is backpropagation") == {"answer": "A"}
+
+
+def test_negated_question_misses_without_semantic_fallback():
+    cache = AnswerCache()
+    cache.set(SCOPE, "What is supervised learning?", {"answer": "A"})
+
+    assert cache.get(SCOPE, "What is not supervised learning?") is None
+
+
+def test_negated_question_misses_below_semantic_threshold():
+    # Negated pairs can embed above the old 0.95 threshold
+    cached, negated = _unit_pair(0.97)
+    cache = AnswerCache(semantic_threshold=0.98)
+    cache.set(SCOPE, "What are the advantages of microservices?", {"answer": "A"}, cached)
+
+    assert cache.get(SCOPE, "What are the disadvantages of microservices?", negated) is None
+
+
+def test_semantic_fallback_hits_near_duplicates():
+    cached, paraphrase = _unit_pair(0.99)
+    cache = AnswerCache(semantic_threshold=0.98)
+    cache.set(SCOPE, "Explain gradient descent", {"answer": "A"}, cached)
+
+    assert cache.get(SCOPE, "Explain the gradient descent method", paraphrase) == {"answer": "A"}
+
+
+def test_discard_where_drops_exact_and_semantic_entries():
+    embedding, _ = _unit_pair(1.0)
+    cache = AnswerCache(semantic_threshold=0.98)
+    cache.set(SCOPE, "Explain gradient descent", {"answer": "A"}, embedding)
+
+    cache.discard_where(lambda scope: scope[1] is None)
+
+    assert cache.get(SCOPE, "Explain gradient descent", embedding) is None
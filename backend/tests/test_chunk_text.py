@@ -0,0 +1,59 @@
+"""
+Tests for VectorStore.chunk_text windowing and sentence-boundary splitting
+"""
+from core.vector_store import VectorStore
+
+
+def _chunk(text: str, chunk_size: int, overlap: int):
+    # chunk_text doesn't touch the embedder or database, so skip __init__
+    store = VectorStore.__new__(VectorStore)
+    return store.chunk_text(text, chunk_size=chunk_size, overlap=overlap)
+
+
+def test_short_text_is_one_stripped_chunk():
+    assert _chunk("  hello world  ", 20, 5) == ["hello world"]
+
+
+def test_whitespace_only_text_yields_no_chunks():
+    assert _chunk("   \n  ", 20, 5) == []
+
+
+def test_no_boundary_falls_back_to_fixed_windows():
+    assert _chunk("a" * 50, 20, 5) == ["a" * 20] * 3
+
+
+def test_boundary_at_window_end_is_used():
+    text = "a" * 18 + ". " + "b" * 10
+
+    assert _chunk(text, 20, 5) == ["a" * 18 + ".", "aaa. " + "b" * 10]
+
+
+def test_boundary_past_window_end_is_ignored():
+    text = "a" * 19 + ". " + "b" * 10
+
+    assert _chunk(text, 20, 5) == ["a" * 19 + ".", "aaaa. " + "b" * 10]
+
+
+def test_boundary_before_window_midpoint_is_ignored():
+    text = "Hi. " + "x" * 40
+
+    assert _chunk(text, 20, 5) == ["Hi. " + "x" * 16, "x" * 20, "x" * 14]
+
+
+def test_latest_boundary_of_any_kind_wins():
+    text = "Alpha beta gamma. Delta eps? Zeta eta theta iota kappa"
+
+    assert _chunk(text, 30, 5) == [
+        "Alpha beta gamma. Delta eps?",
+        "eps? Zeta eta theta iota kappa",
+    ]
+
+
+def test_newline_boundary_and_leading_whitespace_stripped():
+    text = "Alpha beta gamma!\nDelta epsilon zeta eta theta"
+
+    assert _chunk(text, 24, 4) == [
+        "Alpha beta gamma!",
+        "ma!\nDelta epsilon zeta e",
+        "ta eta theta",
+    ]
@@ -0,0 +1,178 @@
+"""
+Tests for keyset pagination of the document listing
+"""
+import base64
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from documents.models import ContentType, Document, ProcessingStatus
+from documents.views import _decode_document_cursor, _encode_document_cursor, get_documents
+
+USER = SimpleNamespace(id=uuid.uuid4())
+START = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def _document(minutes_ago: int) -> Document:
+    uploaded = START - timedelta(minutes=minutes_ago)
+    return Document(
+        id=uuid.uuid4(),
+        user_id=USER.id,
+        title=f"Document {minutes_ago}",
+        content_type=ContentType.PDF,
+        original_filename="notes.pdf",
+        file_path="uploads/notes.pdf",
+        upload_date=uploaded,
+        file_size=1024,
+        processing_status=ProcessingStatus.COMPLETED,
+        created_at=uploaded,
+    )
+
+
+class FakeQuery:
+    """Records the calls get_documents makes and returns canned rows"""
+
+    def __init__(self, rows, count=None):
+        self.rows = rows
+        self.count = count
+        self.filters = []
+        self.with_count_column = False
+        self.limit_value = None
+        self.counted = False
+
+    def filter(self, criterion):
+        self.filters.append(criterion)
+        return self
+
+    def with_entities(self, *entities):
+        self.counted = True
+        return self
+
+    def scalar(self):
+        return self.count
+
+    def add_columns(self, *columns):
+        self.with_count_column = True
+        return self
+
+    def order_by(self, *clauses):
+        return self
+
+    def limit(self, value):
+        self.limit_value = value
+        return self
+
+    def all(self):
+        rows = self.rows[:self.limit_value]
+        if self.with_count_column:
+            return [(doc, len(self.rows)) for doc in rows]
+        return rows
+
+
+class FakeSession:
+    def __init__(self, query):
+        self._query = query
+        self.commits = 0
+
+    def query(self, *entities):
+        return self._query
+
+    def commit(self):
+        self.commits += 1
+
+
+def _list(query, cursor=None, page_size=2, include_total=False):
+    return get_documents(
+        cursor=cursor,
+        page_size=page_size,
+        include_total=include_total,
+        current_user=USER,
+        db=FakeSession(query),
+    )
+
+
+def test_cursor_round_trips_timezone_aware_timestamp_and_id():
+    doc = _document(0)
+    doc.upload_date = datetime(2025, 3, 1, 17, 30, 15, 123456, tzinfo=timezone(timedelta(hours=5)))
+
+    upload_date, document_id = _decode_document_cursor(_encode_document_cursor(doc))
+
+    assert upload_date == doc.upload_date
+    assert upload_date.utcoffset() == timedelta(hours=5)
+    assert document_id == doc.id
+
+
+@pytest.mark.parametrize("raw", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"2025-03-01T12:30:15+00:00").decode(),
+    base64.urlsafe_b64encode(b"2025-03-01T12:30:15+00:00|not-a-uuid").decode(),
+    base64.urlsafe_b64encode(f"yesterday|{uuid.uuid4()}".encode()).decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|\xff").decode(),
+])
+def test_malformed_cursor_is_rejected_with_400(raw):
+    with pytest.raises(HTTPException) as excinfo:
+        _decode_document_cursor(raw)
+
+    assert excinfo.value.status_code == 400
+
+
+def test_cursor_filters_on_tuple_less_than():
+    last = _document(5)
+    query = FakeQuery([_document(6)])
+
+    _list(query, cursor=_encode_document_cursor(last))
+
+    compiled = query.filters[-1].compile(dialect=postgresql.dialect())
+    assert str(compiled).startswith("(documents.upload_date, documents.id) < (")
+    assert list(compiled.params.values()) == [last.upload_date, last.id]
+
+
+def test_next_cursor_points_at_last_row_of_a_full_page():
+    docs = [_document(minutes) for minutes in range(3)]
+    query = FakeQuery(docs)
+
+    response = _list(query, page_size=2)
+
+    assert query.limit_value == 3
+    assert [doc.id for doc in response.documents] == [docs[0].id, docs[1].id]
+    assert _decode_document_cursor(response.next_cursor) == (docs[1].upload_date, docs[1].id)
+
+
+def test_last_page_has_no_next_cursor():
+    response = _list(FakeQuery([_document(0), _document(1)]), page_size=2)
+
+    assert response.next_cursor is None
+    assert response.total is None
+
+
+def test_include_total_on_first_page_uses_window_count():
+    query = FakeQuery([_document(minutes) for minutes in range(3)])
+
+    response = _list(query, page_size=2, include_total=True)
+
+    assert query.with_count_column
+    assert not query.counted
+    assert response.total == 3
+    assert len(response.documents) == 2
+
+
+def test_include_total_on_empty_first_page_is_zero():
+    response = _list(FakeQuery([]), include_total=True)
+
+    assert response.total == 0
+    assert response.documents == []
+
+
+def test_include_total_on_later_page_runs_separate_count():
+    query = FakeQuery([_document(6)], count=7)
+
+    response = _list(query, cursor=_encode_document_cursor(_document(5)), include_total=True)
+
+    assert query.counted
+    assert not query.with_count_column
+    assert response.total == 7
+    assert len(response.documents) == 1
@@ -0,0 +1,37 @@
+"""
+Tests for the rule-based difficulty fallback of topic extraction
+"""
+import pytest
+
+from documents.topic_extractor import TopicExtractor
+
+
+def _difficulty(text: str) -> str:
+    # The rule-based path doesn't use the Gemini client or the result cache
+    extractor = TopicExtractor.__new__(TopicExtractor)
+    return extractor._rule_based_extraction(text, "notes.pdf")["difficulty_level"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("An Introduction to Linear Algebra", "beginner"),
+    ("Getting started with the command line", "beginner"),
+    ("Advanced compiler optimization techniques", "advanced"),
+    ("Microservice architecture in practice", "advanced"),
+    ("Notes on sorting algorithms", "intermediate"),
+])
+def test_difficulty_cues(text, expected):
+    assert _difficulty(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "This is basically a review of sorting",
+    "Complexity classes and reductions",
+    "An introductory survey of graph search",
+    "Expertise gained from advancedness metrics",
+])
+def test_difficulty_cues_match_whole_words_only(text):
+    assert _difficulty(text) == "intermediate"
+
+
+def test_beginner_cue_wins_over_advanced_cue():
+    assert _difficulty("Basic and advanced topics in databases") == "beginner"
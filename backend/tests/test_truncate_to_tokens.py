@@ -0,0 +1,59 @@
+"""
+Tests for head-and-tail truncation to a token budget
+"""
+import re
+
+import pytest
+
+from utils import helpers
+from utils.helpers import TRUNCATION_MARKER, truncate_to_tokens
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word, with character offsets"""
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=True, verbose=False):
+        return {"offset_mapping": [match.span() for match in re.finditer(r"\S+", text)]}
+
+
+@pytest.fixture
+def without_tokenizer(monkeypatch):
+    monkeypatch.setattr(helpers, "_budget_tokenizer", lambda: None)
+
+
+@pytest.fixture
+def word_tokenizer(monkeypatch):
+    monkeypatch.setattr(helpers, "_budget_tokenizer", lambda: WordTokenizer())
+
+
+def test_fallback_keeps_text_within_character_budget(without_tokenizer):
+    text = "a" * 40
+
+    assert truncate_to_tokens(text, 10) == text
+
+
+def test_fallback_splits_budget_between_head_and_tail(without_tokenizer):
+    text = "a" * 100 + "b" * 100
+
+    # 10 tokens * 4 chars: 6 tokens (24 chars) of head, the remaining 16 chars of tail
+    assert truncate_to_tokens(text, 10) == "a" * 24 + TRUNCATION_MARKER + "b" * 16
+
+
+def test_tokenizer_keeps_text_within_token_budget(word_tokenizer):
+    text = " ".join(f"word{i}" for i in range(10))
+
+    assert truncate_to_tokens(text, 10) == text
+
+
+def test_tokenizer_cuts_on_token_boundaries(word_tokenizer):
+    text = " ".join(f"w{i}" for i in range(100))
+
+    assert truncate_to_tokens(text, 10) == "w0 w1 w2 w3 w4 w5" + TRUNCATION_MARKER + "w96 w97 w98 w99"
+
+
+def test_tokenizer_respects_head_fraction(word_tokenizer):
+    text = " ".join(f"w{i}" for i in range(100))
+
+    assert truncate_to_tokens(text, 10, head_fraction=0.3, marker="|") == (
+        "w0 w1 w2|w93 w94 w95 w96 w97 w98 w99"
+    )
@@ -0,0 +1,100 @@
+"""
+Tests for the upload handler's user-folder and extraction caches
+"""
+import asyncio
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import UploadFile
+
+from documents import upload_handler as upload_module
+from documents.upload_handler import UploadHandler
+from utils.cache import TTLCache
+
+
+class FakePipeline:
+    """Stands in for rag_pipeline.process_document and counts the parses"""
+
+    def __init__(self, success: bool = True):
+        self.success = success
+        self.calls = 0
+
+    def process_document(self, file_path):
+        self.calls += 1
+        return {"success": self.success, "text": f"parse {self.calls}"}
+
+
+@pytest.fixture
+def handler(tmp_path):
+    # Skip __init__ so the test doesn't depend on the configured upload folder
+    handler = UploadHandler.__new__(UploadHandler)
+    handler.upload_folder = tmp_path
+    handler._user_folders = TTLCache(maxsize=4, ttl=3600)
+    handler._extraction_cache = TTLCache(maxsize=4, ttl=3600)
+    handler._upload_executor = ThreadPoolExecutor(max_workers=1)
+    yield handler
+    handler._upload_executor.shutdown()
+
+
+def test_user_folder_is_created_once_and_cached(handler, tmp_path):
+    user_id = uuid.uuid4()
+
+    folder = handler._user_folder(user_id)
+    assert folder == tmp_path / str(user_id)
+    assert folder.is_dir()
+
+    # A cached folder is returned without touching the filesystem again
+    folder.rmdir()
+    assert handler._user_folder(user_id) == folder
+    assert not folder.exists()
+
+    handler._user_folders.pop(user_id)
+    assert handler._user_folder(user_id).is_dir()
+
+
+def test_save_file_recreates_a_removed_cached_folder(handler):
+    user_id = uuid.uuid4()
+    handler._user_folder(user_id).rmdir()
+    upload = UploadFile(file=io.BytesIO(b"lecture notes"), filename="notes.txt")
+
+    saved = asyncio.run(handler.save_file(upload, user_id, "txt"))
+
+    assert saved["file_size"] == len(b"lecture notes")
+    with open(saved["file_path"], "rb") as f:
+        assert f.read() == b"lecture notes"
+
+
+def test_extraction_is_cached_until_the_file_changes(handler, tmp_path, monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(upload_module, "rag_pipeline", pipeline)
+    path = tmp_path / "notes.pdf"
+    path.write_bytes(b"%PDF-1.7")
+
+    first = handler.extract_content_on_demand(str(path), "pdf")
+    second = handler.extract_content_on_demand(str(path), "pdf")
+    assert pipeline.calls == 1
+    assert second == first
+
+    # Callers get their own copy, so mutating one doesn't poison the cache
+    second["text"] = "edited"
+    assert handler.extract_content_on_demand(str(path), "pdf") == first
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert handler.extract_content_on_demand(str(path), "pdf")["text"] == "parse 2"
+    assert pipeline.calls == 2
+
+
+def test_failed_extraction_is_not_cached(handler, tmp_path, monkeypatch):
+    pipeline = FakePipeline(success=False)
+    monkeypatch.setattr(upload_module, "rag_pipeline", pipeline)
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+
+    handler.extract_content_on_demand(str(path), "pdf")
+    handler.extract_content_on_demand(str(path), "pdf")
+
+    assert pipeline.calls == 2
@@ -0,0 +1,220 @@
+"""
+In-process caching utilities
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        """
+        Args:
+            maxsize: Maximum number of entries kept before evicting the least recently used
+            ttl: Seconds an entry stays valid after it is stored
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the oldest entries beyond maxsize"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (expired or not)"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every key matching predicate; returns the number removed"""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SemanticCache:
+    """
+    Thread-safe TTL cache looked up by embedding similarity within a scope.
+
+    Entries are (embedding, value) pairs grouped under a hashable scope; get()
+    returns the value of the most similar live entry in that scope if its cosine
+    similarity reaches the threshold. Embeddings are expected to be L2-normalized.
+    """
+
+    def __init__(self, threshold: float = 0.95, maxsize: int = 256, per_scope: int = 64, ttl: float = 3600.0):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            maxsize: Maximum number of scopes kept before evicting the least recently used
+            per_scope: Maximum entries per scope; the oldest is dropped first
+            ttl: Seconds an entry stays valid after it is stored
+        """
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.per_scope = per_scope
+        self.ttl = ttl
+        self._scopes: "OrderedDict[Hashable, List[Tuple[float, np.ndarray, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope: Hashable, embedding: np.ndarray, default: Any = None) -> Any:
+        """Return the closest cached value in scope, or default if none is similar enough"""
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if not entries:
+                return default
+            now = time.monotonic()
+            entries[:] = [entry for entry in entries if entry[0] > now]
+            if not entries:
+                del self._scopes[scope]
+                return default
+            self._scopes.move_to_end(scope)
+            similarities = np.stack([entry[1] for entry in entries]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return default
+            return entries[best][2]
+
+    def set(self, scope: Hashable, embedding: np.ndarray, value: Any) -> None:
+        """Store value under scope for lookups near embedding"""
+        with self._lock:
+            entries = self._scopes.setdefault(scope, [])
+            entries.append((time.monotonic() + self.ttl, np.asarray(embedding, dtype=np.float32).copy(), value))
+            del entries[:-self.per_scope]
+            self._scopes.move_to_end(scope)
+            while len(self._scopes) > self.maxsize:
+                self._scopes.popitem(last=False)
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every scope matching predicate; returns the number of scopes removed"""
+        with self._lock:
+            stale = [scope for scope in self._scopes if predicate(scope)]
+            for scope in stale:
+                del self._scopes[scope]
+            return len(stale)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._scopes.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._scopes.values())
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question, without trailing punctuation"""
+    return " ".join(question.casefold().split()).rstrip("?!. ")
+
+
+class AnswerCache:
+    """
+    Thread-safe TTL cache of answers looked up by (scope, question).
+
+    Questions match exactly after normalize_question. Embedding neighbours are no
+    substitute for that: "what is X" / "what is not X" or "advantages" /
+    "disadvantages" pairs embed almost identically but need different answers. An
+    embedding fallback (SemanticCache) is only consulted when semantic_threshold is
+    given, and should be kept very high.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        per_scope: int = 64,
+        ttl: float = 3600.0,
+        semantic_threshold: Optional[float] = None
+    ):
+        """
+        Args:
+            maxsize: Maximum number of scopes kept by the semantic fallback
+            per_scope: Maximum semantic entries per scope; the exact cache holds
+                maxsize * per_scope questions in total
+            ttl: Seconds an entry stays valid after it is stored
+            semantic_threshold: Minimum cosine similarity for an embedding hit; None
+                disables the fallback
+        """
+        self._exact = TTLCache(maxsize=maxsize * per_scope, ttl=ttl)
+        self._semantic = (
+            SemanticCache(threshold=semantic_threshold, maxsize=maxsize, per_scope=per_scope, ttl=ttl)
+            if semantic_threshold is not None else None
+        )
+
+    @property
+    def semantic(self) -> bool:
+        """Whether lookups fall back to embedding similarity"""
+        return self._semantic is not None
+
+    def get(self, scope: Hashable, question: str, embedding: Optional[np.ndarray] = None, default: Any = None) -> Any:
+        """Return the answer cached for question in scope, or default"""
+        value = self._exact.get((scope, normalize_question(question)), _MISSING)
+        if value is not _MISSING:
+            return value
+        if self._semantic is not None and embedding is not None:
+            return self._semantic.get(scope, embedding, default)
+        return default
+
+    def set(self, scope: Hashable, question: str, value: Any, embedding: Optional[np.ndarray] = None) -> None:
+        """Store the answer to question in scope"""
+        self._exact.set((scope, normalize_question(question)), value)
+        if self._semantic is not None and embedding is not None:
+            self._semantic.set(scope, embedding, value)
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose scope matches predicate; returns the number of exact entries removed"""
+        if self._semantic is not None:
+            self._semantic.discard_where(predicate)
+        return self._exact.discard_where(lambda key: predicate(key[0]))
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._exact.clear()
+        if self._semantic is not None:
+            self._semantic.clear()
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+
+__all__ = ['TTLCache', 'SemanticCache', 'AnswerCache', 'normalize_question']
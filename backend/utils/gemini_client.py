@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional, List, Dict, Any, Union
 from pathlib import Path
 from google import genai
@@ -6,6 +7,33 @@ from langdetect import detect, LangDetectException
 from config.settings import settings
 from PIL import Image
 
+SAFETY_SETTINGS = [
+    types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="BLOCK_ONLY_HIGH"),
+    types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="BLOCK_ONLY_HIGH"),
+    types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="BLOCK_ONLY_HIGH"),
+    types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="BLOCK_ONLY_HIGH"),
+]
+
+
+DEFAULT_MAX_OUTPUT_TOKENS = 8000
+
+
+@lru_cache(maxsize=32)
+def _generation_config(
+    temperature: float,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    json_output: bool = False,
+    thinking_budget: Optional[int] = None
+) -> types.GenerateContentConfig:
+    """Build (once per option set) the generation config shared by generate_text calls"""
+    return types.GenerateContentConfig(
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        response_mime_type="application/json" if json_output else None,
+        thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget) if thinking_budget is not None else None,
+        safety_settings=SAFETY_SETTINGS
+    )
+
 class GeminiClient:
     """Client for interacting with Google Gemini API"""
     
@@ -20,7 +48,15 @@ class GeminiClient:
         self.model_id = settings.GEMINI_MODEL
         self.embedding_model_name = settings.GEMINI_EMBEDDING_MODEL
     
-    def generate_text(self, prompt: str, temperature: float = 0.3, image_path: Optional[str] = None) -> str:
+    def generate_text(
+        self,
+        prompt: str,
+        temperature: float = 0.3,
+        image_path: Optional[str] = None,
+        max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+        json_output: bool = False,
+        thinking_budget: Optional[int] = None
+    ) -> str:
         """
         Generate text using Gemini (with optional image input for Vision API)
         
@@ -28,6 +64,9 @@ class GeminiClient:
             prompt: Input prompt
             temperature: Sampling temperature
             image_path: Optional path to image file for vision analysis
+            max_output_tokens: Cap on generated tokens (thinking tokens count toward it)
+            json_output: Ask for an application/json response
+            thinking_budget: Thinking token budget; 0 disables thinking, None keeps the model default
             
         Returns:
             Generated text
@@ -37,16 +76,7 @@ class GeminiClient:
 
         try:
             # Configure generation and safety
-            config = types.GenerateContentConfig(
-                temperature=temperature,
-                max_output_tokens=8000,
-                safety_settings=[
-                    types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="BLOCK_ONLY_HIGH"),
-                    types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="BLOCK_ONLY_HIGH"),
-                    types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="BLOCK_ONLY_HIGH"),
-                    types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="BLOCK_ONLY_HIGH"),
-                ]
-            )
+            config = _generation_config(temperature, max_output_tokens, json_output, thinking_budget)
             
             # Prepare contents for API call
             contents: List[Union[str, types.Part]] = []
@@ -135,12 +165,13 @@ class GeminiClient:
         except LangDetectException:
             return "unknown"
     
-    def translate_to_english(self, text: str) -> str:
+    def translate_to_english(self, text: str, raise_on_error: bool = False) -> str:
         """
         Translate text to English using Gemini
         
         Args:
             text: Text to translate
+            raise_on_error: Propagate translation failures instead of returning text unchanged
             
         Returns:
             Translated text
@@ -149,16 +180,19 @@ class GeminiClient:
             prompt = f"Translate the following text to English. Only return the translation, nothing else:\n\n{text}"
             return self.generate_text(prompt, temperature=0.1)
         except Exception as e:
+            if raise_on_error:
+                raise
             print(f"Translation error: {e}")
             return text
     
-    def ensure_english(self, text: str) -> str:
+    def ensure_english(self, text: str, raise_on_error: bool = False) -> str:
         """
         Ensure text is in English, translate if needed
         Handles special image markers for Gemini Vision processing
         
         Args:
             text: Input text (or image marker)
+            raise_on_error: Propagate translation failures instead of returning text unchanged
             
         Returns:
             Text in English (or image marker unchanged)
@@ -169,7 +203,7 @@ class GeminiClient:
         
         lang = self.detect_language(text)
         if lang != "en" and lang != "unknown":
-            return self.translate_to_english(text)
+            return self.translate_to_english(text, raise_on_error=raise_on_error)
         return text
     
     def process_image_content(self, image_path: str, prompt: str = None) -> str:
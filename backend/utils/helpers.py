@@ -1,8 +1,9 @@
 """
 Helper utility functions
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+from functools import lru_cache
 import hashlib
 import secrets
 import uuid
@@ -154,6 +155,80 @@ def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
         return text
     return text[:max_length - len(suffix)] + suffix
 
+# Local stand-in for LLM tokenization when budgeting prompt content: the ingestion
+# chunker's tokenizer, already on disk. Falls back to ~4 characters per token.
+FALLBACK_CHARS_PER_TOKEN = 4
+# Only this many characters per budgeted token are tokenized from each end of the text
+TOKEN_WINDOW_CHARS_PER_TOKEN = 12
+TRUNCATION_MARKER = "\n...[truncated]...\n"
+
+@lru_cache(maxsize=1)
+def _budget_tokenizer():
+    try:
+        from transformers import AutoTokenizer
+        from config.settings import settings
+        return AutoTokenizer.from_pretrained(settings.DOCLING_HYBRID_TOKENIZER, local_files_only=True)
+    except Exception:
+        return None
+
+def _token_offsets(tokenizer, text: str) -> List[Tuple[int, int]]:
+    return tokenizer(
+        text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+    )["offset_mapping"]
+
+def truncate_to_tokens(
+    text: str,
+    max_tokens: int,
+    head_fraction: float = 0.6,
+    marker: str = TRUNCATION_MARKER
+) -> str:
+    """
+    Fit text into an approximate token budget, keeping its beginning and end
+    
+    Args:
+        text: Text to truncate
+        max_tokens: Token budget
+        head_fraction: Share of the budget spent on the beginning; the rest covers the end
+        marker: Inserted where the middle was cut
+        
+    Returns:
+        text unchanged if it fits, else head + marker + tail
+    """
+    head_tokens = max(1, int(max_tokens * head_fraction))
+    tail_tokens = max(1, max_tokens - head_tokens)
+    tokenizer = _budget_tokenizer()
+    
+    if tokenizer is None:
+        max_chars = max_tokens * FALLBACK_CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        head_end = head_tokens * FALLBACK_CHARS_PER_TOKEN
+        return text[:head_end] + marker + text[len(text) - (max_chars - head_end):]
+    
+    # Every token covers at least one character
+    if len(text) <= max_tokens:
+        return text
+    
+    window = max_tokens * TOKEN_WINDOW_CHARS_PER_TOKEN
+    head_text = text[:window]
+    head_offsets = _token_offsets(tokenizer, head_text)
+    if len(text) <= window:
+        if len(head_offsets) <= max_tokens:
+            return text
+        tail_text, tail_offsets = head_text, head_offsets
+    else:
+        tail_text = text[-window:]
+        tail_offsets = _token_offsets(tokenizer, tail_text)
+    
+    # Cut on token boundaries (character offsets into the original text)
+    head_end = head_offsets[head_tokens - 1][1] if len(head_offsets) >= head_tokens else len(head_text)
+    tail_start = len(text) - len(tail_text)
+    if len(tail_offsets) >= tail_tokens:
+        tail_start += tail_offsets[-tail_tokens][0]
+    if tail_start <= head_end:
+        return text
+    return text[:head_end] + marker + text[tail_start:]
+
 def merge_dicts(*dicts: Dict[str, Any]) -> Dict[str, Any]:
     """
     Merge multiple dictionaries
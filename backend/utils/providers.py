@@ -101,3 +101,12 @@ def get_embedding_query_instruction(model_name: Optional[str] = None) -> str:
 
 def get_embedding_device() -> str:
     return _env("EMBEDDING_DEVICE", settings.EMBEDDING_DEVICE or "auto") or "auto"
+
+
+def get_embedding_batch_size() -> int:
+    return max(1, int(_env("EMBEDDING_BATCH_SIZE", str(settings.EMBEDDING_BATCH_SIZE or 32)) or "32"))
+
+
+def get_embedding_quantize() -> bool:
+    configured = _env("EMBEDDING_QUANTIZE", str(settings.EMBEDDING_QUANTIZE)) or ""
+    return configured.strip().lower() in {"1", "true", "yes", "on"}
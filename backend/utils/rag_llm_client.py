@@ -5,7 +5,7 @@ Supports Gemini, Groq, and Ollama for provider-native text, JSON, and tool use.
 
 import copy
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 from config.settings import settings
 from utils.logger import logger
@@ -417,6 +417,59 @@ class RAGLLMClient:
         )
         return (response.text or "").strip()
 
+    def stream_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.2,
+        max_tokens: int = 1200,
+    ) -> Iterator[str]:
+        """Yield answer text incrementally as the provider produces it."""
+        self._ensure_client()
+
+        if self.provider == "groq":
+            stream = self._groq_client.chat.completions.create(  # type: ignore[union-attr]
+                model=self.model,
+                messages=self._build_messages(prompt, system_prompt),
+                temperature=temperature,
+                max_completion_tokens=max_tokens,
+                stream=True,
+            )
+            for chunk in stream:
+                if chunk.choices:
+                    text = _coerce_provider_text(chunk.choices[0].delta.content)
+                    if text:
+                        yield text
+            return
+
+        if self.provider == "ollama":
+            stream = self._ollama_client.chat(  # type: ignore[union-attr]
+                model=self.model,
+                messages=self._build_messages(prompt, system_prompt),
+                options={
+                    "temperature": temperature,
+                    "num_ctx": get_ollama_num_ctx(),
+                    "num_predict": max_tokens,
+                },
+                think=False,
+                stream=True,
+            )
+            for part in stream:
+                text = _extract_ollama_content(part)
+                if text:
+                    yield text
+            return
+
+        combined_prompt = prompt if not system_prompt else f"{system_prompt}\n\n{prompt}"
+        stream = self._gemini_client.models.generate_content_stream(  # type: ignore[union-attr]
+            model=self.model,
+            contents=combined_prompt,
+            config=genai_types.GenerateContentConfig(temperature=temperature),
+        )
+        for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
     def generate_json(
         self,
         prompt: str,
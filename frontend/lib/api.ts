@@ -158,7 +158,7 @@ axiosInstance.interceptors.response.use(
 // ===== Documents =====
 axiosInstance.getDocuments = async () => {
   const response = await axiosInstance.get('/api/documents/');
-  // Backend returns { documents: [...], total, page, page_size }
+  // Backend returns { documents: [...], page_size, next_cursor? }
   return response.data.documents || response.data;
 };
 